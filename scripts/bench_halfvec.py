@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Compare float32 (``vector``) and float16 (``halfvec``) embedding storage.
+
+Loads one synthetic corpus as ``vector`` and builds the ANN index from the
+current settings. It then measures the index and table sizes, recall@k
+against exact float32 search, and ``vector_search`` latency. Next it
+converts the same table to ``halfvec`` with the online migration
+(``convert_embeddings`` and ``switch_to_shadow``) and measures again.
+
+The vectors are clustered, like those of real embedding models: unit
+vectors spread around ``--clusters`` random centres. Queries are drawn the
+same way. The default ``--spread`` leaves gaps of about 1e-3 in cosine
+similarity between neighbouring results, as real models do. With much
+tighter clusters, rounding to float16 reorders near-ties and recall drops.
+Each query runs once to warm the cache before it is timed.
+
+The table size after conversion still includes the dropped float32 column.
+Its values stay in each row until the row is rewritten (``VACUUM FULL`` or
+pg_repack reclaims the space at once). The index is rebuilt, so it shrinks
+immediately.
+
+Runs against the configured database in a throwaway schema that is dropped
+afterwards, so it is safe to point at a development instance.
+
+Usage:
+    python scripts/bench_halfvec.py
+    python scripts/bench_halfvec.py --chunks 100000 --queries 500 --ef-search 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from ax_rag.core.config import settings
+from ax_rag.ingestion.reindex import convert_embeddings, switch_to_shadow
+from ax_rag.storage.pg import (
+    VECTOR_INDEX,
+    Base,
+    insert_chunks,
+    insert_document,
+    rebuild_vector_index,
+    vector_search,
+)
+
+
+@dataclass
+class Measurement:
+    storage: str
+    index_bytes: int
+    table_bytes: int
+    recall: float
+    p50_ms: float
+    p95_ms: float
+
+
+def _clustered(
+    rng: np.random.Generator, centres: npt.NDArray[np.float32], n: int, spread: float
+) -> npt.NDArray[np.float32]:
+    picks = rng.integers(len(centres), size=n)
+    noise = rng.standard_normal((n, centres.shape[1])).astype(np.float32)
+    vectors = centres[picks] + spread * noise / np.sqrt(centres.shape[1])
+    normalised: npt.NDArray[np.float32] = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return normalised
+
+
+async def _measure(
+    storage: str,
+    session_factory: async_sessionmaker[AsyncSession],
+    queries: npt.NDArray[np.float32],
+    exact: list[set[str]],
+    top_k: int,
+    ef_search: int | None,
+) -> Measurement:
+    async with session_factory() as session:
+        await session.execute(text("ANALYZE chunks"))
+        sizes = (
+            await session.execute(
+                text(
+                    "SELECT pg_relation_size(:index) AS index_bytes, "
+                    "pg_table_size('chunks_c_default') AS table_bytes"
+                ),
+                {"index": f"{VECTOR_INDEX}_default"},
+            )
+        ).one()
+
+        async def search(query: npt.NDArray[np.float32]) -> set[str]:
+            hits = await vector_search(session, query, top_k, ef_search=ef_search)
+            return {h.chunk_id for h in hits}
+
+        for query in queries:  # warm-up
+            await search(query)
+        latencies, recalls = [], []
+        for query, truth in zip(queries, exact, strict=True):
+            start = time.perf_counter()
+            found = await search(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(found & truth) / top_k)
+    return Measurement(
+        storage,
+        sizes.index_bytes,
+        sizes.table_bytes,
+        float(np.mean(recalls)),
+        float(np.percentile(latencies, 50)),
+        float(np.percentile(latencies, 95)),
+    )
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    settings.vector_distance = "cosine"
+    settings.embedding_storage = "vector"
+    dim = settings.embedding_dim
+    rng = np.random.default_rng(args.seed)
+    centres = rng.standard_normal((args.clusters, dim)).astype(np.float32)
+    corpus = _clustered(rng, centres, args.chunks, args.spread)
+    queries = _clustered(rng, centres, args.queries, args.spread)
+
+    schema = f"bench_{uuid.uuid4().hex[:12]}"
+    admin = create_async_engine(settings.database_url)
+    async with admin.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+
+    engine = create_async_engine(
+        settings.database_url,
+        connect_args={"server_settings": {"search_path": f"{schema},public"}},
+    )
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, checkfirst=False)
+            # Start from float32 whatever EMBEDDING_STORAGE says (the table is empty)
+            await conn.execute(
+                text(f"ALTER TABLE chunks ALTER COLUMN embedding TYPE vector({dim})")
+            )
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        ids: list[str] = []
+        for lo in range(0, args.chunks, 1000):
+            batch = corpus[lo : lo + 1000]
+            async with session_factory() as session, session.begin():
+                doc_id = await insert_document(session, "bench", None)
+                await insert_chunks(
+                    session,
+                    doc_id,
+                    [
+                        {
+                            "text": f"chunk {lo + i}",
+                            "chunk_index": i,
+                            "source": "bench",
+                            "embedding": e,
+                        }
+                        for i, e in enumerate(batch)
+                    ],
+                )
+            async with session_factory() as session:
+                result = await session.execute(
+                    text("SELECT id FROM chunks WHERE document_id = :d ORDER BY chunk_index"),
+                    {"d": doc_id},
+                )
+                ids.extend(result.scalars())
+
+        # Exact top-k by cosine similarity, on the float32 vectors
+        similarities = queries @ corpus.T
+        top = np.argsort(-similarities, axis=1)[:, : args.top_k]
+        exact = [{ids[i] for i in row} for row in top]
+
+        await rebuild_vector_index(engine)
+        results = [
+            await _measure("vector", session_factory, queries, exact, args.top_k, args.ef_search)
+        ]
+
+        settings.embedding_storage = "halfvec"
+        start = time.perf_counter()
+        await convert_embeddings(session_factory=session_factory)
+        await switch_to_shadow(convert=True, bind=engine, session_factory=session_factory)
+        converted_s = time.perf_counter() - start
+        results.append(
+            await _measure("halfvec", session_factory, queries, exact, args.top_k, args.ef_search)
+        )
+    finally:
+        await engine.dispose()
+        async with admin.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await admin.dispose()
+
+    print(
+        f"{args.chunks:,} chunks, dim {dim}, {settings.vector_index_type}, "
+        f"{args.queries} queries, top_k {args.top_k}"
+    )
+    header = ("storage", "index MB", "table MB", "recall", "p50 ms", "p95 ms")
+    print("{:>8}  {:>9}  {:>9}  {:>7}  {:>7}  {:>7}".format(*header))
+    for m in results:
+        print(
+            f"{m.storage:>8}  {m.index_bytes / 2**20:>9.1f}  {m.table_bytes / 2**20:>9.1f}  "
+            f"{m.recall:>7.3f}  {m.p50_ms:>7.2f}  {m.p95_ms:>7.2f}"
+        )
+    vector, halfvec = results
+    print(
+        f"index size: {halfvec.index_bytes / vector.index_bytes:.0%} of float32; "
+        f"conversion took {converted_s:.1f}s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--chunks", type=int, default=20_000, help="Corpus size")
+    parser.add_argument("--queries", type=int, default=200, help="Queries measured")
+    parser.add_argument("--top-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--ef-search", type=int, default=None, help="HNSW ef_search per query")
+    parser.add_argument("--clusters", type=int, default=100, help="Cluster centres")
+    parser.add_argument("--spread", type=float, default=16.0, help="Noise around each centre")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
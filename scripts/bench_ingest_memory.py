@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Measure peak Python memory of file ingestion: buffered vs streaming.
+
+For each file size, a synthetic text file is ingested twice into a throwaway
+schema (dropped afterwards): once the buffered way (read, decode, chunk, and
+embed the whole file before writing) and once through ``ingest_stream``.
+Peak allocations are measured with ``tracemalloc``; embedding runs on a
+thread pool so its arrays are counted too.
+
+Usage:
+    python scripts/bench_ingest_memory.py
+    python scripts/bench_ingest_memory.py --sizes-mb 5 20 80
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+import tracemalloc
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from ax_rag.core.config import settings
+from ax_rag.core.executor import shutdown_executor
+from ax_rag.embedding.stub import get_embedder
+from ax_rag.ingestion.chunker import chunk_text
+from ax_rag.ingestion.streaming import ingest_stream
+from ax_rag.storage.pg import Base, insert_chunks, insert_document
+
+_LINE = "2025-01-01T00:00:00Z worker-7 INFO request served in 12ms. status=200 path=/api/v1/items\n"
+
+
+def _write_file(path: Path, size_mb: int) -> None:
+    block = (_LINE * (1024 * 1024 // len(_LINE) + 1))[: 1024 * 1024]
+    with path.open("w", encoding="utf-8") as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+
+async def _read_blocks(path: Path) -> AsyncIterator[bytes]:
+    with path.open("rb") as f:
+        while block := f.read(settings.ingest_block_size):
+            yield block
+
+
+async def _buffered(path: Path, session_factory: async_sessionmaker[AsyncSession]) -> None:
+    content = path.read_bytes().decode("utf-8")
+    chunks = chunk_text(content)
+    embeddings = get_embedder().embed_batch([c.text for c in chunks])
+    async with session_factory() as session, session.begin():
+        doc_id = await insert_document(session, source=path.name, raw_text=content)
+        rows = [
+            {"text": c.text, "chunk_index": c.index, "source": path.name, "embedding": emb}
+            for c, emb in zip(chunks, embeddings, strict=True)
+        ]
+        await insert_chunks(session, doc_id, rows)
+
+
+async def _streaming(path: Path, session_factory: async_sessionmaker[AsyncSession]) -> None:
+    await ingest_stream(_read_blocks(path), path.name, session_factory=session_factory)
+
+
+async def _measure(
+    ingest: Callable[[Path, async_sessionmaker[AsyncSession]], Awaitable[None]],
+    path: Path,
+    session_factory: async_sessionmaker[AsyncSession],
+) -> tuple[float, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    await ingest(path, session_factory)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20, elapsed
+
+
+async def main_async(sizes_mb: list[int]) -> None:
+    settings.executor_kind = "thread"
+    schema = f"bench_{uuid.uuid4().hex[:12]}"
+    admin = create_async_engine(settings.database_url)
+    async with admin.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+    engine = create_async_engine(
+        settings.database_url,
+        connect_args={"server_settings": {"search_path": f"{schema},public"}},
+    )
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, checkfirst=False)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        print(f"{'file':>8} {'mode':>10} {'peak MiB':>9} {'seconds':>8}")
+        with tempfile.TemporaryDirectory() as tmp:
+            for size_mb in sizes_mb:
+                path = Path(tmp) / f"bench-{size_mb}mb.txt"
+                _write_file(path, size_mb)
+                for mode, ingest in (("buffered", _buffered), ("streaming", _streaming)):
+                    peak, elapsed = await _measure(ingest, path, session_factory)
+                    print(f"{size_mb:>6}MB {mode:>10} {peak:>9.1f} {elapsed:>8.1f}")
+                path.unlink()
+    finally:
+        shutdown_executor()
+        await engine.dispose()
+        async with admin.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await admin.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[5, 20], help="File sizes")
+    args = parser.parse_args()
+    asyncio.run(main_async(args.sizes_mb))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Compare chunk insert throughput: ORM ``INSERT`` vs binary ``COPY``.
+
+Runs against the configured database in a throwaway schema that is dropped
+afterwards, so it is safe to point at a development instance.
+
+Usage:
+    python scripts/bench_insert.py
+    python scripts/bench_insert.py --chunks 20000 --batch 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from ax_rag.core.config import settings
+from ax_rag.embedding.stub import get_embedder
+from ax_rag.storage.pg import Base, insert_chunks, insert_document
+
+
+async def _bench(method: str, n_chunks: int, batch: int) -> float:
+    settings.chunk_insert_method = method
+    embedder = get_embedder()
+    texts = [f"{method} benchmark chunk {i} " + "lorem ipsum " * 40 for i in range(n_chunks)]
+    embeddings = embedder.embed_batch(texts)
+
+    schema = f"bench_{uuid.uuid4().hex[:12]}"
+    admin = create_async_engine(settings.database_url)
+    async with admin.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+
+    engine = create_async_engine(
+        settings.database_url,
+        connect_args={"server_settings": {"search_path": f"{schema},public"}},
+    )
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, checkfirst=False)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        start = time.perf_counter()
+        for lo in range(0, n_chunks, batch):
+            rows = [
+                {
+                    "text": texts[i],
+                    "chunk_index": i,
+                    "source": "bench",
+                    "embedding": embeddings[i],
+                }
+                for i in range(lo, min(lo + batch, n_chunks))
+            ]
+            async with session_factory() as session, session.begin():
+                doc_id = await insert_document(session, "bench", "")
+                await insert_chunks(session, doc_id, rows)
+        return time.perf_counter() - start
+    finally:
+        await engine.dispose()
+        async with admin.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await admin.dispose()
+
+
+async def main_async(n_chunks: int, batch: int) -> None:
+    results = {method: await _bench(method, n_chunks, batch) for method in ("orm", "copy")}
+    for method, elapsed in results.items():
+        print(f"{method:>5}: {n_chunks / elapsed:>10,.0f} chunks/s  ({elapsed:.2f}s)")
+    print(f"speedup: {results['orm'] / results['copy']:.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--chunks", type=int, default=10_000, help="Total chunks to insert")
+    parser.add_argument("--batch", type=int, default=500, help="Chunks per transaction")
+    args = parser.parse_args()
+    asyncio.run(main_async(args.chunks, args.batch))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Convert stored embeddings to the configured EMBEDDING_STORAGE without downtime.
+
+``halfvec`` stores each element as a 16-bit float, halving the size of the
+vectors and of the ANN index; ``vector`` is float32.  The live vectors are
+cast into a shadow ``embedding_next`` column in batches while search and
+ingestion keep using ``embedding``.  The switch then builds the ANN index on
+the new column concurrently and swaps the columns under a short lock.
+Nothing is re-embedded.  An interrupted run can simply be started again.
+
+Set EMBEDDING_STORAGE for the API as well, so that new tables use it too.
+Writes and index builds follow the column's actual type, so the API does
+not need to restart at the moment of the switch.
+
+Usage:
+    EMBEDDING_STORAGE=halfvec python scripts/convert_embeddings.py
+    EMBEDDING_STORAGE=halfvec python scripts/convert_embeddings.py --no-switch
+    EMBEDDING_STORAGE=halfvec python scripts/convert_embeddings.py --switch-only
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+from ax_rag.core.logging import setup_logging
+from ax_rag.ingestion.reindex import convert_embeddings, switch_to_shadow
+from ax_rag.storage.pg import shutdown_db
+
+
+async def run(args: argparse.Namespace) -> None:
+    setup_logging()
+    try:
+        if not args.switch_only:
+            await convert_embeddings(batch_size=args.batch_size)
+        if not args.no_switch:
+            await switch_to_shadow(convert=True)
+    finally:
+        await shutdown_db()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--batch-size", type=int, default=1000, help="Chunks per transaction")
+    parser.add_argument("--no-switch", action="store_true", help="Copy only; switch later")
+    parser.add_argument(
+        "--switch-only", action="store_true", help="Switch to an already copied shadow column"
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
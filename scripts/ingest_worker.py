@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Run ingestion job workers outside the API.
+
+Workers claim jobs queued by ``POST /ingest/async`` from the ``ingest_jobs``
+table with ``FOR UPDATE SKIP LOCKED``, so any number of these processes can
+run next to the API's own workers (``INGEST_WORKERS``; set it to 0 to keep
+ingestion out of the API processes entirely).  Stop with Ctrl-C or SIGTERM;
+batches in progress are finished first.
+
+Usage:
+    python scripts/ingest_worker.py
+    python scripts/ingest_worker.py --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import signal
+
+from ax_rag.core.executor import shutdown_executor
+from ax_rag.core.logging import setup_logging
+from ax_rag.embedding.stub import close_embedder
+from ax_rag.ingestion.jobs import JobWorkers
+from ax_rag.storage.pg import init_db, shutdown_db
+
+
+async def work(args: argparse.Namespace) -> None:
+    setup_logging()
+    await init_db()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    workers = JobWorkers(args.workers)
+    workers.start()
+    try:
+        await stop.wait()
+    finally:
+        await workers.stop()
+        await close_embedder()
+        shutdown_executor()
+        await shutdown_db()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--workers", type=int, default=2, help="Worker tasks in this process (default: 2)"
+    )
+    asyncio.run(work(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Rebuild the vector (ANN) index from the current settings.
+
+Run after loading data (IVFFlat trains its lists on the rows present at build
+time) or after changing VECTOR_INDEX_TYPE, VECTOR_DISTANCE, HNSW_M,
+HNSW_EF_CONSTRUCTION or IVFFLAT_LISTS.  The index is built concurrently, so
+the API can keep serving while it runs.
+
+With --collection only that collection's index is rebuilt (REINDEX
+CONCURRENTLY), e.g. to train IVFFlat lists after loading a new collection.
+
+With --trigram the pg_trgm index of KEYWORD_SEARCH_MODE=substring is built
+instead, also concurrently.  The API creates it on startup only while there
+are no chunks yet.
+
+Usage:
+    python scripts/rebuild_index.py
+    python scripts/rebuild_index.py --collection acme
+    python scripts/rebuild_index.py --trigram
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+from ax_rag.core.logging import setup_logging
+from ax_rag.storage.pg import build_trigram_index, rebuild_vector_index, shutdown_db
+
+
+async def rebuild(collection: str | None, trigram: bool) -> None:
+    setup_logging()
+    try:
+        if trigram:
+            await build_trigram_index()
+        else:
+            await rebuild_vector_index(collection=collection)
+    finally:
+        await shutdown_db()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the vector index")
+    parser.add_argument("--collection", help="Rebuild only this collection's index (default: all)")
+    parser.add_argument(
+        "--trigram", action="store_true", help="Build the pg_trgm index for substring search"
+    )
+    args = parser.parse_args()
+    if args.trigram and args.collection:
+        parser.error("--trigram rebuilds every collection")
+    asyncio.run(rebuild(args.collection, args.trigram))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,77 @@
 #!/usr/bin/env python3
 """Re-embed all existing chunks (useful after changing the embedding model).
 
+Streams chunks in id order, embeds batches in parallel on the CPU pool, and
+writes them back with one set-based UPDATE per batch.  Progress is saved to a
+checkpoint file after every batch; re-running the same command after an
+interruption resumes from it.
+
+With --shadow the new vectors are built in a separate ``embedding_next``
+column (sized for the configured embedder) while search keeps using the live
+one, then swapped in atomically.  Set EMBEDDING_DIM to the new model's
+dimension for the API once the switch is done.
+
 Usage:
     python scripts/reindex.py
+    python scripts/reindex.py --batch-size 512 --concurrency 8
+    python scripts/reindex.py --shadow              # build, then switch
+    python scripts/reindex.py --shadow --no-switch  # build only; switch later
+    python scripts/reindex.py --switch-only
 """
 
 from __future__ import annotations
 
+import argparse
 import asyncio
+from pathlib import Path
 
-from sqlalchemy import text
-
-from ax_rag.core.logging import get_logger, setup_logging
-from ax_rag.embedding.stub import get_embedder
-from ax_rag.storage.pg import async_session
+from ax_rag.core.executor import shutdown_executor
+from ax_rag.core.logging import setup_logging
+from ax_rag.ingestion.reindex import reindex, switch_to_shadow
+from ax_rag.storage.pg import shutdown_db
 
-logger = get_logger(__name__)
 
-
-async def reindex() -> None:
+async def run(args: argparse.Namespace) -> None:
     setup_logging()
-    embedder = get_embedder()
-    logger.info("reindex_started", embedding_dim=embedder.dim)
-
-    async with async_session() as session:
-        result = await session.execute(text("SELECT id, text FROM chunks"))
-        rows = result.fetchall()
-
-    logger.info("reindex_chunks_found", count=len(rows))
-
-    batch_size = 100
-    updated = 0
-
-    for i in range(0, len(rows), batch_size):
-        batch = rows[i : i + batch_size]
-        texts = [r.text for r in batch]
-        embeddings = embedder.embed_batch(texts)
-
-        async with async_session() as session, session.begin():
-            for row, emb in zip(batch, embeddings, strict=True):
-                await session.execute(
-                    text("UPDATE chunks SET embedding = :emb WHERE id = :id"),
-                    {"emb": str(emb), "id": row.id},
-                )
-            updated += len(batch)
-
-        logger.info("reindex_batch_complete", updated=updated, total=len(rows))
-
-    logger.info("reindex_finished", total_updated=updated)
+    try:
+        if not args.switch_only:
+            await reindex(
+                shadow=args.shadow,
+                batch_size=args.batch_size,
+                concurrency=args.concurrency,
+                checkpoint_path=args.checkpoint,
+            )
+        if args.switch_only or (args.shadow and not args.no_switch):
+            await switch_to_shadow()
+    finally:
+        shutdown_executor()
+        await shutdown_db()
 
 
 def main() -> None:
-    asyncio.run(reindex())
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--batch-size", type=int, default=256, help="Chunks per batch")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help="Batches embedded at once (default: executor pool size)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        default=Path(".reindex-checkpoint.json"),
+        help="Checkpoint file used to resume an interrupted run",
+    )
+    parser.add_argument(
+        "--shadow", action="store_true", help="Build vectors in embedding_next, then switch"
+    )
+    parser.add_argument("--no-switch", action="store_true", help="With --shadow: do not switch")
+    parser.add_argument(
+        "--switch-only", action="store_true", help="Switch to an already built shadow column"
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args))
 
 
 if __name__ == "__main__":
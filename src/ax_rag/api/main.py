@@ -5,11 +5,18 @@ from __future__ import annotations
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 
 from ax_rag.api.middleware import TraceMiddleware
-from ax_rag.api.routes import answer, ingest, search
+from ax_rag.api.routes import answer, collections, ingest, search
+from ax_rag.core.config import settings
+from ax_rag.core.executor import get_executor, shutdown_executor
 from ax_rag.core.logging import setup_logging
+from ax_rag.embedding.batcher import get_embedding_batcher
+from ax_rag.embedding.cache import get_query_cache
+from ax_rag.embedding.stub import close_embedder
+from ax_rag.ingestion.jobs import start_workers, stop_workers
+from ax_rag.retrieval.cache import get_result_cache, get_retrieval_flights
 from ax_rag.storage.pg import init_db, shutdown_db
 
 
@@ -17,7 +24,12 @@ from ax_rag.storage.pg import init_db, shutdown_db
 async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
     setup_logging()
     await init_db()
+    get_executor()
+    start_workers()
     yield
+    await stop_workers()
+    await close_embedder()
+    shutdown_executor()
     await shutdown_db()
 
 
@@ -33,11 +45,32 @@ app = FastAPI(
 
 app.add_middleware(TraceMiddleware)
 
-app.include_router(ingest.router)
-app.include_router(search.router)
-app.include_router(answer.router)
+app.include_router(collections.router)
+# Unprefixed routes use the default collection
+for module in (ingest, search, answer):
+    app.include_router(module.router)
+    app.include_router(
+        module.router,
+        prefix="/collections/{collection}",
+        dependencies=[Depends(collections.collection_path)],
+    )
 
 
 @app.get("/health", tags=["System"])
 async def health() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@app.get("/stats", tags=["System"])
+async def stats() -> dict[str, dict[str, object]]:
+    """Cache counters for this process."""
+    result_cache = get_result_cache()
+    return {
+        "query_embedding_cache": {**get_query_cache().stats()},
+        "embedding_batcher": {**get_embedding_batcher().stats()},
+        "result_cache": {
+            "backend": settings.result_cache_backend,
+            **(result_cache.stats() if result_cache is not None else {}),
+        },
+        "retrieval_coalescing": {**get_retrieval_flights().stats()},
+    }
@@ -1,59 +1,122 @@
-"""POST /answer — retrieve context then compose an answer."""
+"""POST /answer — retrieve context then compose an answer, whole or streamed.
+
+Also served under ``/collections/{collection}`` to answer from that collection.
+"""
 
 from __future__ import annotations
 
-from fastapi import APIRouter
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from contextlib import aclosing
+
+from fastapi import APIRouter, Response
+from fastapi.responses import StreamingResponse
 
+from ax_rag.api.routes.collections import CollectionScope
 from ax_rag.core.logging import get_logger
-from ax_rag.core.models import AnswerRequest, AnswerResponse, SearchResult
-from ax_rag.retrieval.hybrid import hybrid_retrieve
-from ax_rag.storage.pg import async_session
+from ax_rag.core.models import AnswerRequest, AnswerResponse, AnswerSources
+from ax_rag.generation.composer import get_composer
+from ax_rag.retrieval.cache import CacheStatus, cached_retrieve
+from ax_rag.retrieval.hybrid import RetrievalResult
+from ax_rag.storage.pg import SearchFilter
 
 router = APIRouter()
 logger = get_logger(__name__)
 
 
-def _compose_answer(question: str, context_chunks: list[str]) -> str:
-    """Build an answer from retrieved context.
-
-    In a production system this would call an LLM.  For the starter kit we
-    return the concatenated context with a header — demonstrating the full
-    retrieval pipeline without requiring an external API key.
-    """
-    if not context_chunks:
-        return "No relevant context found for your question."
-
-    context = "\n\n---\n\n".join(context_chunks)
-    return (
-        f"Based on {len(context_chunks)} retrieved passage(s):\n\n"
-        f"{context}\n\n"
-        f'(In production, an LLM would synthesise an answer to: "{question}")'
+async def _retrieve(body: AnswerRequest, collection: str) -> tuple[RetrievalResult, CacheStatus]:
+    filters = body.filters.model_dump() if body.filters else {}
+    return await cached_retrieve(
+        body.question,
+        top_k=body.top_k,
+        search_filter=SearchFilter(collection=collection, **filters),
+        ef_search=body.ef_search,
+        probes=body.probes,
     )
 
 
 @router.post("/answer", response_model=AnswerResponse, tags=["Answer"])
-async def answer(body: AnswerRequest) -> AnswerResponse:
-    """Retrieve relevant context and compose an answer."""
+async def answer(
+    body: AnswerRequest, response: Response, collection: CollectionScope
+) -> AnswerResponse:
+    """Retrieve relevant context and compose an answer.
+
+    ``X-Cache`` says whether the context came from the result cache.
+    """
     logger.info("answer", question=body.question, top_k=body.top_k)
 
-    async with async_session() as session:
-        scored = await hybrid_retrieve(session, body.question, top_k=body.top_k)
-
-    sources = [
-        SearchResult(
-            chunk_id=s.chunk_id,
-            text=s.text,
-            score=s.score,
-            source=s.source,
-            created_at=s.created_at,
-        )
-        for s in scored
-    ]
-
-    composed = _compose_answer(body.question, [s.text for s in scored])
-
-    return AnswerResponse(
-        question=body.question,
-        answer=composed,
-        sources=sources,
+    retrieved, cache_status = await _retrieve(body, collection)
+    response.headers["X-Cache"] = cache_status
+    scored = retrieved.chunks
+
+    pieces = get_composer().compose(body.question, [s.text for s in scored])
+    composed = "".join([piece async for piece in pieces])
+
+    # ChunkHit records validate straight into SearchResult (from_attributes)
+    return AnswerResponse.model_validate(
+        {
+            "question": body.question,
+            "answer": composed,
+            "sources": scored,
+            "partial": retrieved.partial,
+        }
+    )
+
+
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@router.post(
+    "/answer/stream",
+    response_class=StreamingResponse,
+    tags=["Answer"],
+    responses={
+        200: {
+            "description": "Server-sent events: sources, then token..., then done (or error)",
+            "content": {"text/event-stream": {}},
+        }
+    },
+)
+async def answer_stream(body: AnswerRequest, collection: CollectionScope) -> StreamingResponse:
+    """Like ``POST /answer``, streamed as server-sent events.
+
+    A ``sources`` event (:class:`AnswerSources`) is sent as soon as retrieval
+    returns, then one ``token`` event (``{"text": ...}``) per piece of the
+    answer as the composer yields it, then ``done``.  A failure ends the
+    stream with an ``error`` event.  When the client disconnects, the
+    retrieval and the composer are cancelled.
+    """
+    logger.info("answer_stream", question=body.question, top_k=body.top_k)
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            retrieved, cache_status = await _retrieve(body, collection)
+            sources = AnswerSources.model_validate(
+                {
+                    "question": body.question,
+                    "sources": retrieved.chunks,
+                    "partial": retrieved.partial,
+                    "cache": cache_status,
+                }
+            )
+            yield _sse("sources", sources.model_dump_json())
+
+            contexts = [c.text for c in retrieved.chunks]
+            async with aclosing(get_composer().compose(body.question, contexts)) as pieces:
+                async for piece in pieces:
+                    yield _sse("token", json.dumps({"text": piece}))
+            yield _sse("done", "{}")
+        except asyncio.CancelledError:
+            logger.info("answer_stream_cancelled", question=body.question)
+            raise
+        except Exception as exc:
+            logger.warning("answer_stream_failed", question=body.question, error=str(exc))
+            yield _sse("error", json.dumps({"detail": "Answer generation failed"}))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
@@ -0,0 +1,98 @@
+"""/collections — separate corpora, each stored and searched in its own partitions.
+
+The ingestion, search and answer routes are also served under
+``/collections/{collection}``; without that prefix they use the ``default``
+collection.
+"""
+
+from __future__ import annotations
+
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+
+from ax_rag.core.logging import get_logger
+from ax_rag.core.models import CollectionCreate, CollectionInfo
+from ax_rag.storage.pg import (
+    DEFAULT_COLLECTION,
+    async_session,
+    collection_exists,
+    create_collection,
+    drop_collection,
+    list_collections,
+)
+
+router = APIRouter()
+logger = get_logger(__name__)
+
+
+async def collection_scope(request: Request) -> str:
+    """The collection a request works on: the ``{collection}`` path segment, if any.
+
+    Takes no parameters of its own, so the unprefixed routes document none;
+    the prefixed ones check the segment with :func:`collection_path`.
+    """
+    collection: str = request.path_params.get("collection", DEFAULT_COLLECTION)
+    return collection
+
+
+CollectionScope = Annotated[str, Depends(collection_scope)]
+
+
+async def collection_path(collection: str) -> None:
+    """Dependency of the routes under ``/collections/{collection}``.
+
+    Answers 404 for an unknown collection.  The default collection always
+    exists, so its requests skip the lookup.
+    """
+    if collection != DEFAULT_COLLECTION:
+        async with async_session() as session:
+            if not await collection_exists(session, collection):
+                raise HTTPException(status_code=404, detail=f"Collection '{collection}' not found")
+
+
+@router.get("/collections", response_model=list[CollectionInfo], tags=["Collections"])
+async def get_collections() -> list[CollectionInfo]:
+    async with async_session() as session:
+        rows = await list_collections(session)
+    return [CollectionInfo.model_validate(row._asdict()) for row in rows]
+
+
+@router.post(
+    "/collections",
+    response_model=CollectionInfo,
+    status_code=201,
+    tags=["Collections"],
+    responses={409: {"description": "The collection already exists"}},
+)
+async def post_collection(body: CollectionCreate) -> CollectionInfo:
+    """Create an empty collection, with its own partitions and indexes."""
+    async with async_session() as session, session.begin():
+        created_at = await create_collection(session, body.name)
+    if created_at is None:
+        raise HTTPException(status_code=409, detail=f"Collection '{body.name}' already exists")
+    return CollectionInfo(name=body.name, created_at=created_at, chunks=0)
+
+
+@router.delete(
+    "/collections/{name}",
+    status_code=204,
+    tags=["Collections"],
+    responses={
+        404: {"description": "No such collection"},
+        409: {"description": "The default collection cannot be dropped"},
+    },
+)
+async def delete_collection(name: str) -> Response:
+    """Drop a collection with all its documents and chunks.
+
+    Its partitions are detached and dropped rather than emptied row by row,
+    and its pending ingest jobs fail.
+    """
+    if name == DEFAULT_COLLECTION:
+        raise HTTPException(status_code=409, detail="The default collection cannot be dropped")
+    async with async_session() as session, session.begin():
+        dropped = await drop_collection(session, name)
+    if not dropped:
+        raise HTTPException(status_code=404, detail=f"Collection '{name}' not found")
+    return Response(status_code=204)
@@ -1,71 +1,162 @@
-"""POST /ingest — upload text or file for ingestion."""
+"""POST /ingest — upload text or file for ingestion, now or through the job queue.
+
+Also served under ``/collections/{collection}`` to ingest into that collection.
+"""
 
 from __future__ import annotations
 
-from fastapi import APIRouter, File, UploadFile
+from collections.abc import AsyncIterator
+
+from fastapi import APIRouter, File, HTTPException, UploadFile
 
+from ax_rag.api.routes.collections import CollectionScope
+from ax_rag.core.config import settings
+from ax_rag.core.executor import run_cpu_bound
 from ax_rag.core.logging import get_logger
-from ax_rag.core.models import IngestResponse, IngestTextRequest
-from ax_rag.embedding.stub import get_embedder
+from ax_rag.core.models import IngestJobResponse, IngestResponse, IngestTextRequest
+from ax_rag.embedding.dedup import embed_chunks
 from ax_rag.ingestion.chunker import chunk_text
-from ax_rag.storage.pg import async_session, insert_chunks, insert_document
+from ax_rag.ingestion.jobs import notify_workers
+from ax_rag.ingestion.streaming import chunk_rows, ingest_stream
+from ax_rag.ingestion.upsert import upsert_text
+from ax_rag.storage.pg import (
+    async_session,
+    bump_generation,
+    enqueue_ingest_job,
+    get_ingest_job,
+    insert_chunks,
+    insert_document,
+)
 
 router = APIRouter()
 logger = get_logger(__name__)
 
+_QUEUE_FULL_RETRY_AFTER_S = 5
+
 
 @router.post("/ingest", response_model=IngestResponse, tags=["Ingestion"])
-async def ingest_text(body: IngestTextRequest) -> IngestResponse:
-    """Ingest raw text: chunk, embed, and store."""
-    embedder = get_embedder()
-    chunks = chunk_text(body.text)
+async def ingest_text(body: IngestTextRequest, collection: CollectionScope) -> IngestResponse:
+    """Ingest raw text: chunk, embed, and store.
+
+    Only chunks whose text has not been embedded before reach the embedder.
+    With ``external_id`` or ``upsert`` the stored document with that key
+    (``external_id``, else ``source``) is updated in place instead.
+    """
+    if body.upsert or body.external_id is not None:
+        return await _upsert(body, collection)
+
+    chunks = await run_cpu_bound(chunk_text, body.text)
     logger.info("ingesting_text", source=body.source, num_chunks=len(chunks))
 
+    embedded = await embed_chunks([c.text for c in chunks])
+
     async with async_session() as session, session.begin():
-        doc_id = await insert_document(session, source=body.source, raw_text=body.text)
-        chunk_rows = [
-            {
-                "text": c.text,
-                "chunk_index": c.index,
-                "source": body.source,
-                "embedding": embedder.embed(c.text),
-            }
-            for c in chunks
-        ]
-        count = await insert_chunks(session, doc_id, chunk_rows)
+        doc_id = await insert_document(
+            session, source=body.source, raw_text=body.text, collection=collection
+        )
+        count = await insert_chunks(
+            session, doc_id, chunk_rows(chunks, body.source, embedded), collection=collection
+        )
+        await bump_generation(session)
 
     return IngestResponse(
         document_id=doc_id,
         chunks_created=count,
+        embeddings_reused=embedded.reused,
+        embeddings_computed=embedded.computed,
         message=f"Ingested {count} chunks from source '{body.source}'",
     )
 
 
-@router.post("/ingest/file", response_model=IngestResponse, tags=["Ingestion"])
-async def ingest_file(file: UploadFile = File(...)) -> IngestResponse:  # noqa: B008
-    """Ingest an uploaded text file."""
-    content = (await file.read()).decode("utf-8")
-    source = file.filename or "upload"
-    logger.info("ingesting_file", filename=source, size=len(content))
+async def _upsert(body: IngestTextRequest, collection: str) -> IngestResponse:
+    key = body.external_id or body.source
+    logger.info("upserting_text", external_id=key, source=body.source)
+    result = await upsert_text(body.text, key, body.source, collection=collection)
+    return IngestResponse(
+        document_id=result.document_id,
+        chunks_created=result.chunks_created,
+        embeddings_reused=result.embeddings_reused,
+        embeddings_computed=result.embeddings_computed,
+        chunks_unchanged=result.chunks_unchanged,
+        chunks_deleted=result.chunks_deleted,
+        message=result.message(key),
+    )
+
 
-    embedder = get_embedder()
-    chunks = chunk_text(content)
+@router.post(
+    "/ingest/async",
+    response_model=IngestJobResponse,
+    status_code=202,
+    tags=["Ingestion"],
+    responses={429: {"description": "The ingestion queue is full"}},
+)
+async def ingest_async(body: IngestTextRequest, collection: CollectionScope) -> IngestJobResponse:
+    """Queue text for ingestion by a background worker and return its job at once.
 
+    Poll ``GET /ingest/jobs/{job_id}`` for the outcome.  Answers 429 while
+    ``INGEST_QUEUE_MAX_DEPTH`` jobs are waiting or running.
+    """
     async with async_session() as session, session.begin():
-        doc_id = await insert_document(session, source=source, raw_text=content)
-        chunk_rows = [
-            {
-                "text": c.text,
-                "chunk_index": c.index,
-                "source": source,
-                "embedding": embedder.embed(c.text),
-            }
-            for c in chunks
-        ]
-        count = await insert_chunks(session, doc_id, chunk_rows)
+        job_id = await enqueue_ingest_job(
+            session,
+            body.text,
+            body.source,
+            external_id=body.external_id,
+            upsert=body.upsert,
+            collection=collection,
+            max_depth=settings.ingest_queue_max_depth,
+        )
+    if job_id is None:
+        logger.warning("ingest_queue_full", source=body.source)
+        raise HTTPException(
+            status_code=429,
+            detail="Ingestion queue is full; retry later",
+            headers={"Retry-After": str(_QUEUE_FULL_RETRY_AFTER_S)},
+        )
+    notify_workers()
+    logger.info("ingest_job_queued", job_id=job_id, source=body.source)
+    return IngestJobResponse(
+        job_id=job_id, status="queued", collection=collection, source=body.source
+    )
+
+
+@router.get("/ingest/jobs/{job_id}", response_model=IngestJobResponse, tags=["Ingestion"])
+async def ingest_job(job_id: str, collection: CollectionScope) -> IngestJobResponse:
+    """Status of a job queued by ``POST /ingest/async``, with its result once done."""
+    async with async_session() as session:
+        job = await get_ingest_job(session, job_id)
+    if job is None or job.collection != collection:
+        raise HTTPException(status_code=404, detail=f"Ingest job '{job_id}' not found")
+    return IngestJobResponse.model_validate({"job_id": job.id, **job._asdict()})
+
+
+async def _read_blocks(file: UploadFile) -> AsyncIterator[bytes]:
+    while block := await file.read(settings.ingest_block_size):
+        yield block
+
+
+@router.post("/ingest/file", response_model=IngestResponse, tags=["Ingestion"])
+async def ingest_file(
+    collection: CollectionScope,
+    file: UploadFile = File(...),  # noqa: B008
+) -> IngestResponse:
+    """Ingest an uploaded text file.
+
+    The upload is streamed through the chunker and embedded and stored in
+    batches, so memory use does not grow with the file size.
+    """
+    source = file.filename or "upload"
+    logger.info("ingesting_file", filename=source, size=file.size)
+
+    try:
+        result = await ingest_stream(_read_blocks(file), source, collection=collection)
+    except UnicodeDecodeError as exc:
+        raise HTTPException(status_code=400, detail=f"File is not valid UTF-8: {exc}") from exc
 
     return IngestResponse(
-        document_id=doc_id,
-        chunks_created=count,
-        message=f"Ingested {count} chunks from file '{source}'",
+        document_id=result.document_id,
+        chunks_created=result.chunks_created,
+        embeddings_reused=result.embeddings_reused,
+        embeddings_computed=result.embeddings_computed,
+        message=f"Ingested {result.chunks_created} chunks from file '{source}'",
     )
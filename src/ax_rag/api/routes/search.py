@@ -1,13 +1,28 @@
-"""GET /search — hybrid keyword + vector search."""
+"""GET /search — hybrid keyword + vector search; POST /search/batch for many queries.
+
+Also served under ``/collections/{collection}`` to search that collection.
+"""
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Query
+from collections.abc import AsyncIterator
+from datetime import datetime
+from typing import Annotated
+
+from fastapi import APIRouter, Query, Response
+from fastapi.responses import StreamingResponse
 
+from ax_rag.api.routes.collections import CollectionScope
 from ax_rag.core.logging import get_logger
-from ax_rag.core.models import SearchResponse, SearchResult
-from ax_rag.retrieval.hybrid import hybrid_retrieve
-from ax_rag.storage.pg import async_session
+from ax_rag.core.models import (
+    BatchSearchRequest,
+    BatchSearchResult,
+    SearchFilters,
+    SearchResponse,
+)
+from ax_rag.retrieval.cache import cached_retrieve
+from ax_rag.retrieval.hybrid import iter_retrieve_many
+from ax_rag.storage.pg import SearchFilter
 
 router = APIRouter()
 logger = get_logger(__name__)
@@ -15,23 +30,104 @@ logger = get_logger(__name__)
 
 @router.get("/search", response_model=SearchResponse, tags=["Retrieval"])
 async def search(
+    response: Response,
+    collection: CollectionScope,
     q: str = Query(..., min_length=1, description="Search query"),
     top_k: int = Query(default=5, ge=1, le=50),
+    ef_search: int | None = Query(
+        default=None, ge=1, le=1000, description="HNSW ef_search for this request"
+    ),
+    probes: int | None = Query(
+        default=None, ge=1, le=10000, description="IVFFlat probes for this request"
+    ),
+    source: str | None = Query(default=None, description="Only chunks from this source"),
+    source_prefix: str | None = Query(
+        default=None, description="Only chunks whose source starts with this"
+    ),
+    document_id: Annotated[
+        list[str] | None,
+        Query(max_length=1000, description="Only chunks of these documents (repeatable)"),
+    ] = None,
+    created_after: Annotated[
+        datetime | None,
+        Query(description="Only chunks created at or after this time (UTC if naive)"),
+    ] = None,
+    created_before: Annotated[
+        datetime | None,
+        Query(description="Only chunks created before this time (UTC if naive)"),
+    ] = None,
 ) -> SearchResponse:
-    """Hybrid retrieval: keyword + vector similarity with reciprocal rank fusion."""
+    """Hybrid retrieval: keyword + vector similarity with reciprocal rank fusion.
+
+    The filters are pushed down into both legs.  ``X-Cache`` says whether the
+    results came from the result cache.
+    """
     logger.info("search", query=q, top_k=top_k)
+    filters = SearchFilters(
+        source=source,
+        source_prefix=source_prefix,
+        document_ids=document_id,
+        created_after=created_after,
+        created_before=created_before,
+    )
+
+    retrieved, cache_status = await cached_retrieve(
+        q,
+        top_k=top_k,
+        search_filter=SearchFilter(collection=collection, **filters.model_dump()),
+        ef_search=ef_search,
+        probes=probes,
+    )
+    response.headers["X-Cache"] = cache_status
+
+    # ChunkHit records validate straight into SearchResult (from_attributes)
+    return SearchResponse.model_validate(
+        {
+            "query": q,
+            "results": retrieved.chunks,
+            "count": len(retrieved.chunks),
+            "partial": retrieved.partial,
+        }
+    )
+
+
+@router.post(
+    "/search/batch",
+    response_class=StreamingResponse,
+    tags=["Retrieval"],
+    responses={
+        200: {
+            "description": "One BatchSearchResult JSON object per line, in query order",
+            "content": {"application/x-ndjson": {}},
+        }
+    },
+)
+async def search_batch(body: BatchSearchRequest, collection: CollectionScope) -> StreamingResponse:
+    """Hybrid retrieval for many queries, streamed back as NDJSON.
+
+    All queries are embedded in one call, and each retrieval leg runs as one
+    statement per ``SEARCH_BATCH_SIZE`` queries.  Lines are written as each
+    batch completes.  The result cache is bypassed.
+    """
+    logger.info("search_batch", queries=len(body.queries))
+    queries = [item.q for item in body.queries]
+
+    async def lines() -> AsyncIterator[bytes]:
+        async for index, retrieved in iter_retrieve_many(
+            queries,
+            [item.top_k for item in body.queries],
+            collection=collection,
+            ef_search=body.ef_search,
+            probes=body.probes,
+        ):
+            line = BatchSearchResult.model_validate(
+                {
+                    "index": index,
+                    "query": queries[index],
+                    "results": retrieved.chunks,
+                    "count": len(retrieved.chunks),
+                }
+            )
+            yield line.model_dump_json().encode() + b"\n"
 
-    async with async_session() as session:
-        scored = await hybrid_retrieve(session, q, top_k=top_k)
-
-    results = [
-        SearchResult(
-            chunk_id=s.chunk_id,
-            text=s.text,
-            score=s.score,
-            source=s.source,
-            created_at=s.created_at,
-        )
-        for s in scored
-    ]
-    return SearchResponse(query=q, results=results, count=len(results))
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -20,11 +20,68 @@ class Settings(BaseSettings):
     log_format: str = "console"
 
     # Embedding
+    embedding_provider: str = "hash"  # "hash" (offline stub) or "http" (OpenAI-compatible API)
     embedding_dim: int = 384
+    embedding_api_url: str = ""  # e.g. https://api.openai.com/v1/embeddings
+    embedding_api_key: str = ""
+    embedding_model: str = ""  # sent as "model"; omitted when empty
+    embedding_api_max_batch: int = 96  # texts per request; the provider's limit
+    embedding_api_concurrency: int = 8  # requests in flight (and pooled connections)
+    embedding_api_timeout_s: float = 30.0
+    embedding_api_max_retries: int = 3  # for connection errors, timeouts, 429 and 5xx
+    query_embedding_cache_size: int = 4096  # cached query vectors; 0 disables the cache
+    query_embedding_cache_ttl_s: float = 3600.0  # 0 = keep until evicted
+    embedding_batch_max_size: int = 64  # query embeds sent in one call; 1 disables batching
+    embedding_batch_max_wait_ms: float = 2.0  # longest a query waits for its batch to fill
+    embedding_dedup: bool = True  # reuse stored embeddings for chunk text seen before
+
+    # Retrieval
+    retrieval_budget_ms: int = 2000  # per-request deadline shared by both search legs
+    retrieval_fusion: str = "python"  # "python" (concurrent legs) or "database" (one query)
+    retrieval_coalescing: bool = True  # identical concurrent searches share one retrieval
+    keyword_search_mode: str = "fulltext"  # "fulltext", "substring" (pg_trgm) or "ilike"
+    text_search_config: str = "english"  # PostgreSQL text search configuration
+    result_cache_backend: str = "memory"  # "memory" (per process), "postgres" (shared) or "none"
+    result_cache_size: int = 10_000  # entries kept by the memory backend
+    result_cache_ttl_s: float = 300.0  # 0 = until evicted (memory) or 24 h (postgres)
+    search_batch_size: int = 32  # POST /search/batch queries per SQL statement (and flush)
+    filter_exact_max_rows: int = 10_000  # filters estimated to match fewer: exact search
+    filter_scan_mode: str = "iterative"  # broader filters: "iterative" ANN scans or "overfetch"
+    filter_overfetch_factor: int = 10  # "overfetch" reads this many times top_k candidates
+
+    # Answer
+    answer_composer: str = "stub"  # see ax_rag.generation.composer
+
+    # Vector storage: "vector" (float32) or "halfvec" (float16, half the size).
+    # Existing tables are converted with scripts/convert_embeddings.py.
+    embedding_storage: str = "vector"
+
+    # Vector index (rebuild with scripts/rebuild_index.py after changing)
+    vector_index_type: str = "hnsw"  # "hnsw" or "ivfflat"
+    vector_distance: str = "cosine"  # "cosine", "l2" or "inner_product"
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 64
+    hnsw_ef_search: int | None = None  # per-query default; None keeps the server's (40)
+    ivfflat_lists: int = 0  # 0 = derive from the row count when the index is built
+    ivfflat_probes: int | None = None  # per-query default; None keeps the server's (1)
 
     # Ingestion
     chunk_size: int = 512
     chunk_overlap: int = 64
+    chunk_insert_method: str = "copy"  # "copy" (binary COPY) or "orm" (per-row INSERT)
+    ingest_block_size: int = 64 * 1024  # bytes read per block from file uploads
+    ingest_batch_size: int = 256  # chunks embedded and written per batch
+    ingest_workers: int = 1  # job workers per API process; 0 = scripts/ingest_worker.py only
+    ingest_queue_max_depth: int = 1000  # pending jobs before POST /ingest/async returns 429
+    ingest_job_batch_size: int = 16  # jobs a worker claims, embeds and writes together
+    ingest_job_poll_interval_s: float = 1.0  # idle workers check the queue this often
+    ingest_job_max_attempts: int = 3
+    ingest_job_timeout_s: float = 600.0  # running jobs without a heartbeat this long are requeued
+
+    # CPU-bound work (chunking, embedding)
+    executor_kind: str = "process"  # "process" or "thread"
+    executor_max_workers: int = 4
+    executor_query_workers: int = 2  # threads embedding queries, apart from ingestion
 
     @property
     def database_url(self) -> str:
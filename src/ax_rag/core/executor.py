@@ -0,0 +1,114 @@
+"""Shared executor for CPU-bound work (chunking, embedding).
+
+Running this work inline in an ``async def`` handler blocks the event loop, so
+every concurrent request stalls behind a large ingest.  Handlers instead await
+:func:`run_cpu_bound`, which dispatches to one pool shared by the whole process
+and shut down from the API ``lifespan`` hook.
+
+Work for a single query (embedding it on a cache miss) takes microseconds,
+but queued behind ingestion in a FIFO pool it would wait for every upload
+ahead of it.  Calls made inside :func:`query_lane` therefore go to a small
+thread pool of their own (``EXECUTOR_QUERY_WORKERS``), which ingestion never
+uses, so search latency does not depend on the ingest backlog.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import multiprocessing
+from collections.abc import Callable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import ParamSpec, TypeVar
+
+from ax_rag.core.config import settings
+from ax_rag.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+_executor: Executor | None = None
+_query_executor: Executor | None = None
+_in_query_lane: ContextVar[bool] = ContextVar("in_query_lane", default=False)
+
+
+def _create_executor() -> Executor:
+    kind = settings.executor_kind
+    workers = settings.executor_max_workers
+    if kind == "process":
+        # "spawn" keeps children from inheriting the event loop and open DB sockets.
+        return ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ax-rag-cpu")
+    raise ValueError(f"executor_kind must be 'process' or 'thread', got {kind!r}")
+
+
+def get_executor() -> Executor:
+    """Return the shared executor, creating it on first use."""
+    global _executor
+    if _executor is None:
+        _executor = _create_executor()
+        logger.info(
+            "executor_started",
+            kind=settings.executor_kind,
+            max_workers=settings.executor_max_workers,
+        )
+    return _executor
+
+
+def get_query_executor() -> Executor:
+    """Return the query lane's thread pool, creating it on first use.
+
+    Threads whatever ``EXECUTOR_KIND`` says: its work is too small to be
+    worth pickling to another process.
+    """
+    global _query_executor
+    if _query_executor is None:
+        _query_executor = ThreadPoolExecutor(
+            max_workers=settings.executor_query_workers, thread_name_prefix="ax-rag-query"
+        )
+    return _query_executor
+
+
+@contextmanager
+def query_lane() -> Iterator[None]:
+    """Send :func:`run_cpu_bound` calls made inside to the query pool.
+
+    For work done on behalf of one search request; it follows the current
+    task (a context variable), not the thread.
+    """
+    token = _in_query_lane.set(True)
+    try:
+        yield
+    finally:
+        _in_query_lane.reset(token)
+
+
+async def run_cpu_bound(func: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+    """Run *func* on the shared executor without blocking the event loop.
+
+    With the process pool, *func* and its arguments must be picklable.
+    Inside :func:`query_lane` the query pool is used instead.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_query_executor() if _in_query_lane.get() else get_executor()
+    return await loop.run_in_executor(pool, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executor(wait: bool = True) -> None:
+    """Shut down the shared executors; the next calls recreate them."""
+    global _executor, _query_executor
+    if _query_executor is not None:
+        _query_executor.shutdown(wait=wait, cancel_futures=True)
+        _query_executor = None
+    if _executor is None:
+        return
+    _executor.shutdown(wait=wait, cancel_futures=True)
+    _executor = None
+    logger.info("executor_shutdown")
@@ -2,9 +2,9 @@
 
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import UTC, datetime
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 # ── Ingestion ─────────────────────────────────────────────────────────────────
 
@@ -12,18 +12,46 @@ from pydantic import BaseModel, Field
 class IngestTextRequest(BaseModel):
     text: str = Field(..., min_length=1, description="Raw text to ingest")
     source: str = Field(default="manual", description="Source label for metadata")
+    external_id: str | None = Field(
+        default=None,
+        max_length=512,
+        description="Stable document id; replaces the document with this id incrementally",
+    )
+    upsert: bool = Field(
+        default=False, description="Replace the document with the same external_id, or source"
+    )
 
 
 class IngestResponse(BaseModel):
     document_id: str
     chunks_created: int
+    embeddings_reused: int = Field(default=0, description="Chunks whose embedding was reused")
+    embeddings_computed: int = Field(default=0, description="Chunks sent to the embedder")
+    chunks_unchanged: int = Field(default=0, description="Chunks kept by an upsert")
+    chunks_deleted: int = Field(default=0, description="Chunks removed by an upsert")
     message: str
 
 
+class IngestJobResponse(BaseModel):
+    job_id: str
+    status: str = Field(description="queued, running, done or failed")
+    collection: str
+    source: str
+    attempts: int = Field(default=0, description="Times a worker has picked the job up")
+    result: IngestResponse | None = Field(default=None, description="Set once the job is done")
+    error: str | None = Field(default=None, description="Why the last attempt failed")
+    created_at: datetime | None = None
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
 # ── Search ────────────────────────────────────────────────────────────────────
 
 
 class SearchResult(BaseModel):
+    # Validated straight from the storage layer's ChunkHit records
+    model_config = ConfigDict(from_attributes=True)
+
     chunk_id: str
     text: str
     score: float
@@ -31,10 +59,60 @@ class SearchResult(BaseModel):
     created_at: datetime
 
 
+class SearchFilters(BaseModel):
+    """Metadata conditions applied inside both retrieval legs; unset fields match all."""
+
+    source: str | None = Field(default=None, description="Only chunks from this source")
+    source_prefix: str | None = Field(
+        default=None, description="Only chunks whose source starts with this"
+    )
+    document_ids: list[str] | None = Field(
+        default=None, max_length=1000, description="Only chunks of these documents"
+    )
+    created_after: datetime | None = Field(
+        default=None, description="Only chunks created at or after this time (UTC if naive)"
+    )
+    created_before: datetime | None = Field(
+        default=None, description="Only chunks created before this time (UTC if naive)"
+    )
+
+    @field_validator("created_after", "created_before")
+    @classmethod
+    def _assume_utc(cls, value: datetime | None) -> datetime | None:
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=UTC)
+        return value
+
+
 class SearchResponse(BaseModel):
     query: str
     results: list[SearchResult]
     count: int
+    partial: bool = Field(default=False, description="True if a retrieval leg missed its deadline")
+
+
+class BatchSearchQuery(BaseModel):
+    q: str = Field(..., min_length=1, description="Search query")
+    top_k: int = Field(default=5, ge=1, le=50)
+
+
+class BatchSearchRequest(BaseModel):
+    queries: list[BatchSearchQuery] = Field(..., min_length=1, max_length=1000)
+    ef_search: int | None = Field(
+        default=None, ge=1, le=1000, description="HNSW ef_search for every query"
+    )
+    probes: int | None = Field(
+        default=None, ge=1, le=10000, description="IVFFlat probes for every query"
+    )
+
+
+class BatchSearchResult(BaseModel):
+    """One line of the ``POST /search/batch`` NDJSON stream."""
+
+    index: int = Field(description="Position of the query in the request")
+    query: str
+    results: list[SearchResult]
+    count: int
 
 
 # ── Answer ────────────────────────────────────────────────────────────────────
@@ -43,9 +121,46 @@ class SearchResponse(BaseModel):
 class AnswerRequest(BaseModel):
     question: str = Field(..., min_length=1)
     top_k: int = Field(default=5, ge=1, le=50)
+    ef_search: int | None = Field(
+        default=None, ge=1, le=1000, description="HNSW ef_search for this request"
+    )
+    probes: int | None = Field(
+        default=None, ge=1, le=10000, description="IVFFlat probes for this request"
+    )
+    filters: SearchFilters | None = Field(
+        default=None, description="Restrict retrieval to matching chunks"
+    )
 
 
 class AnswerResponse(BaseModel):
     question: str
     answer: str
     sources: list[SearchResult]
+    partial: bool = Field(default=False, description="True if a retrieval leg missed its deadline")
+
+
+class AnswerSources(BaseModel):
+    """The first event of ``POST /answer/stream``."""
+
+    question: str
+    sources: list[SearchResult]
+    partial: bool = Field(default=False, description="True if a retrieval leg missed its deadline")
+    cache: str = Field(description="HIT, MISS or BYPASS, as in X-Cache on /answer")
+
+
+# ── Collections ───────────────────────────────────────────────────────────────
+
+
+class CollectionCreate(BaseModel):
+    # The name becomes part of table names (ax_rag.storage.pg.partition_name)
+    name: str = Field(
+        ...,
+        pattern=r"^[a-z][a-z0-9_]{0,31}$",
+        description="1-32 lowercase letters, digits or underscores, starting with a letter",
+    )
+
+
+class CollectionInfo(BaseModel):
+    name: str
+    created_at: datetime
+    chunks: int = Field(description="Estimated chunk count, from the planner's statistics")
@@ -0,0 +1,70 @@
+"""Coalesce identical concurrent calls into one.
+
+When many requests for the same thing arrive together, only the first
+(the leader) runs the work; the others await the leader's task and share
+its result or exception.  Unlike a cache, nothing is kept once the call
+finishes: a caller arriving afterwards starts a new call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Coroutine, Hashable
+from dataclasses import dataclass
+from typing import Any, Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+
+@dataclass(eq=False, slots=True)
+class _Flight(Generic[T]):
+    task: asyncio.Task[T]
+    waiters: int = 0
+
+
+class SingleFlight(Generic[K, T]):
+    """At most one in-flight call per key; concurrent callers share it.
+
+    The shared call runs as its own task, so a caller that is cancelled (for
+    example because its client disconnected) does not cancel it for the
+    others.  Once every caller has been cancelled the call is cancelled too,
+    so abandoned work stops.  Instances belong to one event loop.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[K, _Flight[T]] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: K, fn: Callable[[], Coroutine[Any, Any, T]]) -> T:
+        """Return ``await fn()``, joining the call already in flight for *key* if any."""
+        flight = self._calls.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(fn()))
+            self._calls[key] = flight
+            flight.task.add_done_callback(lambda _: self._finish(key, flight))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # Every caller is gone; a caller arriving now starts afresh
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: K, flight: _Flight[T]) -> None:
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+
+    def _finish(self, key: K, flight: _Flight[T]) -> None:
+        self._forget(key, flight)
+        if not flight.task.cancelled():
+            flight.task.exception()  # retrieved here too, in case every caller went away
+
+    def stats(self) -> dict[str, float]:
+        return {"in_flight": len(self._calls), "calls": self.calls, "coalesced": self.coalesced}
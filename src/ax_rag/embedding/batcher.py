@@ -0,0 +1,129 @@
+"""Dynamic micro-batching of embedding calls across concurrent requests.
+
+Every ``/search`` and ``/answer`` embeds a single query, but embedding
+backends are far more efficient per item in batches: one HTTP round trip or
+one forward pass for many texts.  :class:`MicroBatcher` collects
+:meth:`~MicroBatcher.embed` calls for up to ``EMBEDDING_BATCH_MAX_SIZE``
+texts or ``EMBEDDING_BATCH_MAX_WAIT_MS`` milliseconds, whichever comes first,
+sends them as one ``aembed_batch`` and hands each caller its row.  Under
+light load a query waits at most the batching window; under heavy load the
+batches fill up and the window does not matter.  Batches run in the
+executor's query lane, never queued behind ingestion.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+import numpy as np
+import numpy.typing as npt
+
+from ax_rag.core.config import settings
+from ax_rag.core.executor import query_lane
+from ax_rag.core.logging import get_logger
+from ax_rag.embedding.stub import Embedder, get_embedder
+
+logger = get_logger(__name__)
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-text embeds into ``aembed_batch`` calls.
+
+    Identical texts in one batch are embedded once.  If the batch fails,
+    every caller in it gets the exception; if the batch itself is cancelled
+    (at shutdown, say), so are its callers.  A caller that is cancelled while
+    waiting leaves the batch to complete for the others.  Instances belong
+    to one event loop.
+    """
+
+    def __init__(self, embedder: Embedder, *, max_size: int, max_wait_ms: float) -> None:
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.embedder = embedder
+        self.max_size = max_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: list[tuple[str, asyncio.Future[npt.NDArray[np.float32]]]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._dispatches: set[asyncio.Task[None]] = set()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    async def embed(self, text: str) -> npt.NDArray[np.float32]:
+        """Embed *text* as part of the next batch; return its ``(dim,)`` vector."""
+        if self.max_size == 1:
+            self._count(1)
+            with query_lane():
+                vectors = await self.embedder.aembed_batch([text])
+            return vectors[0]  # type: ignore[no-any-return]
+
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[npt.NDArray[np.float32]] = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(
+        self, batch: list[tuple[str, asyncio.Future[npt.NDArray[np.float32]]]]
+    ) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self._count(len(texts))
+        try:
+            with query_lane():
+                vectors = await self.embedder.aembed_batch(texts)
+        except Exception as exc:
+            logger.warning("embedding_batch_failed", size=len(texts), error=str(exc))
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        except BaseException:
+            # Cancelled, or the loop is going down: nobody else will resolve these
+            for _, future in batch:
+                future.cancel()
+            raise
+        rows = dict(zip(texts, vectors, strict=True))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(rows[text])
+
+    def _count(self, size: int) -> None:
+        self.batches += 1
+        self.items += size
+        self.largest_batch = max(self.largest_batch, size)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+        }
+
+
+_batcher: MicroBatcher | None = None
+
+
+def get_embedding_batcher() -> MicroBatcher:
+    """Return the process-wide batcher for the shared embedder, creating it on first use."""
+    global _batcher
+    if _batcher is None:
+        _batcher = MicroBatcher(
+            get_embedder(),
+            max_size=settings.embedding_batch_max_size,
+            max_wait_ms=settings.embedding_batch_max_wait_ms,
+        )
+    return _batcher
@@ -0,0 +1,131 @@
+"""Bounded LRU cache for query embeddings.
+
+Search traffic repeats a small set of queries, and with a remote embedding
+provider every miss is a network round trip.  :func:`embed_query` keys
+vectors by embedder identity, dimension and normalised query text, evicts
+the least recently used entry beyond ``QUERY_EMBEDDING_CACHE_SIZE`` and
+expires entries after ``QUERY_EMBEDDING_CACHE_TTL_S``.  The counters are
+served by ``GET /stats``.
+
+The serving path uses :func:`aembed_query`, whose misses go through the
+cross-request :class:`~ax_rag.embedding.batcher.MicroBatcher`, and
+:func:`aembed_queries` for requests that bring many queries at once.
+"""
+
+from __future__ import annotations
+
+import unicodedata
+
+import numpy as np
+import numpy.typing as npt
+
+from ax_rag.core.cache import LRUCache
+from ax_rag.core.config import settings
+from ax_rag.core.executor import query_lane
+from ax_rag.embedding.batcher import MicroBatcher, get_embedding_batcher
+from ax_rag.embedding.stub import Embedder, get_embedder
+
+CacheKey = tuple[str, int, str]
+QueryVector = npt.NDArray[np.float32]
+QueryEmbeddingCache = LRUCache[CacheKey, QueryVector]
+
+
+_cache: QueryEmbeddingCache | None = None
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    """Return the process-wide query embedding cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        _cache = QueryEmbeddingCache(
+            settings.query_embedding_cache_size, settings.query_embedding_cache_ttl_s
+        )
+    return _cache
+
+
+def normalize_query(query: str) -> str:
+    """NFC-normalise *query* and collapse runs of whitespace."""
+    return " ".join(unicodedata.normalize("NFC", query).split())
+
+
+def embed_query(
+    query: str,
+    *,
+    embedder: Embedder | None = None,
+    cache: QueryEmbeddingCache | None = None,
+) -> QueryVector:
+    """Embed the normalised *query*, reusing a cached vector when there is one.
+
+    The normalised text is what gets embedded, so a hit and a miss for
+    equivalent queries return the same vector.  It is shared between
+    callers, so it is returned read-only.
+    """
+    if embedder is None:
+        embedder = get_embedder()
+    if cache is None:
+        cache = get_query_cache()
+    text = normalize_query(query)
+    key = _cache_key(embedder, text)
+    vector = cache.get(key)
+    if vector is None:
+        vector = embedder.embed_batch([text])[0]
+        vector.flags.writeable = False
+        cache.put(key, vector)
+    return vector
+
+
+async def aembed_query(
+    query: str,
+    *,
+    batcher: MicroBatcher | None = None,
+    cache: QueryEmbeddingCache | None = None,
+) -> QueryVector:
+    """Like :func:`embed_query`, but misses are embedded by *batcher*.
+
+    Concurrent misses from different requests share one ``aembed_batch``
+    call, and the event loop is never blocked on the embedder.
+    """
+    if batcher is None:
+        batcher = get_embedding_batcher()
+    if cache is None:
+        cache = get_query_cache()
+    text = normalize_query(query)
+    key = _cache_key(batcher.embedder, text)
+    vector = cache.get(key)
+    if vector is None:
+        vector = await batcher.embed(text)
+        vector.flags.writeable = False
+        cache.put(key, vector)
+    return vector
+
+
+async def aembed_queries(
+    queries: list[str],
+    *,
+    embedder: Embedder | None = None,
+    cache: QueryEmbeddingCache | None = None,
+) -> list[QueryVector]:
+    """Embed many *queries*, all cache misses in one ``aembed_batch`` call.
+
+    Like :func:`aembed_query` for each query, but the misses of one request
+    need no batching window to share a call.
+    """
+    if embedder is None:
+        embedder = get_embedder()
+    if cache is None:
+        cache = get_query_cache()
+    keys = [_cache_key(embedder, normalize_query(q)) for q in queries]
+    found = {key: vector for key in keys if (vector := cache.get(key)) is not None}
+    missing = list(dict.fromkeys(key for key in keys if key not in found))
+    if missing:
+        with query_lane():
+            vectors = await embedder.aembed_batch([key[2] for key in missing])
+        for key, vector in zip(missing, vectors, strict=True):
+            vector.flags.writeable = False
+            cache.put(key, vector)
+            found[key] = vector
+    return [found[key] for key in keys]
+
+
+def _cache_key(embedder: Embedder, text: str) -> CacheKey:
+    return (embedder.name, embedder.dim, text)
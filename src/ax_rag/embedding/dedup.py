@@ -0,0 +1,140 @@
+"""Content-addressed chunk embeddings.
+
+Corpora repeat themselves: licence headers, email footers, successive
+versions of the same document.  Each chunk is keyed by :func:`content_hash`
+(embedder, dimension and normalised text), and :func:`embed_chunks` only
+embeds hashes missing from the ``chunk_embeddings`` table, storing the new
+vectors there for the next ingest.  With a paid provider every reused
+vector is a request not made.
+
+The normalised text is what gets embedded, as for queries, so texts that
+differ only in whitespace or Unicode composition share a hash and get the
+same vector whichever came first.  Disable with ``EMBEDDING_DEDUP=false``;
+hashes are still recorded on the chunks, and the vectors are unchanged.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+import numpy as np
+import numpy.typing as npt
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ax_rag.core.config import settings
+from ax_rag.core.executor import run_cpu_bound
+from ax_rag.embedding.cache import normalize_query
+from ax_rag.embedding.stub import Embedder, get_embedder
+from ax_rag.storage.pg import async_session, get_embeddings_by_hash, put_embeddings_by_hash
+
+
+def content_hash(text: str, embedder: Embedder) -> str:
+    """Hex SHA-256 of the embedder name, its dimension and the normalised *text*."""
+    return _hash_normalised(normalize_query(text), embedder.name, embedder.dim)
+
+
+def _hash_normalised(normalised: str, name: str, dim: int) -> str:
+    key = f"{name}\0{dim}\0{normalised}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _normalise_and_hash(texts: list[str], name: str, dim: int) -> tuple[list[str], list[str]]:
+    normalised = [normalize_query(t) for t in texts]
+    return normalised, [_hash_normalised(t, name, dim) for t in normalised]
+
+
+@dataclass(slots=True)
+class ChunkEmbeddings:
+    """Embeddings for a batch of chunk texts, in input order."""
+
+    hashes: list[str]
+    vectors: npt.NDArray[np.float32]
+    reused: int = 0
+    computed: int = 0
+    fresh: list[bool] = field(default_factory=list)  # per text: embedded by this call
+
+    def split(self, sizes: Sequence[int]) -> list[ChunkEmbeddings]:
+        """Cut into consecutive parts of *sizes* texts, e.g. one per document.
+
+        Each vector embedded by the call is counted as computed in the part
+        holding the first text with its hash, and as reused elsewhere.
+        """
+        parts = []
+        start = 0
+        for n in sizes:
+            fresh = self.fresh[start : start + n]
+            computed = sum(fresh)
+            parts.append(
+                ChunkEmbeddings(
+                    self.hashes[start : start + n],
+                    self.vectors[start : start + n],
+                    reused=n - computed,
+                    computed=computed,
+                    fresh=fresh,
+                )
+            )
+            start += n
+        return parts
+
+
+async def _aembed_in_slices(embedder: Embedder, texts: list[str]) -> npt.NDArray[np.float32]:
+    size = settings.ingest_batch_size
+    if len(texts) <= size:
+        return await embedder.aembed_batch(texts)
+    slices = [await embedder.aembed_batch(texts[i : i + size]) for i in range(0, len(texts), size)]
+    return np.concatenate(slices)
+
+
+async def embed_chunks(
+    texts: list[str],
+    *,
+    embedder: Embedder | None = None,
+    session_factory: async_sessionmaker[AsyncSession] = async_session,
+) -> ChunkEmbeddings:
+    """Embed *texts*, reusing stored vectors for content seen before.
+
+    Duplicates within the batch are embedded once too.  Texts are embedded
+    ``INGEST_BATCH_SIZE`` at a time, so a large upload takes the shared
+    executor in turns with other uploads instead of holding a worker for
+    seconds.  New vectors are
+    stored in their own short transaction, so they are kept even if the
+    caller's ingest later fails, and a long ingest never holds locks on
+    ``chunk_embeddings``.
+    """
+    if embedder is None:
+        embedder = get_embedder()
+    # Thousands of texts per upload: keep the hashing off the event loop too
+    normalised, hashes = await run_cpu_bound(
+        _normalise_and_hash, texts, embedder.name, embedder.dim
+    )
+    if not settings.embedding_dedup:
+        vectors = await _aembed_in_slices(embedder, normalised)
+        return ChunkEmbeddings(hashes, vectors, computed=len(texts), fresh=[True] * len(texts))
+
+    unique_text: dict[str, str] = {}
+    for h, t in zip(hashes, normalised, strict=True):
+        unique_text.setdefault(h, t)
+    async with session_factory() as session:
+        known = await get_embeddings_by_hash(session, list(unique_text))
+    missing = [h for h in unique_text if h not in known]
+    if missing:
+        computed = await _aembed_in_slices(embedder, [unique_text[h] for h in missing])
+        async with session_factory() as session, session.begin():
+            await put_embeddings_by_hash(session, missing, computed)
+        known.update(zip(missing, computed, strict=True))
+
+    unseen = set(missing)
+    fresh = []
+    for h in hashes:
+        fresh.append(h in unseen)
+        unseen.discard(h)
+    vectors = (
+        np.stack([known[h] for h in hashes]).astype(np.float32, copy=False)
+        if hashes
+        else np.empty((0, embedder.dim), dtype=np.float32)
+    )
+    return ChunkEmbeddings(
+        hashes, vectors, reused=len(texts) - len(missing), computed=len(missing), fresh=fresh
+    )
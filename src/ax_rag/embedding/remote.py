@@ -0,0 +1,204 @@
+"""Embedding provider reached over HTTP.
+
+:class:`HttpEmbedder` speaks the OpenAI-compatible ``/embeddings`` API served
+by OpenAI, Azure OpenAI, vLLM, Hugging Face TEI, Ollama and most gateways:
+``POST {"model": ..., "input": [...]}`` returning ``{"data": [{"index": i,
+"embedding": [...]}, ...]}``.  Select it with ``EMBEDDING_PROVIDER=http``; it
+needs the ``http`` extra (``pip install -e ".[http]"``).
+
+What a naive client gets wrong, and this one does not:
+
+* one keep-alive connection pool per process instead of a connection (and
+  TLS handshake) per call;
+* inputs split into requests of at most ``EMBEDDING_API_MAX_BATCH`` texts,
+  sent concurrently but never more than ``EMBEDDING_API_CONCURRENCY`` at once;
+* connection errors, timeouts, 429 and 5xx retried with exponential backoff
+  and jitter, honouring ``Retry-After``; other errors raised immediately;
+* a per-request timeout (``EMBEDDING_API_TIMEOUT_S``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import random
+import time
+from typing import Any
+
+import httpx
+import numpy as np
+import numpy.typing as npt
+
+from ax_rag.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+_MAX_BACKOFF_S = 30.0
+
+
+class HttpEmbedder:
+    """Embedder backed by an OpenAI-compatible HTTP embeddings endpoint.
+
+    The async pool and concurrency limit belong to the event loop that first
+    uses them, like the database engine.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        dim: int,
+        *,
+        model: str = "",
+        api_key: str = "",
+        max_batch_size: int = 96,
+        max_concurrency: int = 8,
+        timeout_s: float = 30.0,
+        max_retries: int = 3,
+        backoff_s: float = 0.5,
+    ) -> None:
+        if not url:
+            raise ValueError("embedding_api_url must be set for the http embedding provider")
+        self.url = url
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self._dim = dim
+        self._headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._timeout = httpx.Timeout(timeout_s)
+        self._limits = httpx.Limits(
+            max_connections=max_concurrency, max_keepalive_connections=max_concurrency
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: httpx.AsyncClient | None = None
+        self._sync_client: httpx.Client | None = None
+
+    @property
+    def dim(self) -> int:
+        return self._dim
+
+    @property
+    def name(self) -> str:
+        return f"http:{self.model or self.url}"
+
+    # ── async (serving and ingest paths) ──────────────────────────────────
+
+    async def aembed_batch(self, texts: list[str]) -> npt.NDArray[np.float32]:
+        """Embed *texts* in concurrent requests of at most ``max_batch_size``."""
+        if not texts:
+            return np.empty((0, self._dim), dtype=np.float32)
+        parts = await asyncio.gather(
+            *(self._apost(texts[i : i + self.max_batch_size]) for i in self._offsets(texts))
+        )
+        return np.concatenate(parts)
+
+    async def _apost(self, texts: list[str]) -> npt.NDArray[np.float32]:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers=self._headers, timeout=self._timeout, limits=self._limits
+            )
+        attempt = 0
+        async with self._semaphore:
+            while True:
+                try:
+                    response = await self._client.post(self.url, json=self._payload(texts))
+                except httpx.TransportError as exc:
+                    if attempt == self.max_retries:
+                        raise
+                    delay = self._backoff(attempt, None, exc)
+                else:
+                    if response.status_code not in _RETRY_STATUSES or attempt == self.max_retries:
+                        return self._parse(response, len(texts))
+                    delay = self._backoff(attempt, response, None)
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        """Close the connection pools; they are reopened on next use."""
+        if self._client is not None:
+            await self._client.aclose()
+        if self._sync_client is not None:
+            self._sync_client.close()
+
+    # ── sync (scripts and the Embedder protocol) ──────────────────────────
+
+    def embed(self, text: str) -> list[float]:
+        return self.embed_batch([text])[0].tolist()  # type: ignore[no-any-return]
+
+    def embed_batch(self, texts: list[str]) -> npt.NDArray[np.float32]:
+        """Blocking :meth:`aembed_batch`; requests are sent one after another."""
+        if not texts:
+            return np.empty((0, self._dim), dtype=np.float32)
+        return np.concatenate(
+            [self._post(texts[i : i + self.max_batch_size]) for i in self._offsets(texts)]
+        )
+
+    def _post(self, texts: list[str]) -> npt.NDArray[np.float32]:
+        if self._sync_client is None or self._sync_client.is_closed:
+            self._sync_client = httpx.Client(
+                headers=self._headers, timeout=self._timeout, limits=self._limits
+            )
+        attempt = 0
+        while True:
+            try:
+                response = self._sync_client.post(self.url, json=self._payload(texts))
+            except httpx.TransportError as exc:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt, None, exc)
+            else:
+                if response.status_code not in _RETRY_STATUSES or attempt == self.max_retries:
+                    return self._parse(response, len(texts))
+                delay = self._backoff(attempt, response, None)
+            attempt += 1
+            time.sleep(delay)
+
+    # ── shared ────────────────────────────────────────────────────────────
+
+    def _offsets(self, texts: list[str]) -> range:
+        return range(0, len(texts), self.max_batch_size)
+
+    def _payload(self, texts: list[str]) -> dict[str, Any]:
+        payload: dict[str, Any] = {"input": texts}
+        if self.model:
+            payload["model"] = self.model
+        return payload
+
+    def _backoff(
+        self, attempt: int, response: httpx.Response | None, exc: Exception | None
+    ) -> float:
+        """Seconds to wait before retry *attempt* + 1: ``Retry-After`` or jittered doubling.
+
+        Either way at most ``_MAX_BACKOFF_S``: a provider asking for an hour
+        would otherwise hold the request (and its caller) that long.
+        """
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        try:
+            delay = float(retry_after) if retry_after is not None else None
+        except ValueError:  # an HTTP date; fall back to our own schedule
+            delay = None
+        if delay is not None:
+            # nan would sleep forever (or raise in time.sleep); use our own schedule
+            delay = min(max(delay, 0.0), _MAX_BACKOFF_S) if math.isfinite(delay) else None
+        if delay is None:
+            delay = min(self.backoff_s * 2**attempt, _MAX_BACKOFF_S) * random.uniform(0.5, 1.0)
+        logger.warning(
+            "embedding_request_retry",
+            attempt=attempt + 1,
+            status=response.status_code if response is not None else None,
+            error=str(exc) if exc is not None else None,
+            delay_s=round(delay, 3),
+        )
+        return delay
+
+    def _parse(self, response: httpx.Response, n: int) -> npt.NDArray[np.float32]:
+        response.raise_for_status()
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        vectors = np.asarray([item["embedding"] for item in data], dtype=np.float32)
+        if vectors.shape != (n, self._dim):
+            raise ValueError(
+                f"embedding provider returned shape {vectors.shape}, expected {(n, self._dim)}; "
+                "check EMBEDDING_DIM"
+            )
+        return vectors
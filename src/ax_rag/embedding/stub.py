@@ -3,29 +3,51 @@
 Produces reproducible embeddings by hashing text into a fixed-dimension vector.
 Useful for development, testing, and running the full pipeline offline.
 
-To swap in a real provider (OpenAI, Cohere, etc.), implement the same
-``Embedder`` protocol and update the factory in this module.
+``EMBEDDING_PROVIDER`` selects the embedder (:func:`_create_embedder`):
+``hash`` (this one) or ``http`` for any OpenAI-compatible embeddings API
+(:class:`ax_rag.embedding.remote.HttpEmbedder`).  Other providers implement
+the same ``Embedder`` protocol and are added there.
 """
 
 from __future__ import annotations
 
 import hashlib
-import math
 import struct
 from typing import Protocol
 
+import numpy as np
+import numpy.typing as npt
+
 from ax_rag.core.config import settings
+from ax_rag.core.executor import run_cpu_bound
+
+# Each SHA-256 digest gives 32 bytes → 8 big-endian uint32 words → 8 floats.
+_DIGEST_SIZE = hashlib.sha256().digest_size
+_FLOATS_PER_DIGEST = _DIGEST_SIZE // 4
 
 
 class Embedder(Protocol):
-    """Minimal embedding interface."""
+    """Minimal embedding interface.
+
+    ``embed_batch`` returns a ``(len(texts), dim)`` float32 matrix; rows can be
+    handed to pgvector directly without converting to nested lists.
+    ``aembed_batch`` is the entry point for async callers and must not block
+    the event loop.
+    """
 
     @property
     def dim(self) -> int: ...
 
+    @property
+    def name(self) -> str:
+        """Identifies the model in cache keys: embedders whose vectors differ must differ."""
+        ...
+
     def embed(self, text: str) -> list[float]: ...
 
-    def embed_batch(self, texts: list[str]) -> list[list[float]]: ...
+    def embed_batch(self, texts: list[str]) -> npt.NDArray[np.float32]: ...
+
+    async def aembed_batch(self, texts: list[str]) -> npt.NDArray[np.float32]: ...
 
 
 class HashEmbedder:
@@ -38,36 +60,91 @@ class HashEmbedder:
 
     def __init__(self, dim: int | None = None) -> None:
         self._dim = dim or settings.embedding_dim
+        n_digests = -(-self._dim // _FLOATS_PER_DIGEST)
+        self._salts = [struct.pack(">I", idx) for idx in range(n_digests)]
 
     @property
     def dim(self) -> int:
         return self._dim
 
+    @property
+    def name(self) -> str:
+        return type(self).__qualname__
+
     def embed(self, text: str) -> list[float]:
-        raw: list[float] = []
-        base = text.encode("utf-8")
-        idx = 0
-        while len(raw) < self._dim:
-            digest = hashlib.sha256(base + struct.pack(">I", idx)).digest()
-            # Each SHA-256 digest gives 32 bytes → 8 floats (4 bytes each packed as float)
-            for offset in range(0, 32, 4):
-                if len(raw) >= self._dim:
-                    break
-                # Map 4 bytes to a float in [-1, 1]
-                value = struct.unpack(">I", digest[offset : offset + 4])[0]
-                raw.append((value / 0xFFFFFFFF) * 2 - 1)
-            idx += 1
+        return self.embed_batch([text])[0].tolist()  # type: ignore[no-any-return]
+
+    def embed_batch(self, texts: list[str]) -> npt.NDArray[np.float32]:
+        """Embed *texts* into a ``(len(texts), dim)`` float32 matrix.
+
+        All digests are written into one contiguous buffer and decoded with a
+        single ``np.frombuffer`` call.  Scaling and normalisation run in float64
+        before the final cast, so rows are bit-identical to the float32 values
+        pgvector stored for the original one-float-at-a-time implementation.
+        """
+        if not texts:
+            return np.empty((0, self._dim), dtype=np.float32)
+
+        buf = bytearray()
+        for text in texts:
+            # Hash the text once and fork the state per salt instead of
+            # re-hashing ``text + salt`` from scratch for every digest.
+            base = hashlib.sha256(text.encode("utf-8"))
+            for salt in self._salts:
+                h = base.copy()
+                h.update(salt)
+                buf += h.digest()
+
+        words = np.frombuffer(buf, dtype=">u4").reshape(len(texts), -1)[:, : self._dim]
+        # Map each uint32 to a float in [-1, 1]
+        raw = (words / 0xFFFFFFFF) * 2 - 1
 
         # L2 normalise
-        norm = math.sqrt(sum(x * x for x in raw))
-        if norm > 0:
-            raw = [x / norm for x in raw]
-        return raw
+        norms = np.sqrt(np.einsum("ij,ij->i", raw, raw))[:, np.newaxis]
+        np.divide(raw, norms, out=raw, where=norms > 0)
+        return raw.astype(np.float32)
 
-    def embed_batch(self, texts: list[str]) -> list[list[float]]:
-        return [self.embed(t) for t in texts]
+    async def aembed_batch(self, texts: list[str]) -> npt.NDArray[np.float32]:
+        """Run :meth:`embed_batch` on the shared CPU executor (or its query lane)."""
+        return await run_cpu_bound(self.embed_batch, texts)
+
+
+_embedder: Embedder | None = None
+
+
+def _create_embedder() -> Embedder:
+    provider = settings.embedding_provider
+    if provider == "hash":
+        return HashEmbedder()
+    if provider == "http":
+        from ax_rag.embedding.remote import HttpEmbedder  # needs the "http" extra
+
+        return HttpEmbedder(
+            settings.embedding_api_url,
+            settings.embedding_dim,
+            model=settings.embedding_model,
+            api_key=settings.embedding_api_key,
+            max_batch_size=settings.embedding_api_max_batch,
+            max_concurrency=settings.embedding_api_concurrency,
+            timeout_s=settings.embedding_api_timeout_s,
+            max_retries=settings.embedding_api_max_retries,
+        )
+    raise ValueError(f"embedding_provider must be 'hash' or 'http', got {provider!r}")
 
 
 def get_embedder() -> Embedder:
-    """Factory that returns the configured embedder."""
-    return HashEmbedder()
+    """Return the configured embedder, shared by the whole process.
+
+    Created on first use: providers may hold clients, connection pools or
+    precomputed state that should not be rebuilt per request.
+    """
+    global _embedder
+    if _embedder is None:
+        _embedder = _create_embedder()
+    return _embedder
+
+
+async def close_embedder() -> None:
+    """Release the shared embedder's connections, if it holds any."""
+    if _embedder is not None and (aclose := getattr(_embedder, "aclose", None)) is not None:
+        await aclose()
@@ -0,0 +1,79 @@
+"""Answer composition from retrieved context.
+
+A :class:`Composer` turns a question and its context passages into answer
+text, yielded piece by piece, so ``POST /answer/stream`` can forward tokens
+as a model produces them and ``POST /answer`` can simply join them.
+
+:class:`StubComposer` needs no API key: it returns the concatenated context
+with a header, cut into word-sized pieces to exercise the streaming path.  To
+plug in an LLM, implement ``compose`` over the provider's streaming API and
+return it from :func:`_create_composer`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+from collections.abc import AsyncGenerator
+from typing import Protocol
+
+from ax_rag.core.config import settings
+
+
+class Composer(Protocol):
+    """Streaming answer interface.
+
+    ``compose`` is an async generator.  Callers close it when the client goes
+    away, so implementations should release the model stream in a ``finally``
+    (or ``async with``) rather than generate into the void.
+    """
+
+    def compose(self, question: str, contexts: list[str]) -> AsyncGenerator[str, None]: ...
+
+
+def compose_answer(question: str, context_chunks: list[str]) -> str:
+    """Build an answer from retrieved context.
+
+    In a production system this would call an LLM.  For the starter kit we
+    return the concatenated context with a header — demonstrating the full
+    retrieval pipeline without requiring an external API key.
+    """
+    if not context_chunks:
+        return "No relevant context found for your question."
+
+    context = "\n\n---\n\n".join(context_chunks)
+    return (
+        f"Based on {len(context_chunks)} retrieved passage(s):\n\n"
+        f"{context}\n\n"
+        f'(In production, an LLM would synthesise an answer to: "{question}")'
+    )
+
+
+# A word and the whitespace after it, or leading whitespace
+_PIECE = re.compile(r"\S+\s*|\s+")
+
+
+class StubComposer:
+    """:func:`compose_answer`, streamed a word at a time."""
+
+    async def compose(self, question: str, contexts: list[str]) -> AsyncGenerator[str, None]:
+        for match in _PIECE.finditer(compose_answer(question, contexts)):
+            yield match.group()
+            await asyncio.sleep(0)  # where a model would await its next token
+
+
+_composer: Composer | None = None
+
+
+def _create_composer() -> Composer:
+    if settings.answer_composer == "stub":
+        return StubComposer()
+    raise ValueError(f"answer_composer must be 'stub', got {settings.answer_composer!r}")
+
+
+def get_composer() -> Composer:
+    """Return the configured composer, shared by the whole process."""
+    global _composer
+    if _composer is None:
+        _composer = _create_composer()
+    return _composer
@@ -2,10 +2,42 @@
 
 from __future__ import annotations
 
+import bisect
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
 
+import numpy as np
+import numpy.typing as npt
+
 from ax_rag.core.config import settings
 
+# A chunk may end right after a newline (so paragraph breaks too) or after
+# sentence-ending punctuation followed by whitespace.
+_NEWLINE = ord("\n")
+_TERMINATORS = [ord(c) for c in ".?!"]
+_WHITESPACE = np.array([ord(c) for c in " \t\n\r\f\v"], dtype=np.uint32)
+
+# Strings passed to ``iter_chunks`` are fed in slices of this many characters
+# so chunks are produced lazily rather than all at once.
+_STRING_BLOCK = 1 << 16
+
+
+def _break_offsets(text: str) -> npt.NDArray[np.intp]:
+    """Offsets in *text* just past each break point, in ascending order.
+
+    Scans code points with NumPy rather than a regex: a Python-level match
+    object per break made indexing slower than the ``rfind`` it replaces.
+    """
+    points = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype="<u4")
+    breaks = points == _NEWLINE
+    is_terminator = np.zeros(max(len(points) - 1, 0), dtype=bool)
+    for point in _TERMINATORS:
+        is_terminator |= points[:-1] == point
+    # Terminators are sparse: test only the character after each one.
+    ends = np.flatnonzero(is_terminator) + 1
+    breaks[ends[np.isin(points[ends], _WHITESPACE)]] = True
+    return np.flatnonzero(breaks) + 1
+
 
 @dataclass(frozen=True)
 class Chunk:
@@ -15,6 +47,122 @@ class Chunk:
     end_char: int
 
 
+class IncrementalChunker:
+    """Chunk text that arrives in blocks, holding only the unfinished tail.
+
+    Feed blocks with :meth:`feed` and call :meth:`close` once at the end; the
+    concatenated output is the same however the text is split into blocks.
+    ``start_char``/``end_char`` are offsets into the full text as fed.
+
+    Break points (see :func:`_break_offsets`) are indexed once per block into a sorted
+    list, and each window picks its last break with a binary search, falling
+    back to the hard ``chunk_size`` limit.  A window is only cut once text
+    beyond it has arrived, so memory is bounded by the block size plus one
+    window.
+    """
+
+    def __init__(self, chunk_size: int | None = None, chunk_overlap: int | None = None) -> None:
+        size = chunk_size if chunk_size is not None else settings.chunk_size
+        overlap = chunk_overlap if chunk_overlap is not None else settings.chunk_overlap
+
+        if size <= 0:
+            raise ValueError("chunk_size must be positive")
+        if overlap < 0 or overlap >= size:
+            raise ValueError("chunk_overlap must be >= 0 and < chunk_size")
+
+        self._size = size
+        self._overlap = overlap
+        self._buf = ""  # unconsumed text, starting at absolute offset _buf_start
+        self._buf_start = 0
+        self._breaks: list[int] = []  # absolute offsets just past each break in _buf
+        self._start = 0  # absolute offset of the next window
+        self._index = 0
+        self._leading = True  # still skipping leading whitespace
+
+    def feed(self, block: str) -> list[Chunk]:
+        """Add *block* and return the chunks it completes."""
+        if self._leading:
+            stripped = block.lstrip()
+            self._buf_start += len(block) - len(stripped)
+            self._start = self._buf_start
+            if not stripped:
+                return []
+            block = stripped
+            self._leading = False
+
+        # Rescan one character back: punctuation ending the previous block
+        # pairs with whitespace starting this one.
+        old_len = len(self._buf)
+        self._buf += block
+        scan_from = max(old_len - 1, 0)
+        offsets = _break_offsets(self._buf[scan_from:]) + (self._buf_start + scan_from)
+        self._breaks.extend(offsets[offsets > self._buf_start + old_len].tolist())
+        return self._drain(final=False)
+
+    def close(self) -> list[Chunk]:
+        """Return the remaining chunks; the chunker must not be fed afterwards."""
+        self._buf = self._buf.rstrip()
+        chunks = self._drain(final=True)
+        self._buf = ""
+        self._breaks.clear()
+        return chunks
+
+    def _drain(self, *, final: bool) -> list[Chunk]:
+        buf, base, breaks = self._buf, self._buf_start, self._breaks
+        size, overlap = self._size, self._overlap
+        # Trailing whitespace may still be stripped, so it never proves that
+        # more text follows a window.
+        limit = base + (len(buf) if final else len(buf.rstrip()))
+        chunks: list[Chunk] = []
+        start = self._start
+
+        while start < limit:
+            end = min(start + size, limit)
+            if not final and end >= limit:
+                break  # the window may still grow or find a later break
+
+            # Take the last break in the window that still moves the next
+            # window (end - overlap) forward.
+            if end < limit:
+                i = bisect.bisect_right(breaks, end) - 1
+                if i >= 0 and breaks[i] - overlap > start:
+                    end = breaks[i]
+
+            piece = buf[start - base : end - base].strip()
+            if piece:
+                chunks.append(Chunk(text=piece, index=self._index, start_char=start, end_char=end))
+                self._index += 1
+
+            # Advance with overlap
+            if end >= limit:
+                start = limit
+                break
+            start = end - overlap
+
+        self._start = start
+        self._buf = buf[start - base :]
+        self._buf_start = start
+        del breaks[: bisect.bisect_right(breaks, start)]
+        return chunks
+
+
+def iter_chunks(
+    source: str | Iterable[str],
+    chunk_size: int | None = None,
+    chunk_overlap: int | None = None,
+) -> Iterator[Chunk]:
+    """Lazily split *source* (a string or an iterable of text blocks) into chunks."""
+    chunker = IncrementalChunker(chunk_size, chunk_overlap)
+    blocks: Iterable[str]
+    if isinstance(source, str):
+        blocks = (source[i : i + _STRING_BLOCK] for i in range(0, len(source), _STRING_BLOCK))
+    else:
+        blocks = source
+    for block in blocks:
+        yield from chunker.feed(block)
+    yield from chunker.close()
+
+
 def chunk_text(
     text: str,
     chunk_size: int | None = None,
@@ -22,42 +170,8 @@ def chunk_text(
 ) -> list[Chunk]:
     """Split *text* into overlapping chunks.
 
-    Attempts to break at sentence boundaries (". ") when possible,
-    falling back to the hard ``chunk_size`` limit.
+    Prefers to break after sentence-ending punctuation or a newline, falling
+    back to the hard ``chunk_size`` limit.  See :func:`iter_chunks` for a lazy
+    variant that also accepts text in blocks.
     """
-    size = chunk_size if chunk_size is not None else settings.chunk_size
-    overlap = chunk_overlap if chunk_overlap is not None else settings.chunk_overlap
-
-    if size <= 0:
-        raise ValueError("chunk_size must be positive")
-    if overlap < 0 or overlap >= size:
-        raise ValueError("chunk_overlap must be >= 0 and < chunk_size")
-
-    text = text.strip()
-    if not text:
-        return []
-
-    chunks: list[Chunk] = []
-    start = 0
-    idx = 0
-
-    while start < len(text):
-        end = min(start + size, len(text))
-
-        # Try to find a sentence boundary to break at
-        if end < len(text):
-            boundary = text.rfind(". ", start, end)
-            if boundary > start:
-                end = boundary + 2  # include the period and space
-
-        chunk_text_str = text[start:end].strip()
-        if chunk_text_str:
-            chunks.append(Chunk(text=chunk_text_str, index=idx, start_char=start, end_char=end))
-            idx += 1
-
-        # Advance with overlap
-        if end >= len(text):
-            break
-        start = end - overlap
-
-    return chunks
+    return list(iter_chunks(text, chunk_size, chunk_overlap))
@@ -0,0 +1,281 @@
+"""Asynchronous ingestion through a job queue stored in PostgreSQL.
+
+``POST /ingest/async`` writes the request to ``ingest_jobs`` and returns at
+once.  Workers claim queued jobs with ``FOR UPDATE SKIP LOCKED``, so any
+number of them share one queue without taking a job twice.  They run as tasks
+in each API process (``INGEST_WORKERS``) and in ``scripts/ingest_worker.py``.
+
+A worker claims up to ``INGEST_JOB_BATCH_SIZE`` jobs at a time.  It chunks
+them on the CPU executor, embeds every chunk of the batch in one
+:func:`~ax_rag.embedding.dedup.embed_chunks` call, then writes all the new
+documents in one transaction with a single generation bump.  If that shared
+write fails, the jobs are retried one by one, so a bad document cannot fail
+its neighbours.  Upserts (an ``external_id``, or ``upsert``) go through
+:func:`~ax_rag.ingestion.upsert.upsert_text` one at a time.
+
+A failed job is requeued until it has been tried ``INGEST_JOB_MAX_ATTEMPTS``
+times.  While a worker runs its jobs it refreshes their heartbeat every
+third of ``INGEST_JOB_TIMEOUT_S``; a job left ``running`` without one for
+that long, by a worker that died, is requeued.  Should a live worker lose a
+job all the same (a stall longer than the timeout), its claim no longer
+matches when it finishes: it rolls back its writes and leaves the job to
+the worker that claimed it next.  At most ``INGEST_QUEUE_MAX_DEPTH`` jobs may be
+pending; past that ``POST /ingest/async`` answers 429.  A burst of ingestion
+is therefore pushed back to its clients instead of piling up work that would
+starve search.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from typing import Any
+
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ax_rag.core.config import settings
+from ax_rag.core.executor import run_cpu_bound
+from ax_rag.core.logging import get_logger
+from ax_rag.core.models import IngestResponse
+from ax_rag.embedding.dedup import embed_chunks
+from ax_rag.embedding.stub import get_embedder
+from ax_rag.ingestion.chunker import chunk_text
+from ax_rag.ingestion.streaming import chunk_rows
+from ax_rag.ingestion.upsert import upsert_text
+from ax_rag.storage.pg import (
+    async_session,
+    bump_generation,
+    claim_ingest_jobs,
+    fail_ingest_job,
+    finish_ingest_job,
+    insert_chunks,
+    insert_document,
+    requeue_stale_ingest_jobs,
+    touch_ingest_jobs,
+)
+
+logger = get_logger(__name__)
+
+
+class _ClaimLostError(Exception):
+    """The job was requeued while this worker ran it; its writes must not stay."""
+
+
+def _is_upsert(job: Row[Any]) -> bool:
+    return bool(job.upsert) or job.external_id is not None
+
+
+async def _ingest(jobs: list[Row[Any]], session_factory: async_sessionmaker[AsyncSession]) -> None:
+    """Ingest new documents: one embedding call and one transaction for all *jobs*."""
+    embedder = get_embedder()
+    chunked = await asyncio.gather(*(run_cpu_bound(chunk_text, job.raw_text) for job in jobs))
+    embedded = await embed_chunks(
+        [c.text for chunks in chunked for c in chunks],
+        embedder=embedder,
+        session_factory=session_factory,
+    )
+    parts = embedded.split([len(chunks) for chunks in chunked])
+
+    async with session_factory() as session, session.begin():
+        for job, chunks, part in zip(jobs, chunked, parts, strict=True):
+            doc_id = await insert_document(
+                session, source=job.source, raw_text=job.raw_text, collection=job.collection
+            )
+            count = await insert_chunks(
+                session, doc_id, chunk_rows(chunks, job.source, part), collection=job.collection
+            )
+            response = IngestResponse(
+                document_id=doc_id,
+                chunks_created=count,
+                embeddings_reused=part.reused,
+                embeddings_computed=part.computed,
+                message=f"Ingested {count} chunks from source '{job.source}'",
+            )
+            if not await finish_ingest_job(session, job.id, job.attempts, response.model_dump()):
+                raise _ClaimLostError(job.id)
+        await bump_generation(session)
+
+
+async def _upsert(job: Row[Any], session_factory: async_sessionmaker[AsyncSession]) -> None:
+    # Not atomic with the document write, but an upsert that is run again
+    # after a crash finds nothing left to change.
+    key = job.external_id or job.source
+    result = await upsert_text(
+        job.raw_text,
+        key,
+        job.source,
+        collection=job.collection,
+        session_factory=session_factory,
+    )
+    response = IngestResponse(
+        document_id=result.document_id,
+        chunks_created=result.chunks_created,
+        embeddings_reused=result.embeddings_reused,
+        embeddings_computed=result.embeddings_computed,
+        chunks_unchanged=result.chunks_unchanged,
+        chunks_deleted=result.chunks_deleted,
+        message=result.message(key),
+    )
+    async with session_factory() as session, session.begin():
+        if not await finish_ingest_job(session, job.id, job.attempts, response.model_dump()):
+            raise _ClaimLostError(job.id)
+
+
+async def _heartbeat(
+    jobs: list[Row[Any]], session_factory: async_sessionmaker[AsyncSession]
+) -> None:
+    """Keep the claim on *jobs* fresh until cancelled, so they are not requeued."""
+    claims = [(job.id, job.attempts) for job in jobs]
+    while True:
+        await asyncio.sleep(settings.ingest_job_timeout_s / 3)
+        try:
+            async with session_factory() as session, session.begin():
+                await touch_ingest_jobs(session, claims)
+        except Exception as exc:
+            logger.warning("ingest_job_heartbeat_failed", jobs=len(claims), error=str(exc))
+
+
+async def process_jobs(
+    jobs: list[Row[Any]],
+    *,
+    session_factory: async_sessionmaker[AsyncSession] = async_session,
+) -> None:
+    """Run claimed *jobs*; each ends ``done``, ``failed`` or back in the queue."""
+    heartbeat = asyncio.create_task(_heartbeat(jobs, session_factory))
+    try:
+        await _process(jobs, session_factory)
+    finally:
+        heartbeat.cancel()
+
+
+async def _process(jobs: list[Row[Any]], session_factory: async_sessionmaker[AsyncSession]) -> None:
+    batch = [job for job in jobs if not _is_upsert(job)]
+    if len(batch) > 1:
+        try:
+            await _ingest(batch, session_factory)
+            batch = []
+        except Exception as exc:
+            logger.warning("ingest_job_batch_failed", jobs=len(batch), error=str(exc))
+
+    for job in batch + [job for job in jobs if _is_upsert(job)]:
+        try:
+            if _is_upsert(job):
+                await _upsert(job, session_factory)
+            else:
+                await _ingest([job], session_factory)
+        except _ClaimLostError:
+            logger.warning("ingest_job_claim_lost", job_id=job.id, attempt=job.attempts)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            retry = job.attempts < settings.ingest_job_max_attempts
+            logger.warning(
+                "ingest_job_failed", job_id=job.id, attempt=job.attempts, retry=retry, error=error
+            )
+            async with session_factory() as session, session.begin():
+                await fail_ingest_job(session, job.id, job.attempts, error, retry=retry)
+        else:
+            logger.info("ingest_job_done", job_id=job.id, source=job.source)
+
+
+async def _claim(session_factory: async_sessionmaker[AsyncSession]) -> list[Row[Any]]:
+    async with session_factory() as session, session.begin():
+        if requeued := await requeue_stale_ingest_jobs(
+            session, settings.ingest_job_timeout_s, settings.ingest_job_max_attempts
+        ):
+            logger.warning("ingest_jobs_requeued", jobs=requeued)
+        return await claim_ingest_jobs(session, settings.ingest_job_batch_size)
+
+
+async def run_worker(
+    stop: asyncio.Event,
+    wakeup: asyncio.Event,
+    *,
+    session_factory: async_sessionmaker[AsyncSession] = async_session,
+) -> None:
+    """Claim and run batches of jobs until *stop* is set.
+
+    When the queue is empty the worker sleeps until *wakeup* is set or
+    ``INGEST_JOB_POLL_INTERVAL_S`` passes.  Errors are logged, never raised.
+    """
+    while not stop.is_set():
+        wakeup.clear()
+        try:
+            jobs = await _claim(session_factory)
+            if jobs:
+                await process_jobs(jobs, session_factory=session_factory)
+                continue
+        except Exception as exc:
+            logger.warning("ingest_worker_error", error=str(exc))
+        with contextlib.suppress(TimeoutError):
+            await asyncio.wait_for(wakeup.wait(), settings.ingest_job_poll_interval_s)
+
+
+class JobWorkers:
+    """*count* :func:`run_worker` tasks on the running event loop."""
+
+    def __init__(
+        self,
+        count: int,
+        *,
+        session_factory: async_sessionmaker[AsyncSession] = async_session,
+    ) -> None:
+        self.count = count
+        self._session_factory = session_factory
+        self._stop = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task[None]] = []
+
+    def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(
+                run_worker(self._stop, self._wakeup, session_factory=self._session_factory),
+                name=f"ingest-worker-{i}",
+            )
+            for i in range(self.count)
+        ]
+        logger.info("ingest_workers_started", workers=self.count)
+
+    def notify(self) -> None:
+        """Wake idle workers now rather than at their next poll."""
+        self._wakeup.set()
+
+    async def stop(self, grace_s: float = 10.0) -> None:
+        """Let batches in progress finish for up to *grace_s*, then cancel them.
+
+        Jobs cut off stay ``running`` and are requeued after
+        ``INGEST_JOB_TIMEOUT_S``.
+        """
+        self._stop.set()
+        self._wakeup.set()
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(self._tasks, timeout=grace_s)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+
+_workers: JobWorkers | None = None
+
+
+def start_workers() -> None:
+    """Start ``INGEST_WORKERS`` in-process workers, if any and not yet running."""
+    global _workers
+    if _workers is None and settings.ingest_workers > 0:
+        _workers = JobWorkers(settings.ingest_workers)
+        _workers.start()
+
+
+async def stop_workers() -> None:
+    global _workers
+    if _workers is not None:
+        await _workers.stop()
+        _workers = None
+
+
+def notify_workers() -> None:
+    """Tell this process's workers a job was queued (workers elsewhere poll)."""
+    if _workers is not None:
+        _workers.notify()
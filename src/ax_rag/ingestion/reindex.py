@@ -0,0 +1,266 @@
+"""Re-embed stored chunks: streaming, parallel, and resumable.
+
+Chunks are read in id order with keyset pagination, so neither the table nor
+a long transaction is ever held open.  Up to *concurrency* batches are
+embedded at once on the shared CPU executor, and batches are written back
+in order with :func:`update_embeddings` (binary ``COPY`` into a temp table,
+then one ``UPDATE ... FROM``).  After each write the last written id goes to
+a checkpoint file, so an interrupted run resumes where it stopped.
+
+In shadow mode the vectors go to ``embedding_next`` while ``embedding``
+keeps serving queries; :func:`switch_to_shadow` then swaps the columns in
+one transaction.  :func:`convert_embeddings` fills the shadow column from
+the live one instead, to change the storage precision (``vector`` or
+``halfvec``) without re-embedding.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from ax_rag.core.config import settings
+from ax_rag.core.logging import get_logger
+from ax_rag.embedding.cache import normalize_query
+from ax_rag.embedding.stub import get_embedder
+from ax_rag.storage.pg import (
+    SHADOW_EMBEDDING,
+    VECTOR_INDEX,
+    add_shadow_embedding_column,
+    async_session,
+    build_vector_index,
+    bump_generation,
+    copy_embeddings_to_shadow,
+    copy_missing_embeddings_to_shadow,
+    embedding_column_type,
+    estimate_chunk_count,
+    fetch_chunk_page,
+    swap_shadow_embedding,
+    update_embeddings,
+)
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class Checkpoint:
+    """Progress of a reindex run: the column being filled and the last id written."""
+
+    column: str
+    last_id: str = ""
+    updated: int = 0
+
+    @classmethod
+    def load(cls, path: Path) -> Checkpoint | None:
+        try:
+            return cls(**json.loads(path.read_text()))
+        except FileNotFoundError:
+            return None
+
+    def save(self, path: Path) -> None:
+        # Write-then-rename so a crash never leaves a truncated checkpoint
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(asdict(self)))
+        os.replace(tmp, path)
+
+
+async def reindex(
+    *,
+    shadow: bool = False,
+    batch_size: int = 256,
+    concurrency: int | None = None,
+    checkpoint_path: Path | None = None,
+    session_factory: async_sessionmaker[AsyncSession] = async_session,
+) -> int:
+    """Re-embed every chunk with the configured embedder; return the rows written.
+
+    With *shadow*, vectors are written to ``embedding_next`` (created with the
+    embedder's dimension) and only chunks still missing one are read.  An
+    existing checkpoint at *checkpoint_path* is resumed from; it is removed
+    when the run completes.
+    """
+    column = SHADOW_EMBEDDING if shadow else "embedding"
+    in_flight_max = concurrency or settings.executor_max_workers
+    embedder = get_embedder()
+
+    checkpoint = Checkpoint(column)
+    if checkpoint_path is not None and (saved := Checkpoint.load(checkpoint_path)):
+        if saved.column != column:
+            raise ValueError(
+                f"checkpoint {checkpoint_path} is for column {saved.column!r}, not {column!r}; "
+                "delete it or run in the matching mode"
+            )
+        checkpoint = saved
+        logger.info("reindex_resumed", after=saved.last_id, updated=saved.updated)
+
+    async with session_factory() as session, session.begin():
+        if shadow:
+            await add_shadow_embedding_column(session, embedder.dim)
+        total = await estimate_chunk_count(session)
+
+    logger.info("reindex_started", column=column, embedding_dim=embedder.dim, total=total)
+    started = time.monotonic()
+    resumed_from = checkpoint.updated
+    in_flight: deque[tuple[list[str], asyncio.Task[npt.NDArray[np.float32]]]] = deque()
+
+    async def write_oldest() -> None:
+        ids, task = in_flight.popleft()
+        embeddings = await task
+        async with session_factory() as session, session.begin():
+            checkpoint.updated += await update_embeddings(session, ids, embeddings, column=column)
+            if not shadow:
+                await bump_generation(session)
+        checkpoint.last_id = ids[-1]
+        if checkpoint_path is not None:
+            checkpoint.save(checkpoint_path)
+
+        elapsed = time.monotonic() - started
+        rate = (checkpoint.updated - resumed_from) / elapsed if elapsed else 0.0
+        remaining = max(total - checkpoint.updated, 0)
+        logger.info(
+            "reindex_progress",
+            updated=checkpoint.updated,
+            total=total,
+            chunks_per_s=round(rate, 1),
+            eta_s=round(remaining / rate) if rate else None,
+        )
+
+    after = checkpoint.last_id
+    try:
+        while True:
+            async with session_factory() as session:
+                page = await fetch_chunk_page(
+                    session, after=after, limit=batch_size, missing=column if shadow else None
+                )
+            if not page:
+                break
+            after = page[-1][0]
+            ids, texts = [i for i, _ in page], [normalize_query(t) for _, t in page]
+            in_flight.append((ids, asyncio.create_task(embedder.aembed_batch(texts))))
+            if len(in_flight) >= in_flight_max:
+                await write_oldest()
+        while in_flight:
+            await write_oldest()
+    finally:
+        for _, task in in_flight:
+            task.cancel()
+
+    if checkpoint_path is not None:
+        checkpoint_path.unlink(missing_ok=True)
+    logger.info(
+        "reindex_finished",
+        column=column,
+        total_updated=checkpoint.updated,
+        seconds=round(time.monotonic() - started, 1),
+    )
+    return checkpoint.updated
+
+
+async def convert_embeddings(
+    *,
+    batch_size: int = 1000,
+    session_factory: async_sessionmaker[AsyncSession] = async_session,
+) -> int:
+    """Copy every live vector into a shadow column of ``settings.embedding_storage``.
+
+    The database casts the vectors, one keyset page per transaction, while
+    ``embedding`` keeps serving queries and ingestion.  Chunks already
+    copied are skipped, so an interrupted run can simply be restarted.
+    Returns the rows copied; make them live with :func:`switch_to_shadow`
+    (``convert=True``).
+    """
+    target = settings.embedding_storage
+    async with session_factory() as session, session.begin():
+        live = await embedding_column_type(session)
+        if live is None:
+            raise ValueError("chunks has no embedding column")
+        storage, dim = live
+        if storage == target:
+            raise ValueError(f"chunks.embedding is already stored as {target}")
+        shadow = await embedding_column_type(session, SHADOW_EMBEDDING)
+        if shadow is not None and shadow != (target, dim):
+            raise ValueError(
+                f"{SHADOW_EMBEDDING} already exists as {shadow[0]}({shadow[1]}); "
+                "finish or drop the shadow reindex first"
+            )
+        await add_shadow_embedding_column(session, dim, target)
+        total = await estimate_chunk_count(session)
+
+    logger.info("convert_started", source=storage, target=target, dim=dim, total=total)
+    started = time.monotonic()
+    copied = scanned = 0
+    after = ""
+    while True:
+        async with session_factory() as session, session.begin():
+            last_id, n = await copy_embeddings_to_shadow(session, after=after, limit=batch_size)
+        if last_id is None:
+            break
+        after = last_id
+        copied += n
+        scanned += batch_size
+        elapsed = time.monotonic() - started
+        rate = scanned / elapsed if elapsed else 0.0
+        logger.info(
+            "convert_progress",
+            copied=copied,
+            total=total,
+            chunks_per_s=round(rate, 1),
+            eta_s=round(max(total - scanned, 0) / rate) if rate else None,
+        )
+
+    logger.info(
+        "convert_finished",
+        target=target,
+        total_copied=copied,
+        seconds=round(time.monotonic() - started, 1),
+    )
+    return copied
+
+
+async def switch_to_shadow(
+    *,
+    convert: bool = False,
+    bind: AsyncEngine | None = None,
+    session_factory: async_sessionmaker[AsyncSession] = async_session,
+) -> int:
+    """Make the shadow vectors live; return how many were filled under the lock.
+
+    Builds the ANN index on the shadow column concurrently, then, in one
+    transaction that blocks writers (readers continue until the final
+    ``ALTER TABLE``), fills chunks ingested since the shadow fill and swaps
+    the columns.  They are embedded, or with *convert* copied from the live
+    column.  Run :func:`reindex` with ``shadow=True`` (or
+    :func:`convert_embeddings`) first.
+    """
+    await build_vector_index(f"{VECTOR_INDEX}_next", column=SHADOW_EMBEDDING, bind=bind)
+
+    embedder = get_embedder()
+    filled = 0
+    async with session_factory() as session, session.begin():
+        await session.execute(text("LOCK TABLE chunks IN SHARE ROW EXCLUSIVE MODE"))
+        if convert:
+            filled = await copy_missing_embeddings_to_shadow(session)
+        else:
+            while page := await fetch_chunk_page(
+                session, after="", limit=1000, missing=SHADOW_EMBEDDING
+            ):
+                embeddings = await embedder.aembed_batch([normalize_query(t) for _, t in page])
+                filled += await update_embeddings(
+                    session, [i for i, _ in page], embeddings, column=SHADOW_EMBEDDING
+                )
+        column_type = await embedding_column_type(session, SHADOW_EMBEDDING)
+        await swap_shadow_embedding(session)
+        await bump_generation(session)
+
+    logger.info("reindex_switched", filled_under_lock=filled, column_type=column_type)
+    return filled
@@ -0,0 +1,131 @@
+"""Streaming ingestion for uploads too large to hold in memory.
+
+Bytes are decoded block by block, chunked with :class:`IncrementalChunker`,
+then embedded and written in batches of ``settings.ingest_batch_size`` chunks.
+Peak memory is bounded by the block and batch sizes, not by the upload: the
+raw text is never assembled, so streamed documents store ``raw_text = NULL``.
+Chunks seen before reuse their stored embeddings (see
+:mod:`ax_rag.embedding.dedup`).
+"""
+
+from __future__ import annotations
+
+import codecs
+from collections.abc import AsyncIterable, AsyncIterator
+from dataclasses import dataclass
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ax_rag.core.config import settings
+from ax_rag.embedding.dedup import ChunkEmbeddings, embed_chunks
+from ax_rag.embedding.stub import Embedder, get_embedder
+from ax_rag.ingestion.chunker import Chunk, IncrementalChunker
+from ax_rag.storage.pg import (
+    DEFAULT_COLLECTION,
+    async_session,
+    bump_generation,
+    insert_chunks,
+    insert_document,
+)
+
+
+async def decode_utf8(blocks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Decode UTF-8 *blocks*, carrying sequences split across block edges.
+
+    Raises :class:`UnicodeDecodeError` on invalid input, like ``bytes.decode``.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    async for block in blocks:
+        if text := decoder.decode(block):
+            yield text
+    if tail := decoder.decode(b"", final=True):
+        yield tail
+
+
+@dataclass(slots=True)
+class IngestResult:
+    document_id: str
+    chunks_created: int = 0
+    embeddings_reused: int = 0
+    embeddings_computed: int = 0
+
+
+def chunk_rows(
+    chunks: list[Chunk], source: str, embedded: ChunkEmbeddings
+) -> list[dict[str, object]]:
+    """Rows for :func:`~ax_rag.storage.pg.insert_chunks` from chunks and their embeddings."""
+    return [
+        {
+            "text": c.text,
+            "chunk_index": c.index,
+            "source": source,
+            "embedding": emb,
+            "content_hash": h,
+        }
+        for c, emb, h in zip(chunks, embedded.vectors, embedded.hashes, strict=True)
+    ]
+
+
+async def _write_batch(
+    session: AsyncSession,
+    session_factory: async_sessionmaker[AsyncSession],
+    embedder: Embedder,
+    result: IngestResult,
+    source: str,
+    chunks: list[Chunk],
+    collection: str,
+) -> None:
+    embedded = await embed_chunks(
+        [c.text for c in chunks], embedder=embedder, session_factory=session_factory
+    )
+    result.chunks_created += await insert_chunks(
+        session, result.document_id, chunk_rows(chunks, source, embedded), collection=collection
+    )
+    result.embeddings_reused += embedded.reused
+    result.embeddings_computed += embedded.computed
+
+
+async def ingest_stream(
+    blocks: AsyncIterable[bytes],
+    source: str,
+    *,
+    collection: str = DEFAULT_COLLECTION,
+    batch_size: int | None = None,
+    session_factory: async_sessionmaker[AsyncSession] = async_session,
+) -> IngestResult:
+    """Chunk, embed, and store a document read as a stream of byte *blocks* in *collection*.
+
+    The document is written in one transaction, so a failed upload (including
+    invalid UTF-8) leaves nothing behind.  Chunking runs inline on the event
+    loop; it is cheap per block, while embedding goes to the CPU executor.
+
+    New embeddings are stored for reuse outside that transaction and survive
+    a rollback; they are a cache, not document data.
+    """
+    batch = batch_size or settings.ingest_batch_size
+    embedder = get_embedder()
+    chunker = IncrementalChunker()
+    pending: list[Chunk] = []
+
+    async with session_factory() as session, session.begin():
+        result = IngestResult(
+            await insert_document(session, source=source, raw_text=None, collection=collection)
+        )
+
+        async def write(chunks: list[Chunk]) -> None:
+            await _write_batch(
+                session, session_factory, embedder, result, source, chunks, collection
+            )
+
+        async for text in decode_utf8(blocks):
+            pending.extend(chunker.feed(text))
+            while len(pending) >= batch:
+                await write(pending[:batch])
+                del pending[:batch]
+
+        pending.extend(chunker.close())
+        for i in range(0, len(pending), batch):
+            await write(pending[i : i + batch])
+        await bump_generation(session)
+
+    return result
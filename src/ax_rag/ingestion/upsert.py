@@ -0,0 +1,118 @@
+"""Incremental re-ingestion of a document that is already stored.
+
+:func:`upsert_text` replaces the document with the same external id in
+place.  The new text is re-chunked and each chunk's content hash (see
+:mod:`ax_rag.embedding.dedup`) is matched against the stored ones: matching
+chunks are kept (index, text and source are rewritten only if they
+changed), new chunks
+are embedded and inserted, and chunks no longer present are deleted, all in
+one transaction.  A nightly re-sync of a mostly unchanged source therefore
+embeds only what was edited, and the table and ANN index do not grow with
+every version.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ax_rag.core.executor import run_cpu_bound
+from ax_rag.embedding.dedup import content_hash, embed_chunks
+from ax_rag.embedding.stub import get_embedder
+from ax_rag.ingestion.chunker import Chunk, chunk_text
+from ax_rag.ingestion.streaming import chunk_rows
+from ax_rag.storage.pg import (
+    DEFAULT_COLLECTION,
+    async_session,
+    bump_generation,
+    delete_chunks,
+    fetch_document_chunks,
+    insert_chunks,
+    update_chunk_positions,
+    upsert_document,
+)
+
+
+@dataclass(slots=True)
+class UpsertResult:
+    document_id: str
+    created: bool
+    chunks_created: int = 0
+    chunks_unchanged: int = 0
+    chunks_deleted: int = 0
+    embeddings_reused: int = 0
+    embeddings_computed: int = 0
+
+    def message(self, external_id: str) -> str:
+        action = "Created" if self.created else "Updated"
+        return (
+            f"{action} document '{external_id}': {self.chunks_created} chunks added, "
+            f"{self.chunks_unchanged} unchanged, {self.chunks_deleted} deleted"
+        )
+
+
+async def upsert_text(
+    raw_text: str,
+    external_id: str,
+    source: str,
+    *,
+    collection: str = DEFAULT_COLLECTION,
+    session_factory: async_sessionmaker[AsyncSession] = async_session,
+) -> UpsertResult:
+    """Create or incrementally update the document keyed by *external_id* in *collection*.
+
+    Chunks stored before content hashes existed, or embedded by another
+    model, never match and are replaced.  The corpus generation is only
+    bumped when a chunk actually changed, so re-syncing an unchanged
+    document keeps cached search results valid.
+    """
+    embedder = get_embedder()
+    chunks = await run_cpu_bound(chunk_text, raw_text)
+    hashes = [content_hash(c.text, embedder) for c in chunks]
+
+    async with session_factory() as session, session.begin():
+        doc_id, created = await upsert_document(
+            session, external_id, source, raw_text, collection=collection
+        )
+        result = UpsertResult(doc_id, created)
+
+        stored: defaultdict[str | None, list[str]] = defaultdict(list)
+        for chunk_id, _, _, stored_hash in await fetch_document_chunks(
+            session, doc_id, collection=collection
+        ):
+            stored[stored_hash].append(chunk_id)
+
+        kept: list[tuple[str, Chunk]] = []
+        added: list[Chunk] = []
+        for chunk, h in zip(chunks, hashes, strict=True):
+            if stored.get(h):
+                kept.append((stored[h].pop(0), chunk))
+            else:
+                added.append(chunk)
+        stale = [chunk_id for ids in stored.values() for chunk_id in ids]
+
+        result.chunks_deleted = await delete_chunks(session, stale, collection=collection)
+        moved = await update_chunk_positions(
+            session,
+            [chunk_id for chunk_id, _ in kept],
+            [c.index for _, c in kept],
+            [c.text for _, c in kept],
+            source,
+            collection=collection,
+        )
+        result.chunks_unchanged = len(kept)
+        if added:
+            embedded = await embed_chunks(
+                [c.text for c in added], embedder=embedder, session_factory=session_factory
+            )
+            result.chunks_created = await insert_chunks(
+                session, doc_id, chunk_rows(added, source, embedded), collection=collection
+            )
+            result.embeddings_reused = embedded.reused
+            result.embeddings_computed = embedded.computed
+        if result.chunks_created or result.chunks_deleted or moved:
+            await bump_generation(session)
+
+    return result
@@ -0,0 +1,282 @@
+"""Search-result cache around :func:`hybrid_retrieve`.
+
+Keys combine the corpus generation with the normalised query, ``top_k`` and
+every setting that changes the ranking.  Ingestion and reindexing bump the
+generation in the transaction that changes chunks (see
+:func:`ax_rag.storage.pg.bump_generation`), so entries cached before a
+write can no longer be reached once it commits; nothing has to be deleted.
+The generation lives in PostgreSQL, so this holds across API workers and
+for writes made by the admin scripts.
+
+Backends (``RESULT_CACHE_BACKEND``):
+
+* ``memory`` keeps results in a per-process LRU (:class:`MemoryResultCache`).
+* ``postgres`` stores them in the unlogged ``search_cache`` table, shared by
+  every worker (:class:`PostgresResultCache`).
+* ``none`` disables caching.
+
+Partial results (a leg missed its deadline) are never cached.
+
+Independently of the backend, identical concurrent misses are coalesced
+(``RETRIEVAL_COALESCING``): one :func:`hybrid_retrieve` runs and every caller
+shares its result, so a burst of the same question holds one pooled
+connection per leg instead of one per request.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime
+from typing import Literal, Protocol
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ax_rag.core.cache import LRUCache
+from ax_rag.core.config import settings
+from ax_rag.core.logging import get_logger
+from ax_rag.core.singleflight import SingleFlight
+from ax_rag.embedding.cache import normalize_query
+from ax_rag.retrieval.hybrid import RetrievalResult, hybrid_retrieve
+from ax_rag.storage.pg import (
+    ChunkHit,
+    SearchFilter,
+    async_session,
+    get_cached_result,
+    get_generation,
+    purge_cached_results,
+    put_cached_result,
+)
+
+logger = get_logger(__name__)
+
+CacheStatus = Literal["HIT", "MISS", "BYPASS"]
+
+# The postgres backend deletes expired rows once every this many writes.
+_PURGE_EVERY = 500
+
+
+class ResultCacheBackend(Protocol):
+    async def get(self, key: str) -> RetrievalResult | None: ...
+
+    async def set(self, key: str, result: RetrievalResult) -> None: ...
+
+    def stats(self) -> dict[str, float]: ...
+
+
+class MemoryResultCache:
+    """Per-process LRU of retrieval results; entries are shared, not copied."""
+
+    def __init__(self, maxsize: int, ttl_s: float) -> None:
+        self._lru: LRUCache[str, RetrievalResult] = LRUCache(maxsize, ttl_s)
+
+    async def get(self, key: str) -> RetrievalResult | None:
+        return self._lru.get(key)
+
+    async def set(self, key: str, result: RetrievalResult) -> None:
+        self._lru.put(key, result)
+
+    def stats(self) -> dict[str, float]:
+        return self._lru.stats()
+
+
+def _dump(result: RetrievalResult) -> bytes:
+    rows = [
+        [
+            c.chunk_id,
+            c.document_id,
+            c.text,
+            c.chunk_index,
+            c.source,
+            c.created_at.isoformat(),
+            c.score,
+        ]
+        for c in result.chunks
+    ]
+    return json.dumps(rows, separators=(",", ":")).encode()
+
+
+def _load(value: bytes) -> RetrievalResult:
+    rows = json.loads(value)
+    chunks = [
+        ChunkHit(
+            chunk_id,
+            document_id,
+            text,
+            chunk_index,
+            source,
+            datetime.fromisoformat(created_at),
+            score=score,
+        )
+        for chunk_id, document_id, text, chunk_index, source, created_at, score in rows
+    ]
+    return RetrievalResult(chunks=chunks)
+
+
+class PostgresResultCache:
+    """Retrieval results in the unlogged ``search_cache`` table, shared by all workers."""
+
+    def __init__(
+        self,
+        ttl_s: float,
+        session_factory: async_sessionmaker[AsyncSession] = async_session,
+    ) -> None:
+        self._ttl = ttl_s or 24 * 3600.0  # rows need an expiry to be purged
+        self._session_factory = session_factory
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> RetrievalResult | None:
+        async with self._session_factory() as session:
+            value = await get_cached_result(session, key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return _load(value)
+
+    async def set(self, key: str, result: RetrievalResult) -> None:
+        self._writes += 1
+        async with self._session_factory() as session, session.begin():
+            await put_cached_result(session, key, _dump(result), self._ttl)
+            if self._writes % _PURGE_EVERY == 0:
+                purged = await purge_cached_results(session)
+                logger.debug("result_cache_purged", rows=purged)
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_backend: ResultCacheBackend | None = None
+
+
+def _create_backend() -> ResultCacheBackend | None:
+    kind = settings.result_cache_backend
+    if kind == "memory":
+        return MemoryResultCache(settings.result_cache_size, settings.result_cache_ttl_s)
+    if kind == "postgres":
+        return PostgresResultCache(settings.result_cache_ttl_s)
+    if kind == "none":
+        return None
+    raise ValueError(f"result_cache_backend must be 'memory', 'postgres' or 'none', got {kind!r}")
+
+
+def get_result_cache() -> ResultCacheBackend | None:
+    """Return the configured result cache (``None`` when disabled), created on first use."""
+    global _backend
+    if _backend is None:
+        _backend = _create_backend()
+    return _backend
+
+
+def _filter_key(search_filter: SearchFilter | None) -> list[object] | None:
+    if not search_filter:
+        return None
+    return [
+        search_filter.source,
+        search_filter.source_prefix,
+        sorted(search_filter.document_ids) if search_filter.document_ids is not None else None,
+        search_filter.created_after.isoformat() if search_filter.created_after else None,
+        search_filter.created_before.isoformat() if search_filter.created_before else None,
+        search_filter.collection,
+    ]
+
+
+def result_cache_key(
+    generation: int | None,
+    query: str,
+    top_k: int,
+    *,
+    search_filter: SearchFilter | None = None,
+    ef_search: int | None = None,
+    probes: int | None = None,
+) -> str:
+    """Digest of everything that determines a retrieval result.
+
+    *generation* is ``None`` when caching is disabled and the key is only used
+    to coalesce concurrent requests.
+    """
+    parts = [
+        generation,
+        normalize_query(query),
+        top_k,
+        _filter_key(search_filter),
+        ef_search,
+        probes,
+        settings.retrieval_fusion,
+        settings.keyword_search_mode,
+        settings.text_search_config,
+        settings.vector_distance,
+        settings.hnsw_ef_search,
+        settings.ivfflat_probes,
+        settings.filter_exact_max_rows,
+        settings.filter_scan_mode,
+        settings.filter_overfetch_factor,
+    ]
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+
+_flights: SingleFlight[str, RetrievalResult] = SingleFlight()
+
+
+def get_retrieval_flights() -> SingleFlight[str, RetrievalResult]:
+    """Return the process-wide coalescer for retrieval misses."""
+    return _flights
+
+
+async def cached_retrieve(
+    query: str,
+    top_k: int = 5,
+    *,
+    search_filter: SearchFilter | None = None,
+    ef_search: int | None = None,
+    probes: int | None = None,
+    session_factory: async_sessionmaker[AsyncSession] = async_session,
+) -> tuple[RetrievalResult, CacheStatus]:
+    """:func:`hybrid_retrieve` through the result cache.
+
+    Returns the result and whether it was a cache ``HIT``, a ``MISS`` (now
+    cached unless partial) or a ``BYPASS`` (caching disabled).  A hit costs
+    one small query to read the corpus generation.  Misses and bypasses
+    join an identical retrieval already in flight when coalescing is on.
+    """
+    backend = get_result_cache()
+    generation = None
+    if backend is not None:
+        async with session_factory() as session:
+            generation = await get_generation(session)
+    key = result_cache_key(
+        generation,
+        query,
+        top_k,
+        search_filter=search_filter,
+        ef_search=ef_search,
+        probes=probes,
+    )
+    if backend is not None and (cached := await backend.get(key)) is not None:
+        return cached, "HIT"
+
+    async def retrieve() -> RetrievalResult:
+        result = await hybrid_retrieve(
+            query,
+            top_k,
+            search_filter=search_filter,
+            ef_search=ef_search,
+            probes=probes,
+            session_factory=session_factory,
+        )
+        if backend is not None and not result.partial:
+            await backend.set(key, result)
+        return result
+
+    if settings.retrieval_coalescing:
+        result = await _flights.do(key, retrieve)
+    else:
+        result = await retrieve()
+    return result, "MISS" if backend is not None else "BYPASS"
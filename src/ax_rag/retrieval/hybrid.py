@@ -2,22 +2,50 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime
+import asyncio
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import TypeVar
 
-from sqlalchemy.ext.asyncio import AsyncSession
+import numpy as np
+import numpy.typing as npt
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from ax_rag.embedding.stub import get_embedder
-from ax_rag.storage.pg import keyword_search, vector_search
+from ax_rag.core.config import settings
+from ax_rag.core.logging import get_logger
+from ax_rag.embedding.cache import aembed_queries, aembed_query
+from ax_rag.storage.pg import (
+    ChunkHit,
+    SearchFilter,
+    async_session,
+    hybrid_search,
+    keyword_search,
+    keyword_search_batch,
+    vector_search,
+    vector_search_batch,
+)
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
 
 
 @dataclass
-class ScoredChunk:
-    chunk_id: str
-    text: str
-    score: float
-    source: str
-    created_at: datetime
+class RetrievalResult:
+    """Fused chunks plus the legs that missed their deadline.
+
+    ``chunks`` are the storage layer's records, passed on without copying,
+    with ``score`` set to the fused score.  ``partial`` is true when at least
+    one leg timed out and the ranking was built from the legs that finished.
+    """
+
+    chunks: list[ChunkHit]
+    timed_out: list[str] = field(default_factory=list)
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.timed_out)
 
 
 def reciprocal_rank_fusion(
@@ -36,42 +64,253 @@ def reciprocal_rank_fusion(
     return scores
 
 
+async def _run_leg(
+    name: str,
+    search: Callable[[AsyncSession], Awaitable[T]],
+    session_factory: async_sessionmaker[AsyncSession],
+    timeout: float,
+) -> T | None:
+    """Run one retrieval leg on its own pooled connection.
+
+    Returns ``None`` if the leg does not finish within *timeout* seconds; the
+    in-flight query is cancelled and its connection released.
+    """
+
+    async def _search() -> T:
+        async with session_factory() as session:
+            return await search(session)
+
+    try:
+        return await asyncio.wait_for(_search(), timeout=max(timeout, 0.0))
+    except TimeoutError:
+        logger.warning("retrieval_leg_timeout", leg=name, timeout_ms=round(timeout * 1000))
+        return None
+
+
 async def hybrid_retrieve(
-    session: AsyncSession,
     query: str,
     top_k: int = 5,
-) -> list[ScoredChunk]:
-    """Run keyword + vector search in parallel and fuse results."""
-    embedder = get_embedder()
-    query_vec = embedder.embed(query)
+    *,
+    search_filter: SearchFilter | None = None,
+    budget_ms: int | None = None,
+    ef_search: int | None = None,
+    probes: int | None = None,
+    with_embeddings: bool = False,
+    session_factory: async_sessionmaker[AsyncSession] = async_session,
+) -> RetrievalResult:
+    """Run keyword + vector search in parallel and fuse results.
+
+    Each leg runs on its own connection and gets whatever remains of the
+    request-level latency budget (``settings.retrieval_budget_ms`` unless
+    *budget_ms* is given) once the query is embedded.  A leg that misses the
+    deadline is dropped and the result is marked partial.  *search_filter*
+    is pushed down into both legs.  *ef_search* / *probes* tune the vector
+    leg's ANN index scan for this request.  Chunk
+    embeddings are only fetched with *with_embeddings* (e.g. for reranking).
+
+    With ``settings.retrieval_fusion == "database"`` both legs and the fusion
+    run as one statement (:func:`hybrid_search`) instead; that halves round
+    trips, but a timeout then drops the whole result rather than one leg.
+    """
+    budget = (budget_ms if budget_ms is not None else settings.retrieval_budget_ms) / 1000
+    deadline = time.monotonic() + budget
+
+    query_vec = await aembed_query(query)
+
+    remaining = deadline - time.monotonic()
+    if settings.retrieval_fusion == "database":
+        return await _retrieve_fused_in_db(
+            query,
+            query_vec,
+            top_k,
+            session_factory,
+            remaining,
+            search_filter=search_filter,
+            ef_search=ef_search,
+            probes=probes,
+            with_embeddings=with_embeddings,
+        )
+
+    vec_results, kw_results = await asyncio.gather(
+        _run_leg(
+            "vector",
+            lambda s: vector_search(
+                s,
+                query_vec,
+                top_k=top_k * 2,
+                search_filter=search_filter,
+                ef_search=ef_search,
+                probes=probes,
+                with_embeddings=with_embeddings,
+            ),
+            session_factory,
+            remaining,
+        ),
+        _run_leg(
+            "keyword",
+            lambda s: keyword_search(
+                s,
+                query,
+                top_k=top_k * 2,
+                search_filter=search_filter,
+                with_embeddings=with_embeddings,
+            ),
+            session_factory,
+            remaining,
+        ),
+    )
+
+    timed_out = [
+        name for name, rows in (("vector", vec_results), ("keyword", kw_results)) if rows is None
+    ]
+    return RetrievalResult(
+        chunks=_fuse(vec_results or [], kw_results or [], top_k), timed_out=timed_out
+    )
 
-    vec_results = await vector_search(session, query_vec, top_k=top_k * 2)
-    kw_results = await keyword_search(session, query, top_k=top_k * 2)
 
+def _fuse(vec_results: list[ChunkHit], kw_results: list[ChunkHit], top_k: int) -> list[ChunkHit]:
+    """The *top_k* hits of both legs by RRF score, with ``score`` set."""
     # Build lookup by chunk ID
-    all_chunks = {}
-    for row in vec_results + kw_results:
-        all_chunks[row.id] = row
+    all_chunks: dict[str, ChunkHit] = {}
+    for hit in vec_results + kw_results:
+        all_chunks.setdefault(hit.chunk_id, hit)
 
     # Ranked lists (IDs in relevance order)
-    vec_ids = [r.id for r in vec_results]
-    kw_ids = [r.id for r in kw_results]
+    vec_ids = [hit.chunk_id for hit in vec_results]
+    kw_ids = [hit.chunk_id for hit in kw_results]
 
     fused = reciprocal_rank_fusion([vec_ids, kw_ids])
 
     # Sort by fused score descending
     sorted_ids = sorted(fused, key=lambda cid: fused[cid], reverse=True)[:top_k]
 
-    results: list[ScoredChunk] = []
+    results: list[ChunkHit] = []
     for cid in sorted_ids:
-        row = all_chunks[cid]
-        results.append(
-            ScoredChunk(
-                chunk_id=cid,  # type: ignore[arg-type]
-                text=row.text,  # type: ignore[arg-type]
-                score=round(fused[cid], 6),  # type: ignore[arg-type]
-                source=row.source,  # type: ignore[arg-type]
-                created_at=row.created_at,  # type: ignore[arg-type]
+        hit = all_chunks[cid]
+        hit.score = round(fused[cid], 6)
+        results.append(hit)
+    return results
+
+
+async def _retrieve_fused_in_db(
+    query: str,
+    query_vec: npt.NDArray[np.float32],
+    top_k: int,
+    session_factory: async_sessionmaker[AsyncSession],
+    timeout: float,
+    *,
+    search_filter: SearchFilter | None,
+    ef_search: int | None,
+    probes: int | None,
+    with_embeddings: bool,
+) -> RetrievalResult:
+    fused = await _run_leg(
+        "hybrid",
+        lambda s: hybrid_search(
+            s,
+            query_vec,
+            query,
+            top_k=top_k,
+            search_filter=search_filter,
+            ef_search=ef_search,
+            probes=probes,
+            with_embeddings=with_embeddings,
+        ),
+        session_factory,
+        timeout,
+    )
+    if fused is None:
+        return RetrievalResult(chunks=[], timed_out=["hybrid"])
+    for hit in fused:
+        hit.score = round(hit.score, 6)
+    return RetrievalResult(chunks=fused)
+
+
+async def hybrid_retrieve_many(
+    queries: list[str],
+    top_ks: list[int],
+    *,
+    query_vectors: list[npt.NDArray[np.float32]] | None = None,
+    collection: str | None = None,
+    ef_search: int | None = None,
+    probes: int | None = None,
+    session_factory: async_sessionmaker[AsyncSession] = async_session,
+) -> list[RetrievalResult]:
+    """:func:`hybrid_retrieve` for many queries: one statement per leg for all of them.
+
+    The legs run concurrently on two connections and are fused per query as
+    in :func:`hybrid_retrieve`.  There is no deadline: this is the throughput
+    path, and a timeout would drop every query at once.  Only *collection*
+    is searched, if given.
+    """
+    if query_vectors is None:
+        query_vectors = await aembed_queries(queries)
+    candidates = [k * 2 for k in top_ks]
+
+    async def vector_leg() -> list[list[ChunkHit]]:
+        async with session_factory() as session:
+            return await vector_search_batch(
+                session,
+                np.stack(query_vectors),
+                candidates,
+                collection=collection,
+                ef_search=ef_search,
+                probes=probes,
+            )
+
+    async def keyword_leg() -> list[list[ChunkHit]]:
+        async with session_factory() as session:
+            return await keyword_search_batch(session, queries, candidates, collection=collection)
+
+    vec_results, kw_results = await asyncio.gather(vector_leg(), keyword_leg())
+    return [
+        RetrievalResult(chunks=_fuse(vec, kw, k))
+        for vec, kw, k in zip(vec_results, kw_results, top_ks, strict=True)
+    ]
+
+
+async def iter_retrieve_many(
+    queries: list[str],
+    top_ks: list[int],
+    *,
+    batch_size: int | None = None,
+    collection: str | None = None,
+    ef_search: int | None = None,
+    probes: int | None = None,
+    session_factory: async_sessionmaker[AsyncSession] = async_session,
+) -> AsyncIterator[tuple[int, RetrievalResult]]:
+    """Yield ``(index, result)`` for every query, in order, batch by batch.
+
+    All queries are embedded up front in one call.  They are then retrieved
+    ``settings.search_batch_size`` at a time with :func:`hybrid_retrieve_many`,
+    and the next batch is already running while the caller consumes this
+    one, so the first results are ready long before the last.
+    """
+    if not queries:
+        return
+    size = batch_size or settings.search_batch_size
+    vectors = await aembed_queries(queries)
+
+    def retrieve(start: int) -> asyncio.Task[list[RetrievalResult]]:
+        return asyncio.create_task(
+            hybrid_retrieve_many(
+                queries[start : start + size],
+                top_ks[start : start + size],
+                query_vectors=vectors[start : start + size],
+                collection=collection,
+                ef_search=ef_search,
+                probes=probes,
+                session_factory=session_factory,
             )
         )
-    return results
+
+    pending = retrieve(0)
+    try:
+        for start in range(0, len(queries), size):
+            results = await pending
+            if start + size < len(queries):
+                pending = retrieve(start + size)
+            for offset, result in enumerate(results):
+                yield start + offset, result
+    finally:
+        pending.cancel()
@@ -2,13 +2,45 @@
 
 from __future__ import annotations
 
+import json
+import re
+import struct
 import uuid
+from collections.abc import Sequence
+from dataclasses import dataclass, field, replace
 from datetime import UTC, datetime
+from typing import Any
 
-from pgvector.sqlalchemy import Vector
-from sqlalchemy import Column, DateTime, Index, Integer, String, Text, text
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import numpy as np
+import numpy.typing as npt
+from pgvector.sqlalchemy import HALFVEC, Vector
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Computed,
+    DateTime,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    bindparam,
+    event,
+    text,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR
+from sqlalchemy.engine import Connection, Result, Row
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.sql.elements import BindParameter, TextClause
+from sqlalchemy.sql.selectable import TextualSelect
 
 from ax_rag.core.config import settings
 from ax_rag.core.logging import get_logger
@@ -23,27 +55,256 @@ class Base(DeclarativeBase):
     pass
 
 
+DEFAULT_COLLECTION = "default"
+
+# Collection names become part of partition and index names
+_COLLECTION_NAME = re.compile(r"[a-z][a-z0-9_]{0,31}")
+
+
+class Collection(Base):
+    """A named corpus searched on its own (see :func:`create_collection`).
+
+    ``documents`` and ``chunks`` are list-partitioned by collection, so each
+    collection has its own tables and indexes, ANN index included.  The
+    ``default`` collection always exists.
+    """
+
+    __tablename__ = "collections"
+
+    name = Column(String(32), primary_key=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
+
+
 class Document(Base):
     __tablename__ = "documents"
 
     id = Column(String(36), primary_key=True, default=lambda: uuid.uuid4().hex)
+    collection = Column(
+        String(32), primary_key=True, default=DEFAULT_COLLECTION, server_default=DEFAULT_COLLECTION
+    )
     source = Column(String(512), nullable=False)
-    raw_text = Column(Text, nullable=False)
+    raw_text = Column(Text)  # NULL for streamed uploads
+    # Upsert key: the caller's id, or the source when upserting without one
+    external_id = Column(String(512))
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
 
+    __table_args__ = (
+        Index("ix_documents_external_id", "collection", "external_id", unique=True),
+        {"postgresql_partition_by": "LIST (collection)"},
+    )
+
+
+# Generated from ``text`` so it can never drift; the GIN index serves ``@@``.
+_TEXT_SEARCH_EXPR = f"to_tsvector('{settings.text_search_config}'::regconfig, text)"
+
+# embedding_storage setting → pgvector type of the chunk embedding columns
+_EMBEDDING_STORAGE_TYPES = {"vector": Vector, "halfvec": HALFVEC}
+
+
+def _embedding_storage() -> str:
+    if settings.embedding_storage not in _EMBEDDING_STORAGE_TYPES:
+        raise ValueError(
+            f"embedding_storage must be one of {sorted(_EMBEDDING_STORAGE_TYPES)}, "
+            f"got {settings.embedding_storage!r}"
+        )
+    return settings.embedding_storage
+
 
 class ChunkRow(Base):
     __tablename__ = "chunks"
 
     id = Column(String(36), primary_key=True, default=lambda: uuid.uuid4().hex)
+    collection = Column(
+        String(32), primary_key=True, default=DEFAULT_COLLECTION, server_default=DEFAULT_COLLECTION
+    )
     document_id = Column(String(36), nullable=False, index=True)
     text = Column(Text, nullable=False)
     chunk_index = Column(Integer, nullable=False)
     source = Column(String(512), nullable=False)
-    embedding = Column(Vector(settings.embedding_dim))
+    # Type from settings.embedding_storage when created; reads and writes
+    # follow the column's actual type (see embedding_column_type)
+    embedding = Column(_EMBEDDING_STORAGE_TYPES[_embedding_storage()](settings.embedding_dim))
+    content_hash = Column(String(64))  # key into chunk_embeddings; NULL for older rows
+    text_search = Column(TSVECTOR, Computed(_TEXT_SEARCH_EXPR, persisted=True))
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
 
-    __table_args__ = (Index("ix_chunks_embedding", "embedding", postgresql_using="ivfflat"),)
+    __table_args__ = (
+        Index("ix_chunks_text_search", "text_search", postgresql_using="gin"),
+        # Search filters (see SearchFilter); text_pattern_ops serves prefixes too
+        Index("ix_chunks_source", "source", postgresql_ops={"source": "text_pattern_ops"}),
+        Index("ix_chunks_created_at", "created_at"),
+        {"postgresql_partition_by": "LIST (collection)"},
+    )
+
+
+# Tables partitioned by collection, each partition named by partition_name()
+_PARTITIONED_TABLES = ("documents", "chunks")
+
+
+def partition_name(table: str, collection: str) -> str:
+    """Name of *table*'s partition holding *collection*."""
+    return f"{table}_c_{collection}"
+
+
+def _check_collection_name(name: str) -> None:
+    if not _COLLECTION_NAME.fullmatch(name):
+        raise ValueError(
+            f"collection name must be 1-32 lowercase letters, digits or underscores "
+            f"starting with a letter, got {name!r}"
+        )
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_default_collection(_target: object, connection: Connection, **_kw: object) -> None:
+    """The default collection comes with the tables.
+
+    IF NOT EXISTS: ``init_db`` may have kept a table of an unpartitioned
+    version under the partition's name, to be attached instead.
+    """
+    connection.execute(
+        text(
+            "INSERT INTO collections (name, created_at) VALUES (:name, now()) "
+            "ON CONFLICT (name) DO NOTHING"
+        ),
+        {"name": DEFAULT_COLLECTION},
+    )
+    for table in _PARTITIONED_TABLES:
+        connection.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(table, DEFAULT_COLLECTION)} "
+                f"PARTITION OF {table} FOR VALUES IN ('{DEFAULT_COLLECTION}')"
+            )
+        )
+
+
+class ChunkEmbedding(Base):
+    """Embeddings by content hash, so identical chunk text is embedded once.
+
+    Keys cover the embedder and its dimension (see
+    :func:`ax_rag.embedding.dedup.content_hash`), and the column has no fixed
+    dimension, so vectors of several models can coexist.
+    """
+
+    __tablename__ = "chunk_embeddings"
+
+    content_hash = Column(String(64), primary_key=True)
+    embedding = Column(Vector(), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
+
+
+class CorpusState(Base):
+    """One row whose ``generation`` advances whenever chunks change."""
+
+    __tablename__ = "corpus_state"
+
+    id = Column(Integer, primary_key=True)
+    generation = Column(BigInteger, nullable=False, default=0)
+
+
+class SearchCacheEntry(Base):
+    """Search results shared by all API workers (``RESULT_CACHE_BACKEND=postgres``).
+
+    Unlogged: writes skip the WAL, and a crash simply empties the cache.
+    """
+
+    __tablename__ = "search_cache"
+
+    key = Column(String(64), primary_key=True)
+    value = Column(LargeBinary, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    __table_args__ = ({"prefixes": ["UNLOGGED"]},)
+
+
+class IngestJob(Base):
+    """A queued ``POST /ingest/async`` request (see :mod:`ax_rag.ingestion.jobs`).
+
+    ``status`` moves from ``queued`` to ``running`` to ``done`` or ``failed``;
+    failed attempts go back to ``queued`` until the attempts run out.
+    """
+
+    __tablename__ = "ingest_jobs"
+
+    id = Column(String(36), primary_key=True, default=lambda: uuid.uuid4().hex)
+    status = Column(String(16), nullable=False, default="queued")
+    collection = Column(
+        String(32), nullable=False, default=DEFAULT_COLLECTION, server_default=DEFAULT_COLLECTION
+    )
+    source = Column(String(512), nullable=False)
+    external_id = Column(String(512))
+    upsert = Column(Boolean, nullable=False, default=False)
+    raw_text = Column(Text)  # cleared once the job is done
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(JSONB)  # the IngestResponse of a finished job
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(UTC))
+    started_at = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))  # refreshed by the worker running it
+    finished_at = Column(DateTime(timezone=True))
+
+    # Serves the queue-depth count and the claim query, and stays small
+    __table_args__ = (
+        Index(
+            "ix_ingest_jobs_pending",
+            "created_at",
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+
+# ── Read records ──────────────────────────────────────────────────────────────
+
+
+@dataclass(slots=True)
+class ChunkHit:
+    """A chunk returned by a search: only the columns a response needs.
+
+    Built positionally from rows selecting ``_HIT_COLUMNS`` (see
+    :func:`_hits`).  ``embedding`` is only set when a search is asked for it;
+    ``score`` is filled in by fusion and left at 0 by the single-leg searches.
+    """
+
+    chunk_id: str
+    document_id: str
+    text: str
+    chunk_index: int
+    source: str
+    created_at: datetime
+    embedding: npt.NDArray[np.float32] | None = field(default=None, kw_only=True)
+    score: float = field(default=0.0, kw_only=True)
+
+
+_HIT_COLUMNS = ("id", "document_id", "text", "chunk_index", "source", "created_at")
+
+
+@dataclass(slots=True)
+class SearchFilter:
+    """Metadata conditions a search is restricted to, pushed down into its SQL.
+
+    Set fields are ANDed; a filter with none set matches everything and is
+    falsy.  ``created_after`` is inclusive and ``created_before`` exclusive.
+    ``collection`` confines the search to that collection's partition.
+    """
+
+    source: str | None = None
+    source_prefix: str | None = None
+    document_ids: list[str] | None = None
+    created_after: datetime | None = None
+    created_before: datetime | None = None
+    collection: str | None = None
+
+    def __bool__(self) -> bool:
+        return any(
+            value is not None
+            for value in (
+                self.source,
+                self.source_prefix,
+                self.document_ids,
+                self.created_after,
+                self.created_before,
+                self.collection,
+            )
+        )
 
 
 # ── Engine / Session ──────────────────────────────────────────────────────────
@@ -53,42 +314,826 @@ async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit
 
 
 async def init_db() -> None:
-    """Create tables and install pgvector extension."""
+    """Create tables and install pgvector extension.
+
+    Also brings tables created by earlier versions up to date (``create_all``
+    does not alter existing tables): see :func:`_upgrade_unpartitioned`, which
+    turns the ``documents`` and ``chunks`` of versions before collections
+    into the partitions of the ``default`` collection.  ``ingest_jobs`` gains
+    its ``collection``.  The ``pg_trgm`` index is created when substring
+    keyword search is enabled (see :func:`_ensure_trigram_index`).
+
+    The vector index is created here only if it is missing and can be built
+    meaningfully (see :func:`_ensure_vector_index`); use
+    :func:`rebuild_vector_index` to apply changed index settings.
+    """
     async with engine.begin() as conn:
         await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        upgraded = await _upgrade_unpartitioned(conn)
         await conn.run_sync(Base.metadata.create_all)
+        if "chunks" in upgraded:
+            await _keep_embedding_type(conn)
+        for table in upgraded:
+            await conn.execute(
+                text(
+                    f"ALTER TABLE {table} ATTACH PARTITION "
+                    f"{partition_name(table, DEFAULT_COLLECTION)} "
+                    f"FOR VALUES IN ('{DEFAULT_COLLECTION}')"
+                )
+            )
+        await conn.execute(
+            text(
+                "ALTER TABLE ingest_jobs ADD COLUMN IF NOT EXISTS collection varchar(32) "
+                f"NOT NULL DEFAULT '{DEFAULT_COLLECTION}'"
+            )
+        )
+        await conn.execute(
+            text("ALTER TABLE ingest_jobs ADD COLUMN IF NOT EXISTS heartbeat_at timestamptz")
+        )
+        await _ensure_vector_index(conn)
+        if settings.keyword_search_mode == "substring":
+            await _ensure_trigram_index(conn)
     logger.info("database_initialized")
 
 
+# Columns added since the first release, for tables that predate collections
+_UNPARTITIONED_UPGRADES = {
+    "documents": [
+        "ALTER TABLE documents ALTER COLUMN raw_text DROP NOT NULL",
+        "ALTER TABLE documents ADD COLUMN IF NOT EXISTS external_id varchar(512)",
+        # Unique per collection from now on
+        "DROP INDEX IF EXISTS ix_documents_external_id",
+    ],
+    "chunks": [
+        "ALTER TABLE chunks ADD COLUMN IF NOT EXISTS text_search tsvector "
+        f"GENERATED ALWAYS AS ({_TEXT_SEARCH_EXPR}) STORED",
+        "ALTER TABLE chunks ADD COLUMN IF NOT EXISTS content_hash varchar(64)",
+    ],
+}
+
+
+async def _upgrade_unpartitioned(conn: AsyncConnection) -> list[str]:
+    """Make plain ``documents``/``chunks`` tables ready to become partitions.
+
+    Each gains the columns of later versions and ``collection``, its primary
+    key becomes ``(id, collection)``, and it is renamed to the ``default``
+    collection's partition, its indexes suffixed with the collection.
+    ``create_all`` then creates the partitioned tables and :func:`init_db`
+    attaches the old ones: PostgreSQL adopts their equivalent indexes and
+    builds only the missing ones, and :func:`_ensure_vector_index` keeps the
+    ANN index.  The new primary key and the check of the partition bound
+    read the whole table under an exclusive lock, once.  Returns the tables
+    to attach.
+    """
+    upgraded = []
+    for table in _PARTITIONED_TABLES:
+        kind = await conn.scalar(
+            text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:table)"),
+            {"table": table},
+        )
+        if kind != "r":  # missing, or already partitioned
+            continue
+        partition = partition_name(table, DEFAULT_COLLECTION)
+        statements = [
+            *_UNPARTITIONED_UPGRADES[table],
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS collection varchar(32) "
+            f"NOT NULL DEFAULT '{DEFAULT_COLLECTION}'",
+            f"ALTER TABLE {table} DROP CONSTRAINT {table}_pkey",
+            f"ALTER TABLE {table} ADD CONSTRAINT {partition}_pkey PRIMARY KEY (id, collection)",
+            f"ALTER TABLE {table} RENAME TO {partition}",
+        ]
+        for statement in statements:
+            await conn.execute(text(statement))
+        indexes = await conn.scalars(
+            text(
+                "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() "
+                "AND tablename = :partition AND indexname <> :pkey"
+            ),
+            {"partition": partition, "pkey": f"{partition}_pkey"},
+        )
+        for index in indexes.all():
+            await conn.execute(text(f"ALTER INDEX {index} RENAME TO {index}_{DEFAULT_COLLECTION}"))
+        logger.info("table_partitioned", table=table, partition=partition)
+        upgraded.append(table)
+    return upgraded
+
+
+async def _keep_embedding_type(conn: AsyncConnection) -> None:
+    """Give the new, empty ``chunks`` the embedding type of the table it replaces.
+
+    Otherwise the old table could not be attached when
+    ``settings.embedding_storage`` differs from it; ``_ensure_vector_index``
+    reports the difference and ``scripts/convert_embeddings.py`` converts
+    the stored vectors.
+    """
+    old = await embedding_column_type(conn, table=partition_name("chunks", DEFAULT_COLLECTION))
+    if old is not None and old != await embedding_column_type(conn):
+        storage, dim = old
+        await conn.execute(text(f"ALTER TABLE chunks ALTER COLUMN embedding TYPE {storage}({dim})"))
+
+
+# ── Vector index ──────────────────────────────────────────────────────────────
+#
+# The ANN index is not declared on ``ChunkRow``: ``create_all`` would build it
+# on an empty table, where IVFFlat trains its lists on no data.  It is created
+# by ``init_db`` (HNSW, or IVFFlat once rows exist) and rebuilt on demand.
+# Like every index on ``chunks`` it is partitioned: each collection's
+# partition has its own, named ``<index>_<collection>`` when built here.
+
+VECTOR_INDEX = "ix_chunks_embedding"
+
+# vector_distance setting → (ORDER BY operator, index operator class suffix)
+_VECTOR_DISTANCES = {
+    "cosine": ("<=>", "cosine_ops"),
+    "l2": ("<->", "l2_ops"),
+    "inner_product": ("<#>", "ip_ops"),
+}
+
+# pgvector's default hnsw.ef_search; HNSW returns at most ef_search rows.
+_HNSW_DEFAULT_EF_SEARCH = 40
+
+
+def _vector_distance(storage: str = "vector") -> tuple[str, str]:
+    """ORDER BY operator and index operator class for columns of type *storage*."""
+    try:
+        operator, ops = _VECTOR_DISTANCES[settings.vector_distance]
+    except KeyError:
+        raise ValueError(
+            f"vector_distance must be one of {sorted(_VECTOR_DISTANCES)}, "
+            f"got {settings.vector_distance!r}"
+        ) from None
+    return operator, f"{storage}_{ops}"
+
+
+def _ivfflat_lists(rows: int) -> int:
+    """``settings.ivfflat_lists``, or pgvector's guideline for *rows* when 0."""
+    if settings.ivfflat_lists > 0:
+        return settings.ivfflat_lists
+    # rows / 1000 up to 1M rows, sqrt(rows) beyond
+    return max(rows // 1000 if rows <= 1_000_000 else int(rows**0.5), 1)
+
+
+def vector_index_sql(
+    name: str = VECTOR_INDEX,
+    *,
+    table: str = "chunks",
+    column: str = "embedding",
+    rows: int = 0,
+    concurrently: bool = False,
+    only: bool = False,
+    storage: str | None = None,
+) -> str:
+    """``CREATE INDEX`` statement for the ANN index described by the settings.
+
+    *rows* sizes IVFFlat lists when ``settings.ivfflat_lists`` is 0.  With
+    *only*, the index is created on the partitioned *table* alone, for
+    partitions' indexes to be attached to.  *storage* is the type of
+    *column*, ``vector`` or ``halfvec`` (default ``settings.embedding_storage``),
+    which picks the operator class.
+    """
+    kind = settings.vector_index_type
+    _, opclass = _vector_distance(storage or _embedding_storage())
+    if kind == "hnsw":
+        params = (
+            f"m = {int(settings.hnsw_m)}, ef_construction = {int(settings.hnsw_ef_construction)}"
+        )
+    elif kind == "ivfflat":
+        params = f"lists = {_ivfflat_lists(rows)}"
+    else:
+        raise ValueError(f"vector_index_type must be 'hnsw' or 'ivfflat', got {kind!r}")
+    concurrent = "CONCURRENTLY " if concurrently else ""
+    on = "ONLY " if only else ""
+    return (
+        f"CREATE INDEX {concurrent}{name} ON {on}{table} "
+        f"USING {kind} ({column} {opclass}) WITH ({params})"
+    )
+
+
+def _index_matches_settings(indexdef: str, storage: str = "vector") -> bool:
+    _, opclass = _vector_distance(storage)
+    using = f"USING {settings.vector_index_type} (embedding"
+    # PostgreSQL omits the default operator class (<storage>_l2_ops) from indexdef
+    return f"{using} {opclass})" in indexdef or (
+        opclass == f"{storage}_l2_ops" and f"{using})" in indexdef
+    )
+
+
+async def embedding_column_type(
+    conn: AsyncConnection | AsyncSession, column: str = "embedding", *, table: str = "chunks"
+) -> tuple[str, int] | None:
+    """``(storage, dim)`` of embedding *column* of *table*, or None if it is missing.
+
+    *storage* is ``vector`` or ``halfvec``.  The live type, not the setting,
+    decides how vectors are written and indexed, so processes keep working
+    while :mod:`ax_rag.ingestion.reindex` converts the column.
+    """
+    row = (
+        await conn.execute(
+            text(
+                "SELECT t.typname::text AS storage, a.atttypmod AS dim "
+                "FROM pg_attribute a JOIN pg_type t ON t.oid = a.atttypid "
+                "WHERE a.attrelid = CAST(:table AS regclass) AND a.attname = :column "
+                "AND NOT a.attisdropped"
+            ),
+            {"table": table, "column": column},
+        )
+    ).one_or_none()
+    return None if row is None else (row.storage, row.dim)
+
+
+async def _indexdef(conn: AsyncConnection, name: str) -> str | None:
+    indexdef: str | None = await conn.scalar(
+        text(
+            "SELECT indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND indexname = :name"
+        ),
+        {"name": name},
+    )
+    return indexdef
+
+
+async def _chunk_partitions(conn: AsyncConnection) -> list[tuple[str, str]]:
+    """``(collection, partition)`` for every partition of ``chunks``."""
+    partitions = await conn.scalars(
+        text(
+            "SELECT c.relname::text FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'chunks'::regclass ORDER BY c.relname"
+        )
+    )
+    prefix = partition_name("chunks", "")
+    return [(p.removeprefix(prefix), p) for p in partitions]
+
+
+async def _partition_indexes(
+    conn: AsyncConnection | AsyncSession, name: str
+) -> list[tuple[str, str]]:
+    """``(collection, index)`` for the partitions' indexes attached to index *name*."""
+    result = await conn.execute(
+        text(
+            """
+            SELECT t.relname::text, c.relname::text
+            FROM pg_inherits i
+            JOIN pg_index x ON x.indexrelid = i.inhrelid
+            JOIN pg_class c ON c.oid = x.indexrelid
+            JOIN pg_class t ON t.oid = x.indrelid
+            WHERE i.inhparent = to_regclass(:name)
+            """
+        ),
+        {"name": name},
+    )
+    prefix = partition_name("chunks", "")
+    return [(table.removeprefix(prefix), index) for table, index in result.tuples()]
+
+
+async def _rename_vector_index(conn: AsyncConnection | AsyncSession, old: str, new: str) -> None:
+    """Rename index *old* to *new*, and its partitions' indexes to match."""
+    children = await _partition_indexes(conn, old)
+    await conn.execute(text(f"ALTER INDEX {old} RENAME TO {new}"))
+    for collection, index in children:
+        await conn.execute(text(f"ALTER INDEX {index} RENAME TO {new}_{collection}"))
+
+
+async def _create_vector_index(
+    conn: AsyncConnection, name: str, *, column: str = "embedding", concurrently: bool = False
+) -> None:
+    """Create ANN index *name* on *column*, one partition at a time.
+
+    The index is created on the parent ``ONLY``, then each partition's index
+    is built, its IVFFlat lists sized for that partition's rows, and
+    attached.  ``CONCURRENTLY`` (outside a transaction) applies to the
+    partitions' indexes, which is where the work is.  A partition's index
+    of that name left unattached by a failed run is rebuilt.  The operator
+    class follows the column's type.
+    """
+    column_type = await embedding_column_type(conn, column)
+    storage = column_type[0] if column_type else _embedding_storage()
+    partitions = await _chunk_partitions(conn)
+    await conn.execute(text(vector_index_sql(name, column=column, only=True, storage=storage)))
+    for collection, partition in partitions:
+        child = f"{name}_{collection}"
+        if await _indexdef(conn, child) is not None:
+            concurrent = " CONCURRENTLY" if concurrently else ""
+            await conn.execute(text(f"DROP INDEX{concurrent} {child}"))
+        rows = await conn.scalar(text(f"SELECT count({column}) FROM {partition}"))
+        ddl = vector_index_sql(
+            child,
+            table=partition,
+            column=column,
+            rows=rows,
+            concurrently=concurrently,
+            storage=storage,
+        )
+        logger.info("vector_index_build_started", ddl=ddl, rows=rows)
+        await conn.execute(text(ddl))
+        await conn.execute(text(f"ALTER INDEX {name} ATTACH PARTITION {child}"))
+
+
+async def _adopt_vector_index(conn: AsyncConnection, indexdef: str) -> None:
+    """Make the ANN index kept by :func:`_upgrade_unpartitioned` the parent's.
+
+    The parent index is created ``ONLY`` with the same definition, so the
+    ``default`` partition's index attaches as it is: nothing is built at
+    startup, whatever the settings say.
+    """
+    parent = re.sub(
+        r"^CREATE INDEX \S+ ON \S+", f"CREATE INDEX {VECTOR_INDEX} ON ONLY chunks", indexdef
+    )
+    await conn.execute(text(parent))
+    await conn.execute(
+        text(f"ALTER INDEX {VECTOR_INDEX} ATTACH PARTITION {VECTOR_INDEX}_{DEFAULT_COLLECTION}")
+    )
+    logger.info("vector_index_adopted", indexdef=indexdef)
+
+
+async def _ensure_vector_index(conn: AsyncConnection) -> None:
+    """Create the ANN index if missing; warn if it no longer matches the settings.
+
+    IVFFlat is deferred while ``chunks`` is empty: its lists would be trained
+    on no data.  Run ``scripts/rebuild_index.py`` after loading.  The index
+    of a database upgraded by :func:`_upgrade_unpartitioned` is kept as it is
+    (:func:`_adopt_vector_index`) and only reported if outdated.  A column
+    stored with another precision than ``settings.embedding_storage`` is
+    reported too; ``scripts/convert_embeddings.py`` converts it.
+    """
+    column_type = await embedding_column_type(conn)
+    storage = column_type[0] if column_type else _embedding_storage()
+    if storage != _embedding_storage():
+        logger.warning(
+            "embedding_storage_outdated",
+            column_type=storage,
+            embedding_storage=settings.embedding_storage,
+            hint="run scripts/convert_embeddings.py to convert the stored vectors",
+        )
+    indexdef = await _indexdef(conn, VECTOR_INDEX)
+    if indexdef is None:
+        kept = await _indexdef(conn, f"{VECTOR_INDEX}_{DEFAULT_COLLECTION}")
+        if kept is not None:
+            await _adopt_vector_index(conn, kept)
+            indexdef = kept
+    if indexdef is not None:
+        if not _index_matches_settings(indexdef, storage):
+            logger.warning(
+                "vector_index_outdated",
+                indexdef=indexdef,
+                hint="run scripts/rebuild_index.py to apply the index settings",
+            )
+        return
+
+    rows = await conn.scalar(text("SELECT count(*) FROM chunks"))
+    if settings.vector_index_type == "ivfflat" and not rows:
+        logger.warning(
+            "vector_index_deferred",
+            reason="ivfflat needs data to train its lists",
+            hint="run scripts/rebuild_index.py after loading documents",
+        )
+        return
+    await _create_vector_index(conn, VECTOR_INDEX)
+
+
+async def build_vector_index(
+    name: str, *, column: str = "embedding", bind: AsyncEngine | None = None
+) -> None:
+    """Build ANN index *name* on *column* from the current settings.
+
+    Each partition's index is built ``CONCURRENTLY``, so reads and writes
+    continue meanwhile.  An existing index of that name (for example an
+    INVALID one left by a failed run) is dropped first.
+    """
+    async with (bind or engine).connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        # A partitioned index cannot be dropped CONCURRENTLY
+        await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        await _create_vector_index(conn, name, column=column, concurrently=True)
+
+
+async def rebuild_vector_index(
+    bind: AsyncEngine | None = None, *, collection: str | None = None
+) -> str:
+    """Rebuild the ANN index from the current settings and return its definition.
+
+    The new index is built under a temporary name (:func:`build_vector_index`)
+    and then swapped in for the old one; dropping the old one briefly locks
+    ``chunks``.  With *collection*, only that collection's index is rebuilt
+    with ``REINDEX CONCURRENTLY``, for instance to train IVFFlat lists once
+    a new collection is loaded; its definition is kept.
+    """
+    bind = bind or engine
+    if collection is not None:
+        return await _reindex_collection(bind, collection)
+    tmp_name = f"{VECTOR_INDEX}_new"
+    await build_vector_index(tmp_name, bind=bind)
+    async with bind.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(f"DROP INDEX IF EXISTS {VECTOR_INDEX}"))
+        await _rename_vector_index(conn, tmp_name, VECTOR_INDEX)
+        indexdef = await _indexdef(conn, VECTOR_INDEX)
+    logger.info("vector_index_rebuilt", indexdef=indexdef)
+    return str(indexdef)
+
+
+async def _reindex_collection(bind: AsyncEngine, collection: str) -> str:
+    async with bind.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        indexes = dict(await _partition_indexes(conn, VECTOR_INDEX))
+        if collection not in indexes:
+            raise ValueError(
+                f"collection {collection!r} has no vector index; rebuild the whole index"
+            )
+        await conn.execute(text(f"REINDEX INDEX CONCURRENTLY {indexes[collection]}"))
+        indexdef = await _indexdef(conn, indexes[collection])
+    logger.info("vector_index_rebuilt", indexdef=indexdef, collection=collection)
+    return str(indexdef)
+
+
+# ── Trigram index ─────────────────────────────────────────────────────────────
+#
+# Only built for KEYWORD_SEARCH_MODE=substring: a trigram index on full chunk
+# text is large and slows every insert.
+
+TRIGRAM_INDEX = "ix_chunks_text_trgm"
+
+
+def _trigram_index_sql(
+    name: str, table: str, *, concurrently: bool = False, only: bool = False
+) -> str:
+    concurrent = "CONCURRENTLY " if concurrently else ""
+    on = "ONLY " if only else ""
+    return f"CREATE INDEX {concurrent}{name} ON {on}{table} USING gin (text gin_trgm_ops)"
+
+
+async def _ensure_trigram_index(conn: AsyncConnection) -> None:
+    """Create the ``pg_trgm`` index if missing, as long as ``chunks`` is empty.
+
+    On existing rows the build would hold up startup and block writers for
+    as long as it takes, so it is left to :func:`build_trigram_index`
+    (``scripts/rebuild_index.py --trigram``), which does not block them.
+    The index of a database upgraded by :func:`_upgrade_unpartitioned` is
+    attached as it is.
+    """
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    if await _indexdef(conn, TRIGRAM_INDEX) is not None:
+        return
+    kept = f"{TRIGRAM_INDEX}_{DEFAULT_COLLECTION}"
+    if await _indexdef(conn, kept) is not None:
+        await conn.execute(text(_trigram_index_sql(TRIGRAM_INDEX, "chunks", only=True)))
+        await conn.execute(text(f"ALTER INDEX {TRIGRAM_INDEX} ATTACH PARTITION {kept}"))
+        return
+    if await conn.scalar(text("SELECT EXISTS (SELECT FROM chunks)")):
+        logger.warning(
+            "trigram_index_deferred",
+            reason="chunks has rows; substring search runs unindexed until it is built",
+            hint="run scripts/rebuild_index.py --trigram",
+        )
+        return
+    await conn.execute(text(_trigram_index_sql(TRIGRAM_INDEX, "chunks")))
+
+
+async def build_trigram_index(bind: AsyncEngine | None = None) -> str:
+    """Build the ``pg_trgm`` index on ``chunks.text``; return its definition.
+
+    Like the ANN index, it is created on the parent ``ONLY`` and each
+    partition's index is built ``CONCURRENTLY`` and attached, so reads and
+    writes continue meanwhile.  An index of that name, complete or left
+    INVALID by a failed run, is dropped first.
+    """
+    async with (bind or engine).connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.execute(text(f"DROP INDEX IF EXISTS {TRIGRAM_INDEX}"))
+        await conn.execute(text(_trigram_index_sql(TRIGRAM_INDEX, "chunks", only=True)))
+        for collection, partition in await _chunk_partitions(conn):
+            child = f"{TRIGRAM_INDEX}_{collection}"
+            await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {child}"))
+            await conn.execute(text(_trigram_index_sql(child, partition, concurrently=True)))
+            await conn.execute(text(f"ALTER INDEX {TRIGRAM_INDEX} ATTACH PARTITION {child}"))
+        indexdef = await _indexdef(conn, TRIGRAM_INDEX)
+    logger.info("trigram_index_built", indexdef=indexdef)
+    return str(indexdef)
+
+
+async def _set_search_params(
+    session: AsyncSession,
+    limit: int,
+    *,
+    ef_search: int | None = None,
+    probes: int | None = None,
+    iterative: bool = False,
+) -> None:
+    """Apply per-query ANN settings to the current transaction (``SET LOCAL``).
+
+    Only the knobs of the configured index type are set; the request value
+    wins over the ``Settings`` default.  ``hnsw.ef_search`` is raised to at
+    least *limit* because HNSW cannot return more rows than that.  With
+    *iterative* the index scan keeps going until enough rows pass the
+    query's filter (pgvector 0.8+, ``relaxed_order``: callers re-sort).
+    """
+    if iterative:
+        await session.execute(
+            text("SELECT set_config(:name, 'relaxed_order', true)"),
+            {"name": f"{settings.vector_index_type}.iterative_scan"},
+        )
+    if settings.vector_index_type == "hnsw":
+        name, value = "hnsw.ef_search", ef_search or settings.hnsw_ef_search
+        if value is None and limit > _HNSW_DEFAULT_EF_SEARCH:
+            value = limit
+        if value is not None:
+            value = max(value, limit)
+    else:
+        name, value = "ivfflat.probes", probes or settings.ivfflat_probes
+    if value is not None:
+        # set_config(..., true) is SET LOCAL with a bind parameter
+        await session.execute(
+            text("SELECT set_config(:name, :value, true)"), {"name": name, "value": str(value)}
+        )
+
+
 async def shutdown_db() -> None:
     """Dispose of the engine connection pool."""
     await engine.dispose()
     logger.info("database_shutdown")
 
 
+# ── Collections ───────────────────────────────────────────────────────────────
+#
+# A collection is a partition of ``documents`` and one of ``chunks``, so
+# creating one attaches tables and dropping one detaches and drops them: no
+# bulk INSERT or DELETE, and no bloat left behind in the other collections.
+
+
+async def create_collection(session: AsyncSession, name: str) -> datetime | None:
+    """Create collection *name* and its partitions; return its creation time.
+
+    Returns ``None`` if the collection already exists.
+
+    Each partition starts as an empty table and is attached, which builds
+    its copy of every index of the parent and locks the parent only against
+    other schema changes: searches and ingestion carry on.
+    """
+    _check_collection_name(name)
+    created_at: datetime | None = await session.scalar(
+        text(
+            "INSERT INTO collections (name, created_at) VALUES (:name, now()) "
+            "ON CONFLICT (name) DO NOTHING RETURNING created_at"
+        ),
+        {"name": name},
+    )
+    if created_at is None:
+        return None
+    for table in _PARTITIONED_TABLES:
+        partition = partition_name(table, name)
+        await session.execute(
+            text(
+                f"CREATE TABLE {partition} (LIKE {table} "
+                "INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING CONSTRAINTS)"
+            )
+        )
+        await session.execute(
+            text(f"ALTER TABLE {table} ATTACH PARTITION {partition} FOR VALUES IN ('{name}')")
+        )
+    logger.info("collection_created", collection=name)
+    return created_at
+
+
+async def drop_collection(session: AsyncSession, name: str) -> bool:
+    """Drop collection *name* with all its documents and chunks; ``False`` if unknown.
+
+    Its partitions are detached and dropped, its pending ingest jobs fail,
+    and the generation is bumped.  Detaching takes an exclusive lock on the
+    parent tables until the transaction commits, so keep it short.  The
+    ``default`` collection cannot be dropped.
+    """
+    if name == DEFAULT_COLLECTION:
+        raise ValueError("the default collection cannot be dropped")
+    dropped = await session.scalar(
+        text("DELETE FROM collections WHERE name = :name RETURNING name"), {"name": name}
+    )
+    if dropped is None:
+        return False
+    for table in _PARTITIONED_TABLES:
+        partition = partition_name(table, name)
+        await session.execute(text(f"ALTER TABLE {table} DETACH PARTITION {partition}"))
+        await session.execute(text(f"DROP TABLE {partition}"))
+    await session.execute(
+        text(
+            "UPDATE ingest_jobs SET status = 'failed', error = 'collection dropped', "
+            "raw_text = NULL, finished_at = now() "
+            "WHERE collection = :name AND status IN ('queued', 'running')"
+        ),
+        {"name": name},
+    )
+    await bump_generation(session)
+    logger.info("collection_dropped", collection=name)
+    return True
+
+
+async def collection_exists(session: AsyncSession, name: str) -> bool:
+    return bool(
+        await session.scalar(
+            text("SELECT EXISTS (SELECT 1 FROM collections WHERE name = :name)"), {"name": name}
+        )
+    )
+
+
+async def list_collections(session: AsyncSession) -> list[Row[Any]]:
+    """``(name, created_at, chunks)`` of every collection, by name.
+
+    ``chunks`` is the planner's estimate for the collection's partition,
+    which costs no scan; it is 0 until the partition is first analysed.
+    """
+    result = await session.execute(
+        text(
+            """
+            SELECT c.name, c.created_at,
+                   coalesce(greatest(p.reltuples, 0), 0)::bigint AS chunks
+            FROM collections c
+            LEFT JOIN pg_class p ON p.oid = to_regclass(:prefix || c.name)
+            ORDER BY c.name
+            """
+        ),
+        {"prefix": partition_name("chunks", "")},
+    )
+    return list(result.all())
+
+
 # ── CRUD helpers ──────────────────────────────────────────────────────────────
 
 
-async def insert_document(session: AsyncSession, source: str, raw_text: str) -> str:
-    doc = Document(source=source, raw_text=raw_text)
+async def insert_document(
+    session: AsyncSession,
+    source: str,
+    raw_text: str | None,
+    *,
+    collection: str = DEFAULT_COLLECTION,
+) -> str:
+    doc = Document(source=source, raw_text=raw_text, collection=collection)
     session.add(doc)
     await session.flush()
     return doc.id  # type: ignore[return-value]
 
 
+async def upsert_document(
+    session: AsyncSession,
+    external_id: str,
+    source: str,
+    raw_text: str | None,
+    *,
+    collection: str = DEFAULT_COLLECTION,
+) -> tuple[str, bool]:
+    """Create or update the document keyed by *external_id* in *collection*.
+
+    Returns ``(id, created)``: an update keeps the stored id, not the new one
+    (partitioned tables cannot return ``xmax``).  The row stays locked until
+    the transaction ends, so concurrent upserts of one document are applied
+    one after the other.
+
+    Keyed by its source (*external_id* equals *source*), the upsert adopts
+    the newest document stored without a key under that source, from a
+    plain ingest or one before upserts existed, rather than adding a copy.
+    """
+    if external_id == source:
+        adopted = (
+            await session.execute(
+                text(
+                    """
+                    UPDATE documents SET external_id = :source, raw_text = :raw_text
+                    WHERE collection = :collection AND external_id IS NULL AND id = (
+                        SELECT id FROM documents
+                        WHERE NOT EXISTS (
+                                SELECT 1 FROM documents
+                                WHERE collection = :collection AND external_id = :source
+                            )
+                            AND collection = :collection AND source = :source
+                            AND external_id IS NULL
+                        ORDER BY created_at DESC LIMIT 1
+                        FOR UPDATE
+                    )
+                    RETURNING id
+                    """
+                ),
+                {"collection": collection, "source": source, "raw_text": raw_text},
+            )
+        ).scalar_one_or_none()
+        if adopted is not None:
+            return adopted, False
+    row = (
+        await session.execute(
+            text(
+                """
+                INSERT INTO documents (id, collection, source, raw_text, external_id, created_at)
+                VALUES (:id, :collection, :source, :raw_text, :external_id, now())
+                ON CONFLICT (collection, external_id) DO UPDATE
+                SET source = excluded.source, raw_text = excluded.raw_text
+                RETURNING id, id = :id AS created
+                """
+            ),
+            {
+                "id": uuid.uuid4().hex,
+                "collection": collection,
+                "source": source,
+                "raw_text": raw_text,
+                "external_id": external_id,
+            },
+        )
+    ).one()
+    return row.id, row.created
+
+
+async def fetch_document_chunks(
+    session: AsyncSession, document_id: str, *, collection: str = DEFAULT_COLLECTION
+) -> list[tuple[str, int, str, str | None]]:
+    """``(id, chunk_index, text, content_hash)`` of a document's chunks, in order.
+
+    Only *collection*'s partition is read.
+    """
+    result = await session.execute(
+        text(
+            "SELECT id, chunk_index, text, content_hash FROM chunks "
+            "WHERE collection = :collection AND document_id = :d ORDER BY chunk_index"
+        ),
+        {"collection": collection, "d": document_id},
+    )
+    return list(result.tuples())
+
+
+async def delete_chunks(
+    session: AsyncSession, ids: Sequence[str], *, collection: str = DEFAULT_COLLECTION
+) -> int:
+    """Delete *collection*'s chunks by id; return how many were removed."""
+    if not ids:
+        return 0
+    result = await session.execute(
+        text("DELETE FROM chunks WHERE collection = :collection AND id = ANY(:ids)").bindparams(
+            bindparam("collection", value=collection, type_=String),
+            bindparam("ids", value=list(ids), type_=ARRAY(String)),
+        )
+    )
+    return result.rowcount  # type: ignore[attr-defined, no-any-return]
+
+
+async def update_chunk_positions(
+    session: AsyncSession,
+    ids: Sequence[str],
+    chunk_indexes: Sequence[int],
+    texts: Sequence[str],
+    source: str,
+    *,
+    collection: str = DEFAULT_COLLECTION,
+) -> int:
+    """Set the index, text and source of kept chunks; only rows that differ are written.
+
+    Only *collection*'s partition is updated.
+    """
+    if not ids:
+        return 0
+    result = await session.execute(
+        text(
+            """
+            UPDATE chunks
+            SET chunk_index = u.chunk_index, text = u.text, source = :source
+            FROM unnest(:ids, :idx, :texts) AS u(id, chunk_index, text)
+            WHERE chunks.collection = :collection AND chunks.id = u.id
+              AND (chunks.chunk_index, chunks.text, chunks.source)
+                  IS DISTINCT FROM (u.chunk_index, u.text, :source)
+            """
+        ).bindparams(
+            bindparam("ids", value=list(ids), type_=ARRAY(String)),
+            bindparam("idx", value=list(chunk_indexes), type_=ARRAY(Integer)),
+            bindparam("texts", value=list(texts), type_=ARRAY(Text)),
+            bindparam("source", value=source, type_=String),
+            bindparam("collection", value=collection, type_=String),
+        )
+    )
+    return result.rowcount  # type: ignore[attr-defined, no-any-return]
+
+
 async def insert_chunks(
     session: AsyncSession,
     document_id: str,
     chunks: list[dict[str, object]],
+    *,
+    collection: str = DEFAULT_COLLECTION,
 ) -> int:
-    """Insert chunk rows.  Each dict must have keys: text, chunk_index, source, embedding."""
+    """Insert chunk rows.  Each dict must have keys: text, chunk_index, source, embedding.
+
+    An optional ``content_hash`` key records which ``chunk_embeddings`` entry
+    the embedding came from.  The chunks belong to *collection*, which must
+    be the document's.
+
+    Streams rows with binary ``COPY`` (:func:`copy_chunks`) unless
+    ``settings.chunk_insert_method`` is ``"orm"``.
+    """
+    if settings.chunk_insert_method == "copy":
+        return await copy_chunks(session, document_id, chunks, collection=collection)
+
     rows = [
         ChunkRow(
+            collection=collection,
             document_id=document_id,
             text=c["text"],
             chunk_index=c["chunk_index"],
             source=c["source"],
             embedding=c["embedding"],
+            content_hash=c.get("content_hash"),
         )
         for c in chunks
     ]
@@ -97,72 +1142,1170 @@ async def insert_chunks(
     return len(rows)
 
 
-async def vector_search(
+# ── Corpus generation / result cache ──────────────────────────────────────────
+#
+# Cached search results are keyed by the corpus generation, so bumping it
+# makes every earlier entry unreachable (see ax_rag.retrieval.cache).
+
+
+async def get_generation(session: AsyncSession) -> int:
+    result = await session.scalar(text("SELECT coalesce(max(generation), 0) FROM corpus_state"))
+    return int(result)
+
+
+async def bump_generation(session: AsyncSession) -> int:
+    """Advance the corpus generation and return the new value.
+
+    Call it last in the transaction that changes chunks: the new generation
+    becomes visible together with the data, and the row lock it takes is
+    held only until the commit.
+    """
+    result = await session.scalar(
+        text(
+            "INSERT INTO corpus_state (id, generation) VALUES (1, 1) "
+            "ON CONFLICT (id) DO UPDATE SET generation = corpus_state.generation + 1 "
+            "RETURNING generation"
+        )
+    )
+    return int(result)
+
+
+async def get_cached_result(session: AsyncSession, key: str) -> bytes | None:
+    result = await session.scalar(
+        text("SELECT value FROM search_cache WHERE key = :key AND expires_at > now()"),
+        {"key": key},
+    )
+    return bytes(result) if result is not None else None
+
+
+async def put_cached_result(session: AsyncSession, key: str, value: bytes, ttl_s: float) -> None:
+    await session.execute(
+        text(
+            "INSERT INTO search_cache (key, value, expires_at) "
+            "VALUES (:key, :value, now() + make_interval(secs => :ttl)) "
+            "ON CONFLICT (key) DO UPDATE "
+            "SET value = excluded.value, expires_at = excluded.expires_at"
+        ).bindparams(bindparam("value", type_=LargeBinary)),
+        {"key": key, "value": value, "ttl": ttl_s},
+    )
+
+
+async def purge_cached_results(session: AsyncSession) -> int:
+    """Delete expired cache entries; return how many were removed."""
+    result = await session.execute(text("DELETE FROM search_cache WHERE expires_at <= now()"))
+    return result.rowcount  # type: ignore[attr-defined, no-any-return]
+
+
+# ── Bulk COPY ─────────────────────────────────────────────────────────────────
+#
+# Rows are encoded directly in PostgreSQL's binary COPY format rather than via
+# asyncpg codecs, so the vector codec never has to be registered on (and then
+# leak into) pooled connections.  pgvector's binary ``vector`` is
+# ``int16 dim, int16 unused, float4[dim]``, all big-endian; ``halfvec`` is the
+# same with IEEE half-precision ``float2`` elements.
+
+_PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_PGCOPY_TRAILER = struct.pack(">h", -1)
+_PG_EPOCH = datetime(2000, 1, 1, tzinfo=UTC)
+_NULL_FIELD = struct.pack(">i", -1)
+# Column type → big-endian NumPy dtype of its binary elements
+_VECTOR_ELEMENT_DTYPES = {"vector": ">f4", "halfvec": ">f2"}
+
+
+def _text_field(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return struct.pack(">i", len(data)) + data
+
+
+def _optional_text_field(value: str | None) -> bytes:
+    return _NULL_FIELD if value is None else _text_field(value)
+
+
+def _timestamptz_field(value: datetime) -> bytes:
+    delta = value - _PG_EPOCH
+    micros = (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return struct.pack(">iq", 8, micros)
+
+
+def _vector_fields(
+    embeddings: Sequence[object] | npt.NDArray[np.float32], storage: str = "vector"
+) -> list[bytes]:
+    """Encode embeddings as length-prefixed binary *storage* fields in one pass.
+
+    *storage* is ``vector`` or ``halfvec``; float32 values are rounded to
+    the nearest half for the latter.
+    """
+    present = [i for i, e in enumerate(embeddings) if e is not None]
+    fields = [_NULL_FIELD] * len(embeddings)
+    if present:
+        matrix = np.asarray([embeddings[i] for i in present], dtype=_VECTOR_ELEMENT_DTYPES[storage])
+        dim = matrix.shape[1]
+        prefix = struct.pack(">iHH", 4 + matrix.itemsize * dim, dim, 0)
+        for i, row in zip(present, matrix, strict=True):
+            fields[i] = prefix + row.tobytes()
+    return fields
+
+
+def _pgcopy_buffer(rows: Sequence[Sequence[bytes]]) -> bytearray:
+    """Assemble pre-encoded fields into a complete binary COPY stream."""
+    buf = bytearray(_PGCOPY_HEADER)
+    for fields in rows:
+        buf += struct.pack(">h", len(fields))
+        for value in fields:
+            buf += value
+    buf += _PGCOPY_TRAILER
+    return buf
+
+
+async def _asyncpg_connection(session: AsyncSession) -> Any:
+    """The raw asyncpg connection behind *session*, inside its transaction."""
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+    return raw.driver_connection
+
+
+async def copy_chunks(
     session: AsyncSession,
-    query_embedding: list[float],
-    top_k: int = 5,
-) -> list[ChunkRow]:
-    """Return the *top_k* closest chunks by cosine distance."""
+    document_id: str,
+    chunks: list[dict[str, object]],
+    *,
+    collection: str = DEFAULT_COLLECTION,
+) -> int:
+    """Bulk-insert chunk rows with one binary ``COPY`` in the session's transaction.
+
+    Takes the same dicts as :func:`insert_chunks`.  Ids and timestamps are
+    generated client-side, as the ORM defaults would.  Vectors are encoded
+    for the live type of ``chunks.embedding``; the lock taken first keeps
+    it from being swapped (:func:`swap_shadow_embedding`) before the COPY.
+    """
+    if not chunks:
+        return 0
+    await session.execute(text("LOCK TABLE ONLY chunks IN ROW EXCLUSIVE MODE"))
+    column_type = await embedding_column_type(session)
+    storage = column_type[0] if column_type else _embedding_storage()
+    created_at = _timestamptz_field(datetime.now(UTC))
+    doc_field = _text_field(document_id)
+    collection_field = _text_field(collection)
+    vectors = _vector_fields([c["embedding"] for c in chunks], storage)
+    rows = [
+        (
+            _text_field(uuid.uuid4().hex),
+            collection_field,
+            doc_field,
+            _text_field(c["text"]),  # type: ignore[arg-type]
+            struct.pack(">ii", 4, c["chunk_index"]),
+            _text_field(c["source"]),  # type: ignore[arg-type]
+            vec,
+            _optional_text_field(c.get("content_hash")),  # type: ignore[arg-type]
+            created_at,
+        )
+        for c, vec in zip(chunks, vectors, strict=True)
+    ]
+    conn = await _asyncpg_connection(session)
+    await conn.copy_to_table(
+        "chunks",
+        source=_pgcopy_buffer(rows),
+        columns=[
+            "id",
+            "collection",
+            "document_id",
+            "text",
+            "chunk_index",
+            "source",
+            "embedding",
+            "content_hash",
+            "created_at",
+        ],
+        format="binary",
+    )
+    return len(rows)
+
+
+async def _copy_embedding_batch(
+    session: AsyncSession,
+    ids: Sequence[str],
+    embeddings: Sequence[object] | npt.NDArray[np.float32],
+) -> None:
+    """COPY ``(id, embedding)`` pairs into the transaction-scoped ``chunk_embedding_batch``.
+
+    Callers drop the table once they have read it.
+    """
+    await session.execute(
+        text(
+            "CREATE TEMP TABLE chunk_embedding_batch "
+            "(id varchar(64) PRIMARY KEY, embedding vector) ON COMMIT DROP"
+        )
+    )
+    vectors = _vector_fields(embeddings)
+    conn = await _asyncpg_connection(session)
+    await conn.copy_to_table(
+        "chunk_embedding_batch",
+        source=_pgcopy_buffer([(_text_field(i), vec) for i, vec in zip(ids, vectors, strict=True)]),
+        columns=["id", "embedding"],
+        format="binary",
+    )
+
+
+async def update_embeddings(
+    session: AsyncSession,
+    ids: Sequence[str],
+    embeddings: Sequence[object] | npt.NDArray[np.float32],
+    *,
+    column: str = "embedding",
+) -> int:
+    """Replace the embeddings of existing chunks with one set-based ``UPDATE``.
+
+    The new vectors are COPYed into a transaction-scoped temp table first, so
+    a batch costs two statements however many rows it holds.  *column* may be
+    :data:`SHADOW_EMBEDDING` to fill the shadow column instead.
+    """
+    if column not in _EMBEDDING_COLUMNS:
+        raise ValueError(f"column must be one of {_EMBEDDING_COLUMNS}, got {column!r}")
+    if not ids:
+        return 0
+    await _copy_embedding_batch(session, ids, embeddings)
     result = await session.execute(
         text(
+            f"""
+            UPDATE chunks SET {column} = b.embedding
+            FROM chunk_embedding_batch b
+            WHERE chunks.id = b.id
             """
-            SELECT id, document_id, text, chunk_index, source, embedding, created_at
-            FROM chunks
-            ORDER BY embedding <=> :qvec
-            LIMIT :k
+        )
+    )
+    await session.execute(text("DROP TABLE chunk_embedding_batch"))
+    return result.rowcount  # type: ignore[attr-defined, no-any-return]
+
+
+# ── Embeddings by content hash ────────────────────────────────────────────────
+
+
+async def get_embeddings_by_hash(
+    session: AsyncSession, hashes: Sequence[str]
+) -> dict[str, npt.NDArray[np.float32]]:
+    """Stored embeddings for whichever of *hashes* are in ``chunk_embeddings``."""
+    if not hashes:
+        return {}
+    result = await session.execute(
+        text("SELECT content_hash, embedding FROM chunk_embeddings WHERE content_hash = ANY(:h)")
+        .columns(content_hash=String, embedding=Vector())
+        .bindparams(bindparam("h", value=list(hashes), type_=ARRAY(String))),
+    )
+    return dict(result.tuples().all())
+
+
+async def put_embeddings_by_hash(
+    session: AsyncSession,
+    hashes: Sequence[str],
+    embeddings: Sequence[object] | npt.NDArray[np.float32],
+) -> int:
+    """Store embeddings under their content *hashes*; return how many were new.
+
+    Hashes already present are left alone, so concurrent ingests of the same
+    text do not fail.  Rows are inserted in hash order, so two transactions
+    with overlapping batches cannot deadlock.
+    """
+    if not hashes:
+        return 0
+    await _copy_embedding_batch(session, hashes, embeddings)
+    result = await session.execute(
+        text(
+            """
+            INSERT INTO chunk_embeddings (content_hash, embedding, created_at)
+            SELECT id, embedding, now() FROM chunk_embedding_batch ORDER BY id
+            ON CONFLICT (content_hash) DO NOTHING
             """
-        ).bindparams(qvec=str(query_embedding), k=top_k),
+        )
+    )
+    await session.execute(text("DROP TABLE chunk_embedding_batch"))
+    return result.rowcount  # type: ignore[attr-defined, no-any-return]
+
+
+# ── Ingest jobs ───────────────────────────────────────────────────────────────
+#
+# A job queue in PostgreSQL: workers claim jobs with FOR UPDATE SKIP LOCKED, so
+# any number of them can poll one table without blocking on, or taking, each
+# other's jobs (see ax_rag.ingestion.jobs).
+
+
+async def enqueue_ingest_job(
+    session: AsyncSession,
+    raw_text: str,
+    source: str,
+    *,
+    external_id: str | None = None,
+    upsert: bool = False,
+    collection: str = DEFAULT_COLLECTION,
+    max_depth: int,
+) -> str | None:
+    """Queue a job and return its id, or ``None`` if *max_depth* jobs are pending.
+
+    The depth check and the insert are one statement; under concurrent
+    enqueues the limit can be overshot by the number of racing requests.
+    """
+    job_id = await session.scalar(
+        text(
+            """
+            INSERT INTO ingest_jobs (id, status, collection, source, external_id, upsert,
+                                     raw_text, attempts, created_at)
+            SELECT :id, 'queued', :collection, :source, :external_id, :upsert, :raw_text, 0,
+                   now()
+            WHERE (SELECT count(*) FROM ingest_jobs
+                   WHERE status IN ('queued', 'running')) < :max_depth
+            RETURNING id
+            """
+        ),
+        {
+            "id": uuid.uuid4().hex,
+            "collection": collection,
+            "source": source,
+            "external_id": external_id,
+            "upsert": upsert,
+            "raw_text": raw_text,
+            "max_depth": max_depth,
+        },
+    )
+    return str(job_id) if job_id is not None else None
+
+
+async def claim_ingest_jobs(session: AsyncSession, limit: int) -> list[Row[Any]]:
+    """Mark up to *limit* of the oldest queued jobs ``running`` and return them.
+
+    Rows locked by another worker's claim are skipped, not waited for.  The
+    claim is durable once the caller commits, so keep its transaction short.
+    A claim is identified by the job's id and ``attempts``, which each claim
+    increments: pass both to :func:`touch_ingest_jobs`,
+    :func:`finish_ingest_job` and :func:`fail_ingest_job`.
+    """
+    result = await session.execute(
+        text(
+            """
+            UPDATE ingest_jobs AS j
+            SET status = 'running', attempts = j.attempts + 1, started_at = now(),
+                heartbeat_at = now(), finished_at = NULL
+            FROM (
+                SELECT id FROM ingest_jobs WHERE status = 'queued'
+                ORDER BY created_at LIMIT :limit
+                FOR UPDATE SKIP LOCKED
+            ) AS q
+            WHERE j.id = q.id
+            RETURNING j.id, j.collection, j.source, j.external_id, j.upsert, j.raw_text,
+                      j.attempts, j.created_at
+            """
+        ),
+        {"limit": limit},
+    )
+    return sorted(result.all(), key=lambda row: row.created_at)
+
+
+async def touch_ingest_jobs(session: AsyncSession, claims: Sequence[tuple[str, int]]) -> int:
+    """Refresh the heartbeat of the ``(id, attempts)`` *claims* still running.
+
+    Returns how many are; the others were requeued meanwhile.
+    """
+    if not claims:
+        return 0
+    ids, attempts = zip(*claims, strict=True)
+    result = await session.execute(
+        text(
+            "UPDATE ingest_jobs SET heartbeat_at = now() "
+            "FROM unnest(:ids, :attempts) AS c(id, attempts) "
+            "WHERE ingest_jobs.id = c.id AND ingest_jobs.attempts = c.attempts "
+            "AND ingest_jobs.status = 'running'"
+        ).bindparams(
+            bindparam("ids", value=list(ids), type_=ARRAY(String)),
+            bindparam("attempts", value=list(attempts), type_=ARRAY(Integer)),
+        )
+    )
+    return result.rowcount  # type: ignore[attr-defined, no-any-return]
+
+
+async def finish_ingest_job(
+    session: AsyncSession, job_id: str, attempt: int, result: dict[str, Any]
+) -> bool:
+    """Mark a job ``done`` with its *result*, dropping the text it carried.
+
+    Only if claim *attempt* still holds it: returns False for a job requeued
+    meanwhile, whose writes the caller should roll back.
+    """
+    updated = await session.execute(
+        text(
+            "UPDATE ingest_jobs SET status = 'done', result = :result, error = NULL, "
+            "raw_text = NULL, finished_at = now() "
+            "WHERE id = :id AND attempts = :attempt AND status = 'running'"
+        ).bindparams(bindparam("result", type_=JSONB)),
+        {"id": job_id, "attempt": attempt, "result": result},
+    )
+    return bool(updated.rowcount)  # type: ignore[attr-defined]
+
+
+async def fail_ingest_job(
+    session: AsyncSession, job_id: str, attempt: int, error: str, *, retry: bool
+) -> None:
+    """Record a failed attempt: back to ``queued`` if *retry*, else ``failed``.
+
+    Ignored if claim *attempt* no longer holds the job.
+    """
+    await session.execute(
+        text(
+            "UPDATE ingest_jobs SET status = CASE WHEN :retry THEN 'queued' ELSE 'failed' END, "
+            "error = :error, finished_at = CASE WHEN :retry THEN NULL ELSE now() END "
+            "WHERE id = :id AND attempts = :attempt AND status = 'running'"
+        ),
+        {"id": job_id, "attempt": attempt, "error": error, "retry": retry},
+    )
+
+
+async def requeue_stale_ingest_jobs(
+    session: AsyncSession, timeout_s: float, max_attempts: int
+) -> int:
+    """Requeue running jobs without a heartbeat for *timeout_s*; return how many were reset.
+
+    Their worker is presumed dead.  Jobs already tried *max_attempts* times
+    are failed instead, so a document that kills its worker cannot loop.
+    """
+    result = await session.execute(
+        text(
+            """
+            UPDATE ingest_jobs
+            SET status = CASE WHEN attempts >= :max_attempts THEN 'failed' ELSE 'queued' END,
+                error = 'worker timed out',
+                finished_at = CASE WHEN attempts >= :max_attempts THEN now() END
+            WHERE status = 'running'
+              AND coalesce(heartbeat_at, started_at) < now() - make_interval(secs => :timeout)
+            """
+        ),
+        {"timeout": timeout_s, "max_attempts": max_attempts},
+    )
+    return result.rowcount  # type: ignore[attr-defined, no-any-return]
+
+
+async def get_ingest_job(session: AsyncSession, job_id: str) -> Row[Any] | None:
+    result = await session.execute(
+        text(
+            "SELECT id, status, collection, source, attempts, result, error, created_at, "
+            "started_at, finished_at FROM ingest_jobs WHERE id = :id"
+        ).columns(result=JSONB),
+        {"id": job_id},
+    )
+    return result.one_or_none()
+
+
+# ── Re-embedding ──────────────────────────────────────────────────────────────
+#
+# A new embedding model's vectors can be built in a shadow column while the
+# live one keeps serving queries, then swapped in (see ax_rag.ingestion.reindex).
+# Converting the stored vectors to another precision uses the same column.
+
+SHADOW_EMBEDDING = "embedding_next"
+_EMBEDDING_COLUMNS = ("embedding", SHADOW_EMBEDDING)
+
+
+async def fetch_chunk_page(
+    session: AsyncSession,
+    *,
+    after: str = "",
+    limit: int = 256,
+    missing: str | None = None,
+) -> list[tuple[str, str]]:
+    """Next *limit* ``(id, text)`` pairs in id order after id *after*.
+
+    Keyset pagination on the primary key: each page is one short indexed
+    query, so a full scan never holds a long transaction or a cursor open.
+    With *missing* set to an embedding column, only chunks where that column
+    is NULL are returned.
+    """
+    where = "id > :after"
+    if missing is not None:
+        if missing not in _EMBEDDING_COLUMNS:
+            raise ValueError(f"missing must be one of {_EMBEDDING_COLUMNS}, got {missing!r}")
+        where += f" AND {missing} IS NULL"
+    result = await session.execute(
+        text(f"SELECT id, text FROM chunks WHERE {where} ORDER BY id LIMIT :n"),
+        {"after": after, "n": limit},
+    )
+    return [(r.id, r.text) for r in result]
+
+
+async def estimate_chunk_count(session: AsyncSession) -> int:
+    """Planner estimate of the ``chunks`` row count; exact if a partition was never analysed."""
+    # A partitioned table has no statistics of its own: add up its partitions'
+    row = (
+        await session.execute(
+            text(
+                "SELECT sum(greatest(c.reltuples, 0))::bigint AS estimate, "
+                "bool_or(c.reltuples < 0) AS unanalysed "
+                "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = 'chunks'::regclass"
+            )
+        )
+    ).one()
+    if row.estimate is None or row.unanalysed:
+        return int(await session.scalar(text("SELECT count(*) FROM chunks")) or 0)
+    return int(row.estimate)
+
+
+async def add_shadow_embedding_column(
+    session: AsyncSession, dim: int, storage: str | None = None
+) -> None:
+    """Add the :data:`SHADOW_EMBEDDING` column for vectors of *dim* if missing.
+
+    Its type is *storage*, ``vector`` or ``halfvec``, by default
+    ``settings.embedding_storage``.
+    """
+    storage = storage or _embedding_storage()
+    if storage not in _EMBEDDING_STORAGE_TYPES:
+        raise ValueError(
+            f"storage must be one of {sorted(_EMBEDDING_STORAGE_TYPES)}, got {storage!r}"
+        )
+    await session.execute(
+        text(f"ALTER TABLE chunks ADD COLUMN IF NOT EXISTS {SHADOW_EMBEDDING} {storage}({dim:d})")
+    )
+
+
+async def copy_embeddings_to_shadow(
+    session: AsyncSession, *, after: str = "", limit: int = 1000
+) -> tuple[str | None, int]:
+    """Copy live vectors into :data:`SHADOW_EMBEDDING` for the next *limit* chunks after *after*.
+
+    The database casts each vector to the shadow column's type.  Chunks that
+    already have a shadow vector are skipped, so an interrupted conversion
+    can restart from the beginning cheaply.  Returns the last id of the page
+    (None once past the end) and the number of chunks copied.
+    """
+    row = (
+        await session.execute(
+            text(
+                f"""
+                WITH page AS (
+                    SELECT id FROM chunks WHERE id > :after ORDER BY id LIMIT :n
+                ), copied AS (
+                    UPDATE chunks c SET {SHADOW_EMBEDDING} = c.embedding
+                    FROM page
+                    WHERE c.id = page.id
+                      AND c.{SHADOW_EMBEDDING} IS NULL AND c.embedding IS NOT NULL
+                    RETURNING 1
+                )
+                SELECT (SELECT max(id) FROM page) AS last_id,
+                       (SELECT count(*) FROM copied) AS copied
+                """
+            ),
+            {"after": after, "n": limit},
+        )
+    ).one()
+    return row.last_id, int(row.copied)
+
+
+async def copy_missing_embeddings_to_shadow(session: AsyncSession) -> int:
+    """Copy live vectors into :data:`SHADOW_EMBEDDING` where it is still empty.
+
+    The catch-up pass for chunks ingested since :func:`copy_embeddings_to_shadow`
+    went by: one ``UPDATE`` that writes only those rows, without walking the
+    ids page by page.  Returns the number of chunks copied.
+    """
+    result = await session.execute(
+        text(
+            f"UPDATE chunks SET {SHADOW_EMBEDDING} = embedding "
+            f"WHERE {SHADOW_EMBEDDING} IS NULL AND embedding IS NOT NULL"
+        )
     )
-    rows = result.fetchall()
+    return result.rowcount  # type: ignore[attr-defined, no-any-return]
+
+
+async def swap_shadow_embedding(session: AsyncSession) -> None:
+    """Replace ``embedding`` with the shadow column, in the session's transaction.
+
+    The live column and its index are dropped; the shadow column and its
+    index (``ix_chunks_embedding_next``, if built) take over their names.
+    Callers must ensure every chunk has a shadow vector first.
+    """
+    await session.execute(text(f"DROP INDEX IF EXISTS {VECTOR_INDEX}"))
+    await session.execute(text("ALTER TABLE chunks DROP COLUMN embedding"))
+    await session.execute(text(f"ALTER TABLE chunks RENAME COLUMN {SHADOW_EMBEDDING} TO embedding"))
+    if await session.scalar(
+        text("SELECT to_regclass(:name) IS NOT NULL"), {"name": f"{VECTOR_INDEX}_next"}
+    ):
+        await _rename_vector_index(session, f"{VECTOR_INDEX}_next", VECTOR_INDEX)
+
+
+# ── Search ────────────────────────────────────────────────────────────────────
+
+
+def _hit_columns(with_embeddings: bool, prefix: str = "") -> str:
+    columns = (*_HIT_COLUMNS, "embedding") if with_embeddings else _HIT_COLUMNS
+    return ", ".join(f"{prefix}.{c}" if prefix else c for c in columns)
+
+
+def _hits(result: Result[Any], *, with_embeddings: bool, scored: bool = False) -> list[ChunkHit]:
+    """Records from rows of ``_hit_columns``, followed by the score if *scored*."""
+    n = len(_HIT_COLUMNS)
     return [
-        ChunkRow(
-            id=r.id,
-            document_id=r.document_id,
-            text=r.text,
-            chunk_index=r.chunk_index,
-            source=r.source,
-            embedding=r.embedding,
-            created_at=r.created_at,
-        )
-        for r in rows
+        ChunkHit(
+            *row[:n],
+            embedding=row[n] if with_embeddings else None,
+            score=row[-1] if scored else 0.0,
+        )
+        for row in result.tuples()
     ]
 
 
-async def keyword_search(
+def _hit_statement(sql: str, with_embeddings: bool) -> TextClause | TextualSelect:
+    """Wrap *sql*, typing ``embedding`` so pgvector decodes it to an array."""
+    statement = text(sql)
+    if with_embeddings:
+        return statement.columns(embedding=Vector(settings.embedding_dim))
+    return statement
+
+
+def _prefix_upper_bound(prefix: str) -> str | None:
+    """Smallest string above every string starting with *prefix*, if any."""
+    prefix = prefix.rstrip(chr(0x10FFFF))
+    if not prefix:
+        return None
+    last = ord(prefix[-1]) + 1
+    if 0xD800 <= last <= 0xDFFF:  # surrogates cannot be encoded
+        last = 0xE000
+    return prefix[:-1] + chr(last)
+
+
+def _filter_clause(search_filter: SearchFilter | None) -> tuple[str, list[BindParameter[Any]]]:
+    """WHERE conditions on ``chunks`` for *search_filter*, and their bind parameters.
+
+    An empty filter yields ``("true", [])``.  A source prefix becomes a
+    byte-wise range (``~>=~``/``~<~``) rather than ``LIKE``, so
+    ``ix_chunks_source`` serves it in generic plans too.  A collection lets
+    the planner prune the scan to that collection's partition.
+    """
+    if not search_filter:
+        return "true", []
+    conditions: list[str] = []
+    params: list[BindParameter[Any]] = []
+    if search_filter.collection is not None:
+        conditions.append(_collection_clause(search_filter))
+        params.append(bindparam("f_collection", value=search_filter.collection, type_=String))
+    if search_filter.source is not None:
+        conditions.append("source = :f_source")
+        params.append(bindparam("f_source", value=search_filter.source, type_=Text))
+    if search_filter.source_prefix is not None:
+        conditions.append("source ~>=~ :f_prefix")
+        params.append(bindparam("f_prefix", value=search_filter.source_prefix, type_=Text))
+        if (upper := _prefix_upper_bound(search_filter.source_prefix)) is not None:
+            conditions.append("source ~<~ :f_prefix_end")
+            params.append(bindparam("f_prefix_end", value=upper, type_=Text))
+    if search_filter.document_ids is not None:
+        conditions.append("document_id = ANY(:f_document_ids)")
+        params.append(
+            bindparam("f_document_ids", value=list(search_filter.document_ids), type_=ARRAY(String))
+        )
+    if search_filter.created_after is not None:
+        conditions.append("created_at >= :f_created_after")
+        params.append(
+            bindparam(
+                "f_created_after",
+                value=search_filter.created_after,
+                type_=DateTime(timezone=True),
+            )
+        )
+    if search_filter.created_before is not None:
+        conditions.append("created_at < :f_created_before")
+        params.append(
+            bindparam(
+                "f_created_before",
+                value=search_filter.created_before,
+                type_=DateTime(timezone=True),
+            )
+        )
+    return " AND ".join(conditions), params
+
+
+def _collection_clause(search_filter: SearchFilter | None, prefix: str = "") -> str:
+    """Condition keeping a query to the filter's collection (``:f_collection``), or ``true``."""
+    if search_filter is None or search_filter.collection is None:
+        return "true"
+    return f"{prefix}.collection = :f_collection" if prefix else "collection = :f_collection"
+
+
+# Set once per process by _supports_iterative_scan
+_iterative_scan: bool | None = None
+
+
+async def _supports_iterative_scan(session: AsyncSession) -> bool:
+    """Whether the installed pgvector has iterative index scans (0.8+)."""
+    global _iterative_scan
+    if _iterative_scan is None:
+        _iterative_scan = bool(
+            await session.scalar(
+                text(
+                    "SELECT string_to_array(extversion, '.')::int[] >= ARRAY[0, 8] "
+                    "FROM pg_extension WHERE extname = 'vector'"
+                )
+            )
+        )
+    return _iterative_scan
+
+
+async def _vector_scan_plan(
+    session: AsyncSession, where: str, params: list[BindParameter[Any]]
+) -> str:
+    """How to run a vector leg filtered by *where*.
+
+    * ``exact``: the planner estimates the filter matches at most
+      ``FILTER_EXACT_MAX_ROWS`` chunks, so they are all ranked without the
+      ANN index: exact, and cheap through the filter's own indexes.
+    * ``iterative``: an ANN scan that continues until enough rows pass the
+      filter (``FILTER_SCAN_MODE=iterative`` and pgvector 0.8+).
+    * ``overfetch``: an ANN scan for ``FILTER_OVERFETCH_FACTOR`` times the
+      rows wanted, filtered afterwards.
+
+    A plain ANN scan with a ``WHERE`` filters the rows the index returns
+    (at most ``ef_search`` for HNSW, a few lists for IVFFlat) and can come
+    back with fewer rows than asked for, or none.
+    """
+    mode = settings.filter_scan_mode
+    if mode not in ("iterative", "overfetch"):
+        raise ValueError(f"filter_scan_mode must be 'iterative' or 'overfetch', got {mode!r}")
+    # An estimate from the table statistics costs no scan; a wrong one only
+    # picks a slower plan, never fewer results
+    explained = await session.scalar(
+        text(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM chunks WHERE {where}").bindparams(*params)
+    )
+    estimate = (json.loads(explained) if isinstance(explained, str) else explained)[0]
+    if estimate["Plan"]["Plan Rows"] <= settings.filter_exact_max_rows:
+        return "exact"
+    if mode == "iterative" and await _supports_iterative_scan(session):
+        return "iterative"
+    return "overfetch"
+
+
+def _nearest_sql(
+    columns: str, operator: str, where: str, plan: str, limit: str = ":k", scope: str = "true"
+) -> str:
+    """SELECT of *columns* and ``distance`` for the *limit* chunks nearest ``:qvec``.
+
+    Only chunks matching *where* are returned, by the *plan* of
+    :func:`_vector_scan_plan` (``index`` when unfiltered).  Rows are not
+    guaranteed to be in order: wrap and ``ORDER BY distance``.  ``overfetch``
+    also binds ``:fetch``, and over-fetches within *scope*, the collection
+    condition of :func:`_collection_clause`.
+    """
+    distance = f"embedding {operator} :qvec"
+    if plan == "exact":
+        # OFFSET 0 keeps the subquery from being flattened into a plan that
+        # walks the ANN index and filters its rows
+        return f"""
+            SELECT * FROM (
+                SELECT {columns}, {distance} AS distance FROM chunks WHERE {where} OFFSET 0
+            ) AS candidates
+            ORDER BY distance
+            LIMIT {limit}
+        """
+    if plan == "overfetch":
+        return f"""
+            SELECT * FROM (
+                SELECT {columns}, {distance} AS distance FROM chunks
+                WHERE {scope}
+                ORDER BY distance
+                LIMIT :fetch
+            ) AS candidates
+            WHERE {where}
+            ORDER BY distance
+            LIMIT {limit}
+        """
+    return f"""
+        SELECT {columns}, {distance} AS distance FROM chunks
+        WHERE {where}
+        ORDER BY distance
+        LIMIT {limit}
+    """
+
+
+async def _prepare_vector_leg(
     session: AsyncSession,
-    query: str,
+    search_filter: SearchFilter | None,
+    limit: int,
+    *,
+    ef_search: int | None,
+    probes: int | None,
+) -> tuple[str, str, list[BindParameter[Any]]]:
+    """Pick the vector leg's plan and set its ANN parameters.
+
+    Returns the plan, the filter's WHERE clause and the bind parameters for
+    :func:`_nearest_sql` besides ``:qvec`` and the limit.  A collection
+    alone is searched through its partition's ANN index like an unfiltered
+    search.
+    """
+    where, params = _filter_clause(search_filter)
+    filtered = search_filter is not None and bool(replace(search_filter, collection=None))
+    plan = await _vector_scan_plan(session, where, params) if filtered else "index"
+    if plan == "overfetch":
+        limit *= settings.filter_overfetch_factor
+        params = [*params, bindparam("fetch", value=limit)]
+    await _set_search_params(
+        session, limit, ef_search=ef_search, probes=probes, iterative=plan == "iterative"
+    )
+    return plan, where, params
+
+
+async def vector_search(
+    session: AsyncSession,
+    query_embedding: Sequence[float] | npt.NDArray[np.float32],
     top_k: int = 5,
-) -> list[ChunkRow]:
-    """Simple keyword search using SQL ILIKE on chunk text."""
+    *,
+    search_filter: SearchFilter | None = None,
+    ef_search: int | None = None,
+    probes: int | None = None,
+    with_embeddings: bool = False,
+) -> list[ChunkHit]:
+    """Return the *top_k* closest chunks by ``settings.vector_distance``.
+
+    *search_filter* restricts the search to matching chunks; see
+    :func:`_vector_scan_plan` for how filtered searches still find *top_k*.
+    An over-fetch that comes up short is retried exactly.  *ef_search*
+    (HNSW) or *probes* (IVFFlat) trade recall for latency for this query
+    only, overriding ``settings.hnsw_ef_search``/``ivfflat_probes``.
+    Embeddings are only read and decoded when *with_embeddings* is set.
+    """
+    operator, _ = _vector_distance()
+    plan, where, params = await _prepare_vector_leg(
+        session, search_filter, top_k, ef_search=ef_search, probes=probes
+    )
+    qvec = bindparam("qvec", value=query_embedding, type_=Vector(settings.embedding_dim))
+    scope = _collection_clause(search_filter)
+
+    async def search(plan: str, params: list[BindParameter[Any]]) -> list[ChunkHit]:
+        nearest = _nearest_sql(_hit_columns(with_embeddings), operator, where, plan, scope=scope)
+        result = await session.execute(
+            _hit_statement(
+                f"SELECT * FROM ({nearest}) AS nearest ORDER BY distance", with_embeddings
+            ).bindparams(qvec, *params, k=top_k),
+        )
+        return _hits(result, with_embeddings=with_embeddings)
+
+    hits = await search(plan, params)
+    if plan == "overfetch" and len(hits) < top_k:
+        hits = await search("exact", [p for p in params if p.key != "fetch"])
+    return hits
+
+
+def _like_escape(term: str) -> str:
+    """Escape LIKE wildcards so *term* matches literally."""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _keyword_leg(query: str) -> tuple[str, str, list[BindParameter[Any]]]:
+    """Build the keyword leg's WHERE clause, ranking ORDER BY and bind parameters.
+
+    Every mode produces one fixed statement shape regardless of the number of
+    query terms, so asyncpg prepares it once per connection.
+
+    * ``fulltext`` parses the query with ``websearch_to_tsquery`` (quoted
+      phrases, ``or``, ``-term``), matches the GIN-indexed ``text_search``
+      column and ranks by ``ts_rank_cd``.
+    * ``substring`` requires every term as a literal, case-insensitive
+      substring (wildcards escaped) and ranks by trigram ``word_similarity``.
+      The longest term is repeated as a scalar ``ILIKE`` so the ``pg_trgm``
+      index can serve it; PostgreSQL cannot use an index for ``ILIKE ALL``.
+    * ``ilike`` is the legacy unindexed, unranked match, ordered by ``id``.
+
+    A blank query yields ``("false", "id", [])`` so callers can embed the
+    clause unconditionally.
+    """
     terms = query.strip().split()
     if not terms:
-        return []
+        return "false", "id", []
+
+    mode = settings.keyword_search_mode
+    if mode == "fulltext":
+        tsquery = "websearch_to_tsquery(CAST(:ts_config AS regconfig), :kw_query)"
+        return (
+            f"text_search @@ {tsquery}",
+            f"ts_rank_cd(text_search, {tsquery}) DESC, id",
+            [
+                bindparam("ts_config", value=settings.text_search_config, type_=Text),
+                bindparam("kw_query", value=query, type_=Text),
+            ],
+        )
+    if mode == "substring":
+        patterns = [f"%{_like_escape(term)}%" for term in terms]
+        return (
+            "text ILIKE :kw_anchor AND text ILIKE ALL(:kw_patterns)",
+            "word_similarity(:kw_query, text) DESC, id",
+            [
+                bindparam("kw_anchor", value=max(patterns, key=len), type_=Text),
+                bindparam("kw_patterns", value=patterns, type_=ARRAY(Text)),
+                bindparam("kw_query", value=query, type_=Text),
+            ],
+        )
+    if mode == "ilike":
+        return (
+            "text ILIKE ALL(:kw_patterns)",
+            "id",
+            [bindparam("kw_patterns", value=[f"%{t}%" for t in terms], type_=ARRAY(Text))],
+        )
+    raise ValueError(
+        f"keyword_search_mode must be 'fulltext', 'substring' or 'ilike', got {mode!r}"
+    )
 
-    # Build a WHERE clause that requires all terms to be present (AND logic)
-    conditions = " AND ".join(f"text ILIKE :t{i}" for i in range(len(terms)))
-    params = {f"t{i}": f"%{term}%" for i, term in enumerate(terms)}
-    params["k"] = top_k  # type: ignore[assignment]
+
+async def keyword_search(
+    session: AsyncSession,
+    query: str,
+    top_k: int = 5,
+    *,
+    search_filter: SearchFilter | None = None,
+    with_embeddings: bool = False,
+) -> list[ChunkHit]:
+    """Keyword search on chunk text, best match first.
+
+    Uses the full-text index by default; see :func:`_keyword_leg` for modes.
+    *search_filter* restricts it to matching chunks.
+    """
+    conditions, order_by, params = _keyword_leg(query)
+    if not params:
+        return []
+    where, filter_params = _filter_clause(search_filter)
 
     result = await session.execute(
-        text(
+        _hit_statement(
             f"""
-            SELECT id, document_id, text, chunk_index, source, embedding, created_at
+            SELECT {_hit_columns(with_embeddings)}
             FROM chunks
-            WHERE {conditions}
+            WHERE {conditions} AND {where}
+            ORDER BY {order_by}
             LIMIT :k
+            """,
+            with_embeddings,
+        ).bindparams(*params, *filter_params, k=top_k),
+    )
+    return _hits(result, with_embeddings=with_embeddings)
+
+
+async def hybrid_search(
+    session: AsyncSession,
+    query_embedding: Sequence[float] | npt.NDArray[np.float32],
+    query: str,
+    top_k: int = 5,
+    *,
+    candidates: int | None = None,
+    rrf_k: int = 60,
+    search_filter: SearchFilter | None = None,
+    ef_search: int | None = None,
+    probes: int | None = None,
+    with_embeddings: bool = False,
+) -> list[ChunkHit]:
+    """Vector + keyword search fused with reciprocal rank fusion in one statement.
+
+    Both legs are ranked CTEs over the best *candidates* ids (default
+    ``2 * top_k``); only the *top_k* fused winners are joined back to
+    ``chunks`` and returned, with the fused score in ``ChunkHit.score`` and
+    embeddings only if *with_embeddings*.  Scores and tie-breaks mirror
+    ``ax_rag.retrieval.hybrid.reciprocal_rank_fusion``: equal scores keep
+    vector-leg order first, then keyword-leg order.  *search_filter* and
+    *ef_search*/*probes* apply to both legs and the vector leg as in
+    :func:`vector_search` (without its exact retry).
+    """
+    conditions, order_by, params = _keyword_leg(query)
+    n = candidates if candidates is not None else top_k * 2
+    operator, _ = _vector_distance()
+    plan, where, filter_params = await _prepare_vector_leg(
+        session, search_filter, n, ef_search=ef_search, probes=probes
+    )
+    scope = _collection_clause(search_filter)
+
+    result = await session.execute(
+        _hit_statement(
+            f"""
+            WITH vec AS (
+                SELECT id, ROW_NUMBER() OVER (ORDER BY distance) AS rank
+                FROM ({_nearest_sql("id", operator, where, plan, ":n", scope)}) AS nearest
+            ),
+            kw AS (
+                SELECT id, ROW_NUMBER() OVER (ORDER BY {order_by}) AS rank
+                FROM chunks
+                WHERE {conditions} AND {where}
+                ORDER BY {order_by}
+                LIMIT :n
+            ),
+            fused AS (
+                SELECT
+                    COALESCE(vec.id, kw.id) AS id,
+                    COALESCE(1.0::float8 / (:rrf_k + vec.rank), 0.0)
+                        + COALESCE(1.0::float8 / (:rrf_k + kw.rank), 0.0) AS score,
+                    vec.rank AS vec_rank,
+                    kw.rank AS kw_rank
+                FROM vec FULL OUTER JOIN kw ON vec.id = kw.id
+                ORDER BY score DESC, vec_rank NULLS LAST, kw_rank
+                LIMIT :k
+            )
+            SELECT {_hit_columns(with_embeddings, "c")}, fused.score
+            FROM fused
+            JOIN chunks c ON c.id = fused.id AND {_collection_clause(search_filter, "c")}
+            ORDER BY fused.score DESC, fused.vec_rank NULLS LAST, fused.kw_rank
+            """,
+            with_embeddings,
+        ).bindparams(
+            bindparam("qvec", value=query_embedding, type_=Vector(settings.embedding_dim)),
+            *params,
+            *filter_params,
+            n=n,
+            k=top_k,
+            rrf_k=rrf_k,
+        ),
+    )
+    return _hits(result, with_embeddings=with_embeddings, scored=True)
+
+
+# ── Batched search ────────────────────────────────────────────────────────────
+#
+# Many queries in one statement: the queries are unnested into rows ``q`` and
+# each drives a LATERAL subquery with its own LIMIT, so every query still gets
+# its own index scan.  Hits come back tagged with the query's 1-based ordinal.
+
+
+def _vector_literals(embeddings: Sequence[object] | npt.NDArray[np.float32]) -> list[str]:
+    """pgvector text literals, to bind many vectors as one ``vector[]``."""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    return ["[" + ",".join(map(str, row.tolist())) + "]" for row in matrix]
+
+
+def _hits_by_query(result: Result[Any], n_queries: int) -> list[list[ChunkHit]]:
+    """Records from rows of ``q.ord`` then ``_hit_columns``, one list per query."""
+    hits: list[list[ChunkHit]] = [[] for _ in range(n_queries)]
+    for row in result.tuples():
+        hits[row[0] - 1].append(ChunkHit(*row[1 : len(_HIT_COLUMNS) + 1]))
+    return hits
+
+
+async def vector_search_batch(
+    session: AsyncSession,
+    query_embeddings: Sequence[object] | npt.NDArray[np.float32],
+    top_ks: Sequence[int],
+    *,
+    collection: str | None = None,
+    ef_search: int | None = None,
+    probes: int | None = None,
+) -> list[list[ChunkHit]]:
+    """:func:`vector_search` for many queries in one statement.
+
+    Returns the ``top_ks[i]`` closest chunks to ``query_embeddings[i]`` for
+    every *i*, in input order, searching only *collection* if given.
+    """
+    if not top_ks:
+        return []
+    operator, _ = _vector_distance()
+    where, params = _filter_clause(SearchFilter(collection=collection))
+    await _set_search_params(session, max(top_ks), ef_search=ef_search, probes=probes)
+    result = await session.execute(
+        text(
+            f"""
+            SELECT q.ord, {_hit_columns(False, "c")}
+            FROM unnest(CAST(:qvecs AS vector[]), :ks) WITH ORDINALITY AS q(qvec, k, ord)
+            CROSS JOIN LATERAL (
+                SELECT {_hit_columns(False)}, embedding {operator} q.qvec AS distance
+                FROM chunks
+                WHERE {where}
+                ORDER BY embedding {operator} q.qvec
+                LIMIT q.k
+            ) AS c
+            ORDER BY q.ord, c.distance
             """
-        ).bindparams(**params),
+        ).bindparams(
+            bindparam("qvecs", value=_vector_literals(query_embeddings), type_=ARRAY(Text)),
+            bindparam("ks", value=list(top_ks), type_=ARRAY(Integer)),
+            *params,
+        ),
     )
-    rows = result.fetchall()
-    return [
-        ChunkRow(
-            id=r.id,
-            document_id=r.document_id,
-            text=r.text,
-            chunk_index=r.chunk_index,
-            source=r.source,
-            embedding=r.embedding,
-            created_at=r.created_at,
-        )
-        for r in rows
+    return _hits_by_query(result, len(top_ks))
+
+
+def _keyword_leg_batch(queries: Sequence[str]) -> tuple[str, str, list[BindParameter[Any]]]:
+    """:func:`_keyword_leg` for the rows ``q`` of :func:`keyword_search_batch`.
+
+    The clauses refer to ``q.query`` and, in the substring modes, ``q.anchor``
+    (the query's longest pattern) and its patterns.  Those are one flat array
+    for the whole batch, each tagged with its query's ordinal, since
+    PostgreSQL arrays cannot be ragged.
+    """
+    mode = settings.keyword_search_mode
+    if mode == "fulltext":
+        tsquery = "websearch_to_tsquery(CAST(:ts_config AS regconfig), q.query)"
+        return (
+            f"text_search @@ {tsquery}",
+            f"ts_rank_cd(text_search, {tsquery}) DESC, id",
+            [
+                bindparam("ts_config", value=settings.text_search_config, type_=Text),
+                bindparam("kw_anchors", value=[None] * len(queries), type_=ARRAY(Text)),
+            ],
+        )
+    if mode not in ("substring", "ilike"):
+        raise ValueError(
+            f"keyword_search_mode must be 'fulltext', 'substring' or 'ilike', got {mode!r}"
+        )
+
+    patterns: list[str] = []
+    pattern_ords: list[int] = []
+    anchors: list[str | None] = []
+    for ordinal, query in enumerate(queries, start=1):
+        terms = query.split()
+        own = [f"%{_like_escape(t) if mode == 'substring' else t}%" for t in terms]
+        patterns.extend(own)
+        pattern_ords.extend([ordinal] * len(own))
+        anchors.append(max(own, key=len) if own else None)
+    all_patterns = (
+        "ARRAY(SELECT p.pattern FROM unnest(:kw_patterns, :kw_pattern_ords) "
+        "AS p(pattern, ord) WHERE p.ord = q.ord)"
+    )
+    params: list[BindParameter[Any]] = [
+        bindparam("kw_patterns", value=patterns, type_=ARRAY(Text)),
+        bindparam("kw_pattern_ords", value=pattern_ords, type_=ARRAY(Integer)),
+        bindparam("kw_anchors", value=anchors, type_=ARRAY(Text)),
     ]
+    if mode == "substring":
+        return (
+            f"text ILIKE q.anchor AND text ILIKE ALL({all_patterns})",
+            "word_similarity(q.query, text) DESC, id",
+            params,
+        )
+    return f"text ILIKE ALL({all_patterns})", "id", params
+
+
+async def keyword_search_batch(
+    session: AsyncSession,
+    queries: Sequence[str],
+    top_ks: Sequence[int],
+    *,
+    collection: str | None = None,
+) -> list[list[ChunkHit]]:
+    """:func:`keyword_search` for many queries in one statement, in input order.
+
+    Only *collection* is searched, if given.
+    """
+    if not queries:
+        return []
+    conditions, order_by, params = _keyword_leg_batch(queries)
+    where, filter_params = _filter_clause(SearchFilter(collection=collection))
+    # Blank queries match nothing, as in keyword_search
+    ks = [k if query.strip() else 0 for query, k in zip(queries, top_ks, strict=True)]
+    result = await session.execute(
+        text(
+            f"""
+            SELECT q.ord, {_hit_columns(False, "c")}
+            FROM unnest(:kw_queries, :kw_anchors, :ks)
+                WITH ORDINALITY AS q(query, anchor, k, ord)
+            CROSS JOIN LATERAL (
+                SELECT {_hit_columns(False)}, ROW_NUMBER() OVER (ORDER BY {order_by}) AS rank
+                FROM chunks
+                WHERE {conditions} AND {where}
+                ORDER BY {order_by}
+                LIMIT q.k
+            ) AS c
+            ORDER BY q.ord, c.rank
+            """
+        ).bindparams(
+            bindparam("kw_queries", value=list(queries), type_=ARRAY(Text)),
+            bindparam("ks", value=ks, type_=ARRAY(Integer)),
+            *params,
+            *filter_params,
+        ),
+    )
+    return _hits_by_query(result, len(queries))
@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import uuid
+
 import pytest
 from httpx import ASGITransport, AsyncClient
 
@@ -19,6 +21,18 @@ def sample_text() -> str:
     )
 
 
+@pytest.fixture
+def thread_pool(monkeypatch: pytest.MonkeyPatch):
+    """Run CPU-bound work on a fresh thread pool instead of worker processes."""
+    from ax_rag.core import executor
+    from ax_rag.core.config import settings
+
+    monkeypatch.setattr(settings, "executor_kind", "thread")
+    executor.shutdown_executor()
+    yield
+    executor.shutdown_executor()
+
+
 @pytest.fixture
 async def api_client():
     """AsyncClient wired to the FastAPI app *without* database lifespan.
@@ -31,3 +45,59 @@ async def api_client():
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as client:
         yield client
+
+
+@pytest.fixture
+async def pg_session_factory():
+    """Session factory bound to a throwaway schema in the configured PostgreSQL.
+
+    Tables are created fresh in a private schema (``public`` stays on the
+    search path for the pgvector type) and dropped afterwards.  Tests using it
+    are skipped when no database is reachable.
+    """
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    from ax_rag.core.config import settings
+    from ax_rag.storage.pg import Base
+
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    admin = create_async_engine(settings.database_url)
+    try:
+        async with admin.begin() as conn:
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            await conn.execute(text(f"CREATE SCHEMA {schema}"))
+    except (OSError, ConnectionError) as exc:
+        await admin.dispose()
+        pytest.skip(f"PostgreSQL not available: {exc}")
+
+    engine = create_async_engine(
+        settings.database_url,
+        connect_args={"server_settings": {"search_path": f"{schema},public"}},
+    )
+    async with engine.begin() as conn:
+        # checkfirst would find same-named tables in ``public`` via the search path
+        await conn.run_sync(Base.metadata.create_all, checkfirst=False)
+
+    try:
+        yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    finally:
+        await engine.dispose()
+        async with admin.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        await admin.dispose()
+
+
+@pytest.fixture
+def stored_tolerance() -> dict[str, float]:
+    """``assert_allclose`` tolerances for vectors read back from ``chunks.embedding``.
+
+    Float32 precision for ``vector`` storage; ``halfvec`` rounds each element
+    to float16.
+    """
+    from ax_rag.core.config import settings
+
+    if settings.embedding_storage == "halfvec":
+        return {"rtol": 1e-3, "atol": 1e-6}
+    return {"rtol": 1e-6, "atol": 0}
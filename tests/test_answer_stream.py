@@ -0,0 +1,140 @@
+"""Tests for streamed answers: the composer and the ``POST /answer/stream`` route."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import socket
+import threading
+import time
+from collections.abc import AsyncGenerator, Iterator
+
+import httpx
+import pytest
+import uvicorn
+from httpx import ASGITransport, AsyncClient
+
+from ax_rag.api.main import app
+from ax_rag.api.routes import answer
+from ax_rag.generation.composer import StubComposer, compose_answer
+from ax_rag.retrieval.hybrid import RetrievalResult
+
+
+def _events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.fixture
+async def client():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+        yield c
+
+
+@pytest.fixture
+def no_retrieval(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def fake_cached_retrieve(query, top_k=5, **kwargs):
+        return RetrievalResult(chunks=[]), "MISS"
+
+    monkeypatch.setattr(answer, "cached_retrieve", fake_cached_retrieve)
+
+
+class TestStubComposer:
+    async def test_pieces_rebuild_the_answer(self):
+        contexts = ["First  passage.", "Second\npassage."]
+        pieces = [p async for p in StubComposer().compose("why?", contexts)]
+        assert len(pieces) > 5
+        assert "".join(pieces) == compose_answer("why?", contexts)
+
+
+class TestAnswerStream:
+    async def test_sources_then_tokens_then_done(self, client, no_retrieval):
+        resp = await client.post("/answer/stream", json={"question": "rag"})
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/event-stream")
+
+        events = _events(resp.text)
+        assert events[0] == (
+            "sources",
+            {"question": "rag", "sources": [], "partial": False, "cache": "MISS"},
+        )
+        assert events[-1] == ("done", {})
+        streamed = "".join(data["text"] for name, data in events if name == "token")
+        whole = (await client.post("/answer", json={"question": "rag"})).json()["answer"]
+        assert streamed == whole
+
+    async def test_failure_ends_with_an_error_event(self, client, monkeypatch):
+        async def broken_cached_retrieve(query, top_k=5, **kwargs):
+            raise RuntimeError("database on fire")
+
+        monkeypatch.setattr(answer, "cached_retrieve", broken_cached_retrieve)
+        resp = await client.post("/answer/stream", json={"question": "rag"})
+        assert _events(resp.text) == [("error", {"detail": "Answer generation failed"})]
+
+
+class EndlessComposer:
+    """Yields forever; records when its consumer closes it."""
+
+    def __init__(self) -> None:
+        self.closed = threading.Event()
+
+    async def compose(self, question: str, contexts: list[str]) -> AsyncGenerator[str, None]:
+        try:
+            while True:
+                yield "token "
+                await asyncio.sleep(0.005)
+        finally:
+            self.closed.set()
+
+
+@pytest.fixture
+def server_url() -> Iterator[str]:
+    """The app served by uvicorn, which reports client disconnects."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+class TestClientDisconnect:
+    def test_disconnect_stops_generation(self, server_url, no_retrieval, monkeypatch):
+        composer = EndlessComposer()
+        monkeypatch.setattr(answer, "get_composer", lambda: composer)
+
+        with (
+            httpx.Client() as http,
+            http.stream("POST", f"{server_url}/answer/stream", json={"question": "q"}) as resp,
+        ):
+            lines = resp.iter_lines()
+            while next(lines) != "event: token":
+                pass
+        assert composer.closed.wait(timeout=2)
+
+    def test_disconnect_cancels_retrieval(self, server_url, monkeypatch):
+        started, cancelled = threading.Event(), threading.Event()
+
+        async def slow_cached_retrieve(query, top_k=5, **kwargs):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return RetrievalResult(chunks=[]), "MISS"
+
+        monkeypatch.setattr(answer, "cached_retrieve", slow_cached_retrieve)
+        with (
+            httpx.Client() as http,
+            http.stream("POST", f"{server_url}/answer/stream", json={"question": "q"}),
+        ):
+            assert started.wait(timeout=2)
+        assert cancelled.wait(timeout=2)
@@ -7,10 +7,16 @@ a live database, use ``docker compose up`` and run ``make test``.
 
 from __future__ import annotations
 
+import json
+from datetime import UTC, datetime
+
 import pytest
 from httpx import ASGITransport, AsyncClient
 
 from ax_rag.api.main import app
+from ax_rag.api.routes import answer, search
+from ax_rag.retrieval.hybrid import RetrievalResult
+from ax_rag.storage.pg import SearchFilter
 
 
 @pytest.fixture
@@ -27,6 +33,14 @@ class TestHealthEndpoint:
         assert resp.status_code == 200
         assert resp.json() == {"status": "ok"}
 
+    @pytest.mark.asyncio
+    async def test_stats_reports_query_cache_counters(self, client: AsyncClient):
+        resp = await client.get("/stats")
+        assert resp.status_code == 200
+        assert {"hits", "misses", "evictions", "hit_rate"} <= set(
+            resp.json()["query_embedding_cache"]
+        )
+
 
 class TestIngestValidation:
     @pytest.mark.asyncio
@@ -46,6 +60,104 @@ class TestSearchValidation:
         resp = await client.get("/search")
         assert resp.status_code == 422
 
+    @pytest.mark.asyncio
+    async def test_cache_status_header(self, client: AsyncClient, monkeypatch):
+        async def fake_cached_retrieve(query, top_k=5, **kwargs):
+            return RetrievalResult(chunks=[]), "HIT"
+
+        monkeypatch.setattr(search, "cached_retrieve", fake_cached_retrieve)
+        monkeypatch.setattr(answer, "cached_retrieve", fake_cached_retrieve)
+        resp = await client.get("/search", params={"q": "rag"})
+        assert resp.status_code == 200
+        assert resp.headers["x-cache"] == "HIT"
+        resp = await client.post("/answer", json={"question": "rag"})
+        assert resp.headers["x-cache"] == "HIT"
+
+    @pytest.mark.asyncio
+    async def test_filters_reach_retrieval(self, client: AsyncClient, monkeypatch):
+        seen = []
+
+        async def fake_cached_retrieve(query, top_k=5, *, search_filter=None, **kwargs):
+            seen.append(search_filter)
+            return RetrievalResult(chunks=[]), "MISS"
+
+        monkeypatch.setattr(search, "cached_retrieve", fake_cached_retrieve)
+        monkeypatch.setattr(answer, "cached_retrieve", fake_cached_retrieve)
+        resp = await client.get(
+            "/search",
+            params={
+                "q": "rag",
+                "source_prefix": "tenant-a/",
+                "document_id": ["d1", "d2"],
+                "created_after": "2025-01-01T00:00:00",
+            },
+        )
+        assert resp.status_code == 200
+        await client.get("/search", params={"q": "rag"})
+        await client.post("/answer", json={"question": "rag", "filters": {"source": "wiki"}})
+        await client.post("/answer", json={"question": "rag"})
+
+        assert seen[0] == SearchFilter(
+            source_prefix="tenant-a/",
+            document_ids=["d1", "d2"],
+            created_after=datetime(2025, 1, 1, tzinfo=UTC),
+            collection="default",
+        )
+        # Unprefixed routes search the default collection only
+        assert seen[1:] == [
+            SearchFilter(collection="default"),
+            SearchFilter(source="wiki", collection="default"),
+            SearchFilter(collection="default"),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_only_the_path_selects_a_collection(self, client: AsyncClient, monkeypatch):
+        seen = []
+
+        async def fake_cached_retrieve(query, top_k=5, *, search_filter=None, **kwargs):
+            seen.append(search_filter.collection)
+            return RetrievalResult(chunks=[]), "MISS"
+
+        monkeypatch.setattr(search, "cached_retrieve", fake_cached_retrieve)
+        await client.get("/search", params={"q": "rag", "collection": "acme"})
+        await client.get("/collections/default/search", params={"q": "rag"})
+        assert seen == ["default", "default"]
+
+        parameters = app.openapi()["paths"]["/search"]["get"]["parameters"]
+        assert "collection" not in {p["name"] for p in parameters}
+        prefixed = app.openapi()["paths"]["/collections/{collection}/search"]["get"]
+        assert {"name": "collection", "in": "path"}.items() <= prefixed["parameters"][0].items()
+
+
+class TestBatchSearch:
+    @pytest.mark.asyncio
+    async def test_streams_one_json_line_per_query(self, client: AsyncClient, monkeypatch):
+        seen = {}
+
+        async def fake_iter_retrieve_many(queries, top_ks, **kwargs):
+            seen.update(queries=queries, top_ks=top_ks, **kwargs)
+            for index in range(len(queries)):
+                yield index, RetrievalResult(chunks=[])
+
+        monkeypatch.setattr(search, "iter_retrieve_many", fake_iter_retrieve_many)
+        resp = await client.post(
+            "/search/batch",
+            json={"queries": [{"q": "rag", "top_k": 2}, {"q": "vectors"}], "ef_search": 80},
+        )
+        assert resp.status_code == 200
+        assert resp.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in resp.text.splitlines()]
+        assert [(line["index"], line["query"], line["count"]) for line in lines] == [
+            (0, "rag", 0),
+            (1, "vectors", 0),
+        ]
+        assert seen["top_ks"] == [2, 5] and seen["ef_search"] == 80
+
+    @pytest.mark.asyncio
+    async def test_empty_batch_rejected(self, client: AsyncClient):
+        resp = await client.post("/search/batch", json={"queries": []})
+        assert resp.status_code == 422
+
 
 class TestAnswerValidation:
     @pytest.mark.asyncio
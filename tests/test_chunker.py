@@ -2,9 +2,11 @@
 
 from __future__ import annotations
 
+import itertools
+
 import pytest
 
-from ax_rag.ingestion.chunker import chunk_text
+from ax_rag.ingestion.chunker import IncrementalChunker, chunk_text, iter_chunks
 
 
 class TestChunker:
@@ -44,3 +46,73 @@ class TestChunker:
     def test_overlap_ge_size_raises(self):
         with pytest.raises(ValueError, match="chunk_overlap"):
             chunk_text("hello", chunk_size=10, chunk_overlap=10)
+
+
+class TestIncrementalChunker:
+    TEXT = (
+        "  First sentence here. Second one is a little longer. Third!\n\n"
+        "A new paragraph with more words in it. " * 20 + "   "
+    )
+
+    @pytest.mark.parametrize("block", [1, 7, 64, 1000])
+    def test_blocks_match_whole_text(self, block):
+        chunker = IncrementalChunker(chunk_size=80, chunk_overlap=15)
+        chunks = []
+        for i in range(0, len(self.TEXT), block):
+            chunks += chunker.feed(self.TEXT[i : i + block])
+        chunks += chunker.close()
+        assert chunks == chunk_text(self.TEXT, chunk_size=80, chunk_overlap=15)
+
+    def test_emits_before_close(self):
+        chunker = IncrementalChunker(chunk_size=50, chunk_overlap=0)
+        assert chunker.feed("word " * 100)
+        assert chunker.feed("   ") == []
+
+    def test_buffer_stays_bounded(self):
+        chunker = IncrementalChunker(chunk_size=50, chunk_overlap=10)
+        for _ in range(1000):
+            chunker.feed("Some words. " * 10)
+            assert len(chunker._buf) <= 50 + 120
+
+    @pytest.mark.parametrize("block", [1, 3, 1000])
+    def test_offsets_are_absolute(self, block):
+        text = "\n  Alpha beta. Gamma delta? Epsilon zeta eta theta!  \n"
+        blocks = [text[i : i + block] for i in range(0, len(text), block)]
+        chunks = list(iter_chunks(blocks, chunk_size=20, chunk_overlap=5))
+        assert chunks[0].start_char == 3
+        for c in chunks:
+            assert text[c.start_char : c.end_char].strip() == c.text
+
+    def test_early_boundary_does_not_stall(self):
+        # A boundary inside the overlap used to move the window backwards
+        chunks = chunk_text("aaa. " + "b" * 1000, chunk_size=100, chunk_overlap=20)
+        assert chunks[0].start_char == 0
+        assert all(b.start_char > a.start_char for a, b in itertools.pairwise(chunks))
+        assert chunks[-1].end_char == 1005
+
+
+class TestIterChunks:
+    def test_breaks_after_sentence_punctuation_and_newlines(self):
+        text = "Is this the first one? It is! Next line follows\nand then a period. Done"
+        chunks = chunk_text(text, chunk_size=30, chunk_overlap=0)
+        assert [c.text for c in chunks] == [
+            "Is this the first one? It is!",
+            "Next line follows",
+            "and then a period. Done",
+        ]
+
+    def test_prefers_paragraph_break_over_hard_cut(self):
+        text = "word " * 8 + "\n\n" + "x" * 100
+        first = chunk_text(text, chunk_size=60, chunk_overlap=0)[0]
+        assert first.text == ("word " * 8).strip()
+
+    def test_string_and_blocks_agree(self):
+        text = "One. Two? Three!\nFour.\n\nFive six seven. " * 50
+        blocks = (text[i : i + 13] for i in range(0, len(text), 13))
+        assert list(iter_chunks(blocks, 40, 10)) == chunk_text(text, 40, 10)
+
+    def test_is_lazy(self):
+        # An endless source still yields chunks one at a time
+        chunks = iter_chunks(itertools.repeat("A short sentence. "), chunk_size=50, chunk_overlap=5)
+        first = list(itertools.islice(chunks, 100))
+        assert [c.index for c in first] == list(range(100))
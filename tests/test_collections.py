@@ -0,0 +1,331 @@
+"""Tests for collections: partitioned storage, scoped search and the /collections API.
+
+Integration tests: they need PostgreSQL with pgvector and are skipped when
+none is reachable.
+"""
+
+from __future__ import annotations
+
+import re
+
+import pytest
+from sqlalchemy import MetaData, text
+
+from ax_rag.api.routes import collections as collections_route
+from ax_rag.api.routes import ingest as ingest_route
+from ax_rag.core.config import settings
+from ax_rag.embedding.stub import HashEmbedder
+from ax_rag.retrieval.hybrid import hybrid_retrieve, hybrid_retrieve_many
+from ax_rag.storage import pg
+from ax_rag.storage.pg import (
+    SearchFilter,
+    _filter_clause,
+    create_collection,
+    delete_chunks,
+    drop_collection,
+    enqueue_ingest_job,
+    fetch_document_chunks,
+    get_generation,
+    get_ingest_job,
+    insert_chunks,
+    insert_document,
+    keyword_search,
+    list_collections,
+    rebuild_vector_index,
+    upsert_document,
+    vector_search,
+)
+
+TOPICS = ["vector", "keyword", "hybrid", "search", "index", "chunk", "embedding", "query"]
+
+
+async def _load(session_factory, collection: str, n: int) -> str:
+    """One document of *n* chunks in *collection*; returns its id."""
+    embedder = HashEmbedder()
+    texts = [f"{collection} note {i}: {TOPICS[i % len(TOPICS)]} details" for i in range(n)]
+    async with session_factory() as session, session.begin():
+        doc_id = await insert_document(
+            session, source=collection, raw_text=None, collection=collection
+        )
+        await insert_chunks(
+            session,
+            doc_id,
+            [
+                {"text": t, "chunk_index": i, "source": collection, "embedding": e}
+                for i, (t, e) in enumerate(zip(texts, embedder.embed_batch(texts), strict=True))
+            ],
+            collection=collection,
+        )
+    return doc_id
+
+
+async def _indexes(session_factory, table: str) -> list[str]:
+    async with session_factory() as session:
+        result = await session.scalars(
+            text(
+                "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() "
+                "AND tablename = :table"
+            ),
+            {"table": table},
+        )
+        return list(result)
+
+
+@pytest.fixture
+async def tenants(pg_session_factory):
+    """Collections ``small`` (20 chunks) and ``large`` (300), plus 5 in ``default``."""
+    async with pg_session_factory() as session, session.begin():
+        for name in ("small", "large"):
+            assert await create_collection(session, name) is not None
+    for name, n in (("small", 20), ("large", 300), ("default", 5)):
+        await _load(pg_session_factory, name, n)
+    await rebuild_vector_index(pg_session_factory.kw["bind"])
+    return pg_session_factory
+
+
+@pytest.mark.integration
+class TestCollections:
+    async def test_create_attaches_partitions_with_every_index(self, pg_session_factory):
+        async with pg_session_factory() as session, session.begin():
+            assert await create_collection(session, "acme") is not None
+            assert await create_collection(session, "acme") is None
+            with pytest.raises(ValueError, match="collection name"):
+                await create_collection(session, "Robert'); DROP TABLE chunks; --")
+
+        indexdefs = "\n".join(await _indexes(pg_session_factory, "chunks_c_acme"))
+        assert "USING gin (text_search)" in indexdefs
+        assert "(id, collection)" in indexdefs
+        assert await _indexes(pg_session_factory, "documents_c_acme")
+        async with pg_session_factory() as session:
+            names = [row.name for row in await list_collections(session)]
+        assert names == ["acme", "default"]
+
+    async def test_searches_stay_in_their_collection(self, tenants, monkeypatch):
+        query = HashEmbedder().embed("vector details")
+        async with tenants() as session:
+            for name in ("small", "large", "default"):
+                scoped = SearchFilter(collection=name)
+                hits = await vector_search(session, query, 10, search_filter=scoped)
+                assert {h.source for h in hits} == {name}
+                hits = await keyword_search(session, "details", 50, search_filter=scoped)
+                assert {h.source for h in hits} == {name}
+
+        for fusion in ("python", "database"):
+            monkeypatch.setattr(settings, "retrieval_fusion", fusion)
+            result = await hybrid_retrieve(
+                "vector", 8, search_filter=SearchFilter(collection="small"), session_factory=tenants
+            )
+            assert result.chunks and {c.source for c in result.chunks} == {"small"}, fusion
+        [batch] = await hybrid_retrieve_many(
+            ["vector"], [8], collection="large", session_factory=tenants
+        )
+        assert {c.source for c in batch.chunks} == {"large"}
+
+    async def test_scoped_search_only_scans_its_partition(self, tenants):
+        where, params = _filter_clause(SearchFilter(collection="small"))
+        async with tenants() as session:
+            await session.execute(text("SET LOCAL enable_seqscan = off"))
+            plan = await session.scalars(
+                text(
+                    f"EXPLAIN SELECT id FROM chunks WHERE {where} "
+                    "ORDER BY embedding <=> CAST(:q AS vector) LIMIT 5"
+                ).bindparams(*params),
+                {"q": str(HashEmbedder().embed("vector"))},
+            )
+            plan_text = "\n".join(plan)
+        assert "chunks_c_small" in plan_text
+        assert "chunks_c_large" not in plan_text and "chunks_c_default" not in plan_text
+
+    async def test_document_chunks_are_read_and_deleted_in_their_collection(self, tenants):
+        async with tenants() as session:
+            small = await session.scalar(text("SELECT id FROM documents_c_small"))
+            assert len(await fetch_document_chunks(session, small, collection="small")) == 20
+            assert await fetch_document_chunks(session, small, collection="large") == []
+            plan = "\n".join(
+                await session.scalars(
+                    text(
+                        "EXPLAIN SELECT id FROM chunks "
+                        "WHERE collection = 'small' AND document_id = :d"
+                    ),
+                    {"d": small},
+                )
+            )
+            assert "chunks_c_large" not in plan and "chunks_c_default" not in plan
+
+        async with tenants() as session, session.begin():
+            chunk_id, *_ = (await fetch_document_chunks(session, small, collection="small"))[0]
+            assert await delete_chunks(session, [chunk_id], collection="large") == 0
+            assert await delete_chunks(session, [chunk_id], collection="small") == 1
+
+    async def test_external_ids_are_unique_per_collection(self, tenants):
+        async with tenants() as session, session.begin():
+            small, created_small = await upsert_document(
+                session, "doc-1", "wiki", "v1", collection="small"
+            )
+            large, created_large = await upsert_document(
+                session, "doc-1", "wiki", "v1", collection="large"
+            )
+            again, created_again = await upsert_document(
+                session, "doc-1", "wiki", "v2", collection="small"
+            )
+        assert created_small and created_large and not created_again
+        assert small != large and again == small
+
+    async def test_drop_detaches_and_leaves_the_rest(self, tenants):
+        async with tenants() as session, session.begin():
+            job_id = await enqueue_ingest_job(
+                session, "pending", "mail", collection="large", max_depth=10
+            )
+            generation = await get_generation(session)
+
+        async with tenants() as session, session.begin():
+            assert await drop_collection(session, "large")
+            assert not await drop_collection(session, "large")
+            with pytest.raises(ValueError, match="default"):
+                await drop_collection(session, "default")
+
+        async with tenants() as session:
+            assert await get_generation(session) == generation + 1
+            assert (await get_ingest_job(session, job_id)).status == "failed"
+            tables = await session.scalar(
+                text("SELECT to_regclass('chunks_c_large'), to_regclass('documents_c_large')")
+            )
+            assert tables is None
+            counts = await session.execute(
+                text("SELECT collection, count(*) FROM chunks GROUP BY collection ORDER BY 1")
+            )
+            assert counts.all() == [("default", 5), ("small", 20)]
+
+    @pytest.mark.parametrize("kind", ["hnsw", "ivfflat"])
+    async def test_each_partition_has_its_own_ann_index(self, tenants, monkeypatch, kind: str):
+        monkeypatch.setattr(settings, "vector_index_type", kind)
+        await rebuild_vector_index(tenants.kw["bind"])
+        large = "\n".join(await _indexes(tenants, "chunks_c_large"))
+        assert re.search(rf"ix_chunks_embedding_large ON \S*chunks_c_large USING {kind}", large)
+
+        indexdef = await rebuild_vector_index(tenants.kw["bind"], collection="small")
+        assert "ix_chunks_embedding_small" in indexdef
+        with pytest.raises(ValueError, match="no vector index"):
+            await rebuild_vector_index(tenants.kw["bind"], collection="nope")
+
+
+LEGACY_SCHEMA = [
+    """
+    CREATE TABLE documents (
+        id varchar(36) PRIMARY KEY, source varchar(512) NOT NULL, raw_text text NOT NULL,
+        created_at timestamptz
+    )
+    """,
+    """
+    CREATE TABLE chunks (
+        id varchar(36) PRIMARY KEY, document_id varchar(36) NOT NULL, text text NOT NULL,
+        chunk_index integer NOT NULL, source varchar(512) NOT NULL,
+        embedding vector({dim}), created_at timestamptz
+    )
+    """,
+    "CREATE INDEX ix_chunks_document_id ON chunks (document_id)",
+    "CREATE INDEX ix_chunks_embedding ON chunks USING ivfflat (embedding)",
+    "INSERT INTO documents VALUES ('d1', 'old', 'old text', now())",
+    """
+    INSERT INTO chunks
+    SELECT g::text, 'd1', 'old chunk ' || g, g, 'old',
+           array_fill(g::real, ARRAY[{dim}])::vector, now()
+    FROM generate_series(1, 50) AS g
+    """,
+]
+
+
+def _create_missing_in_schema(bind, **kwargs) -> None:
+    """``create_all`` that checks the test schema only.
+
+    Its own check would find same-named tables in ``public`` via the search path.
+    """
+    existing = set(
+        bind.scalars(text("SELECT tablename FROM pg_tables WHERE schemaname = current_schema()"))
+    )
+    missing = [t for t in pg.Base.metadata.sorted_tables if t.name not in existing]
+    MetaData.create_all(pg.Base.metadata, bind, tables=missing, checkfirst=False)
+
+
+@pytest.mark.integration
+class TestUnpartitionedUpgrade:
+    @pytest.mark.parametrize("storage", ["vector", "halfvec"])
+    async def test_init_db_turns_old_tables_into_default_partitions(
+        self, pg_session_factory, monkeypatch, storage: str
+    ):
+        bind = pg_session_factory.kw["bind"]
+        async with bind.begin() as conn:
+            await conn.execute(text("DROP TABLE documents, chunks, collections, ingest_jobs"))
+            for statement in LEGACY_SCHEMA:
+                await conn.execute(text(statement.format(dim=settings.embedding_dim)))
+            ann_oid = await conn.scalar(text("SELECT 'ix_chunks_embedding'::regclass::oid"))
+        monkeypatch.setattr(pg, "engine", bind)
+        monkeypatch.setattr(pg.Base.metadata, "create_all", _create_missing_in_schema)
+        monkeypatch.setattr(settings, "vector_index_type", "hnsw")
+        monkeypatch.setattr(settings, "vector_distance", "cosine")
+        # As if EMBEDDING_STORAGE=<storage> at import; the old column stays vector
+        monkeypatch.setattr(settings, "embedding_storage", storage)
+        embedding_type = pg._EMBEDDING_STORAGE_TYPES[storage](settings.embedding_dim)
+        monkeypatch.setattr(pg.ChunkRow.__table__.c.embedding, "type", embedding_type)
+
+        await pg.init_db()
+        await pg.init_db()  # and again, now that everything is partitioned
+
+        async with pg_session_factory() as session:
+            kinds = await session.execute(
+                text(
+                    "SELECT relname::text, relkind::text FROM pg_class WHERE relname IN "
+                    "('documents', 'chunks', 'documents_c_default', 'chunks_c_default') "
+                    "AND relnamespace = current_schema()::regnamespace ORDER BY 1"
+                )
+            )
+            assert kinds.all() == [
+                ("chunks", "p"),
+                ("chunks_c_default", "r"),
+                ("documents", "p"),
+                ("documents_c_default", "r"),
+            ]
+            # The old IVFFlat index was kept, not rebuilt for the HNSW settings
+            assert (
+                await session.scalar(text("SELECT 'ix_chunks_embedding_default'::regclass::oid"))
+                == ann_oid
+            )
+            [parent] = [i for i in await _indexes(pg_session_factory, "chunks") if "ivfflat" in i]
+            assert "ix_chunks_embedding ON ONLY" in parent
+            assert await pg.embedding_column_type(session) == ("vector", settings.embedding_dim)
+            assert [row.name for row in await list_collections(session)] == ["default"]
+            hits = await keyword_search(
+                session, "chunk", 3, search_filter=SearchFilter(collection="default")
+            )
+            assert len(hits) == 3
+            _, created = await upsert_document(session, "x", "new", "new text")
+            assert created
+
+
+@pytest.mark.integration
+class TestCollectionsApi:
+    async def test_lifecycle(self, pg_session_factory, api_client, monkeypatch):
+        monkeypatch.setattr(collections_route, "async_session", pg_session_factory)
+        monkeypatch.setattr(ingest_route, "async_session", pg_session_factory)
+
+        created = await api_client.post("/collections", json={"name": "acme"})
+        assert created.status_code == 201
+        assert created.json()["name"] == "acme"
+        assert (await api_client.post("/collections", json={"name": "acme"})).status_code == 409
+        assert (await api_client.post("/collections", json={"name": "Acme!"})).status_code == 422
+        listed = await api_client.get("/collections")
+        assert [c["name"] for c in listed.json()] == ["acme", "default"]
+
+        queued = await api_client.post(
+            "/collections/acme/ingest/async", json={"text": "hello", "source": "a"}
+        )
+        assert queued.status_code == 202 and queued.json()["collection"] == "acme"
+        job_id = queued.json()["job_id"]
+        assert (await api_client.get(f"/collections/acme/ingest/jobs/{job_id}")).status_code == 200
+        assert (await api_client.get(f"/ingest/jobs/{job_id}")).status_code == 404  # default
+
+        missing = await api_client.get("/collections/nope/search", params={"q": "x"})
+        assert missing.status_code == 404
+        assert (await api_client.delete("/collections/default")).status_code == 409
+        assert (await api_client.delete("/collections/acme")).status_code == 204
+        assert (await api_client.delete("/collections/acme")).status_code == 404
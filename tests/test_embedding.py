@@ -2,11 +2,32 @@
 
 from __future__ import annotations
 
+import hashlib
 import math
+import struct
+
+import numpy as np
 
 from ax_rag.embedding.stub import HashEmbedder
 
 
+def _reference_embed(text: str, dim: int) -> list[float]:
+    """The original scalar implementation, kept to pin the vector format."""
+    raw: list[float] = []
+    base = text.encode("utf-8")
+    idx = 0
+    while len(raw) < dim:
+        digest = hashlib.sha256(base + struct.pack(">I", idx)).digest()
+        for offset in range(0, 32, 4):
+            if len(raw) >= dim:
+                break
+            value = struct.unpack(">I", digest[offset : offset + 4])[0]
+            raw.append((value / 0xFFFFFFFF) * 2 - 1)
+        idx += 1
+    norm = math.sqrt(sum(x * x for x in raw))
+    return [x / norm for x in raw]
+
+
 class TestHashEmbedder:
     def setup_method(self):
         self.embedder = HashEmbedder(dim=128)
@@ -35,3 +56,24 @@ class TestHashEmbedder:
         results = self.embedder.embed_batch(texts)
         assert len(results) == 3
         assert all(len(v) == 128 for v in results)
+
+    def test_embed_batch_returns_float32_matrix(self):
+        results = self.embedder.embed_batch(["one", "two"])
+        assert isinstance(results, np.ndarray)
+        assert results.dtype == np.float32
+        assert results.shape == (2, 128)
+
+    def test_embed_batch_empty(self):
+        assert self.embedder.embed_batch([]).shape == (0, 128)
+
+    def test_embed_batch_matches_reference(self):
+        texts = ["", "hello world", "naïve café — 日本語", "x" * 2000]
+        for dim in (1, 7, 128, 384):
+            batch = HashEmbedder(dim=dim).embed_batch(texts)
+            expected = np.array([_reference_embed(t, dim) for t in texts], dtype=np.float32)
+            np.testing.assert_array_equal(batch, expected)
+
+    def test_embed_matches_batch_row(self):
+        texts = ["alpha", "beta"]
+        batch = self.embedder.embed_batch(texts)
+        assert self.embedder.embed("beta") == batch[1].tolist()
@@ -0,0 +1,145 @@
+"""Tests for cross-request micro-batching of embedding calls."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+
+from ax_rag.core.config import settings
+from ax_rag.embedding.batcher import MicroBatcher
+from ax_rag.embedding.cache import QueryEmbeddingCache, aembed_query
+from ax_rag.embedding.dedup import embed_chunks
+from ax_rag.embedding.stub import HashEmbedder
+
+
+class SlowProvider(HashEmbedder):
+    """A stand-in for a remote provider: every call costs a fixed round trip."""
+
+    def __init__(self, latency_s: float = 0.02, fail: bool = False) -> None:
+        super().__init__()
+        self.latency_s = latency_s
+        self.fail = fail
+        self.batches: list[list[str]] = []
+
+    async def aembed_batch(self, texts: list[str]) -> npt.NDArray[np.float32]:
+        self.batches.append(texts)
+        await asyncio.sleep(self.latency_s)
+        if self.fail:
+            raise RuntimeError("provider unavailable")
+        return self.embed_batch(texts)
+
+
+class TestMicroBatcher:
+    async def test_concurrent_calls_share_batches(self, thread_pool):
+        batcher = MicroBatcher(HashEmbedder(), max_size=16, max_wait_ms=5)
+        texts = [f"query {i}" for i in range(40)]
+
+        vectors = await asyncio.gather(*(batcher.embed(t) for t in texts))
+
+        np.testing.assert_array_equal(np.stack(vectors), HashEmbedder().embed_batch(texts))
+        assert batcher.stats() == {
+            "batches": 3,
+            "items": 40,
+            "mean_batch_size": 13.33,
+            "largest_batch": 16,
+        }
+
+    async def test_batches_amortise_provider_latency(self):
+        provider = SlowProvider(latency_s=0.02)
+        batcher = MicroBatcher(provider, max_size=64, max_wait_ms=2)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(batcher.embed(f"q{i}") for i in range(100)))
+        elapsed = loop.time() - started
+
+        assert [len(b) for b in provider.batches] == [64, 36]
+        assert elapsed < 0.5  # 100 unbatched calls would take 2 s
+
+    async def test_lone_call_waits_at_most_the_window(self):
+        provider = SlowProvider(latency_s=0)
+        batcher = MicroBatcher(provider, max_size=64, max_wait_ms=10)
+        vector = await asyncio.wait_for(batcher.embed("alone"), timeout=1)
+        np.testing.assert_array_equal(vector, provider.embed_batch(["alone"])[0])
+        assert provider.batches == [["alone"]]
+
+    async def test_duplicate_texts_embedded_once(self):
+        provider = SlowProvider(latency_s=0)
+        batcher = MicroBatcher(provider, max_size=8, max_wait_ms=5)
+        a, _, c = await asyncio.gather(*(batcher.embed(t) for t in ["x", "y", "x"]))
+        assert provider.batches == [["x", "y"]]
+        np.testing.assert_array_equal(a, c)
+
+    async def test_failure_reaches_every_caller(self):
+        batcher = MicroBatcher(SlowProvider(latency_s=0, fail=True), max_size=8, max_wait_ms=1)
+        results = await asyncio.gather(
+            *(batcher.embed(t) for t in ["a", "b"]), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def test_cancelled_caller_does_not_cancel_the_batch(self):
+        batcher = MicroBatcher(SlowProvider(latency_s=0.02), max_size=8, max_wait_ms=1)
+        doomed = asyncio.create_task(batcher.embed("gone"))
+        survivor = asyncio.create_task(batcher.embed("kept"))
+        await asyncio.sleep(0.005)
+        doomed.cancel()
+        assert (await survivor).shape == (384,)
+
+    async def test_cancelled_batch_cancels_its_callers(self):
+        batcher = MicroBatcher(SlowProvider(latency_s=10), max_size=8, max_wait_ms=1)
+        callers = [asyncio.create_task(batcher.embed(t)) for t in ["a", "b"]]
+        await asyncio.sleep(0.01)
+        [dispatch] = batcher._dispatches
+        dispatch.cancel()
+        results = await asyncio.wait_for(asyncio.gather(*callers, return_exceptions=True), 1)
+        assert all(isinstance(r, asyncio.CancelledError) for r in results)
+
+    async def test_queries_stay_fast_while_documents_are_embedded(self, thread_pool, monkeypatch):
+        monkeypatch.setattr(settings, "embedding_dedup", False)
+        embedder = HashEmbedder()
+        batcher = MicroBatcher(embedder, max_size=16, max_wait_ms=1)
+        chunks = [f"Chunk {i} of a large upload. " * 10 for i in range(10_000)]
+        # As many uploads as bulk workers, each seconds of embedding on its own
+        uploads = [
+            asyncio.create_task(embed_chunks(chunks, embedder=embedder))
+            for _ in range(settings.executor_max_workers)
+        ]
+        latencies = []
+        while not all(upload.done() for upload in uploads):
+            start = time.perf_counter()
+            await batcher.embed(f"query {len(latencies)}")
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*uploads)
+        assert len(latencies) >= 10
+        assert np.percentile(latencies, 99) < 0.25
+
+    async def test_max_size_one_disables_batching(self):
+        provider = SlowProvider(latency_s=0)
+        batcher = MicroBatcher(provider, max_size=1, max_wait_ms=100)
+        await asyncio.gather(*(batcher.embed(t) for t in ["a", "b"]))
+        assert provider.batches == [["a"], ["b"]]
+
+    def test_rejects_empty_batches(self):
+        with pytest.raises(ValueError, match="max_size"):
+            MicroBatcher(HashEmbedder(), max_size=0, max_wait_ms=1)
+
+
+class TestAembedQuery:
+    async def test_misses_are_batched_and_cached(self):
+        provider = SlowProvider(latency_s=0.01)
+        batcher = MicroBatcher(provider, max_size=8, max_wait_ms=2)
+        cache = QueryEmbeddingCache(maxsize=16, ttl_s=0)
+
+        first = await asyncio.gather(
+            *(aembed_query(q, batcher=batcher, cache=cache) for q in ["a  b", "c", "a b"])
+        )
+        again = await aembed_query("a b", batcher=batcher, cache=cache)
+
+        assert provider.batches == [["a b", "c"]]
+        np.testing.assert_array_equal(again, first[0])
+        assert not again.flags.writeable
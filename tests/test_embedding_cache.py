@@ -0,0 +1,160 @@
+"""Unit tests for the query embedding cache."""
+
+from __future__ import annotations
+
+import threading
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+
+from ax_rag.embedding.cache import (
+    QueryEmbeddingCache,
+    aembed_queries,
+    embed_query,
+    normalize_query,
+)
+from ax_rag.embedding.stub import HashEmbedder, get_embedder
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CountingEmbedder(HashEmbedder):
+    def __init__(self, dim: int | None = None) -> None:
+        super().__init__(dim)
+        self.calls: list[str] = []
+
+    def embed_batch(self, texts: list[str]) -> npt.NDArray[np.float32]:
+        self.calls.extend(texts)
+        return super().embed_batch(texts)
+
+
+def _key(text: str) -> tuple[str, int, str]:
+    return ("Embedder", 4, text)
+
+
+def _vec(value: float) -> npt.NDArray[np.float32]:
+    return np.full(4, value, dtype=np.float32)
+
+
+class TestQueryEmbeddingCache:
+    def test_evicts_least_recently_used(self):
+        cache = QueryEmbeddingCache(maxsize=2)
+        a, c = _vec(1), _vec(3)
+        cache.put(_key("a"), a)
+        cache.put(_key("b"), _vec(2))
+        assert cache.get(_key("a")) is a  # "b" is now the oldest
+        cache.put(_key("c"), c)
+        assert cache.get(_key("b")) is None
+        assert cache.get(_key("a")) is a
+        assert cache.get(_key("c")) is c
+        assert (cache.hits, cache.misses, cache.evictions) == (3, 1, 1)
+        assert len(cache) == 2
+
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = QueryEmbeddingCache(maxsize=10, ttl_s=5, clock=clock)
+        a = _vec(1)
+        cache.put(_key("a"), a)
+        clock.now = 4.9
+        assert cache.get(_key("a")) is a
+        clock.now = 5.0
+        assert cache.get(_key("a")) is None
+        assert cache.expirations == 1
+        assert len(cache) == 0
+
+    def test_zero_size_disables_caching(self):
+        cache = QueryEmbeddingCache(maxsize=0)
+        cache.put(_key("a"), _vec(1))
+        assert cache.get(_key("a")) is None
+        assert cache.stats()["misses"] == 1
+
+    def test_stats_hit_rate(self):
+        cache = QueryEmbeddingCache(maxsize=4)
+        assert cache.stats()["hit_rate"] == 0.0
+        cache.put(_key("a"), _vec(1))
+        for _ in range(3):
+            cache.get(_key("a"))
+        cache.get(_key("b"))
+        assert cache.stats() == {
+            "size": 1,
+            "maxsize": 4,
+            "hits": 3,
+            "misses": 1,
+            "evictions": 0,
+            "expirations": 0,
+            "hit_rate": 0.75,
+        }
+
+    def test_rejects_negative_bounds(self):
+        with pytest.raises(ValueError):
+            QueryEmbeddingCache(maxsize=-1)
+        with pytest.raises(ValueError):
+            QueryEmbeddingCache(maxsize=1, ttl_s=-1)
+
+    def test_concurrent_access_keeps_bounds_and_counts(self):
+        cache = QueryEmbeddingCache(maxsize=50)
+
+        def worker(offset: int) -> None:
+            for i in range(2000):
+                key = _key(str((i + offset) % 80))
+                if cache.get(key) is None:
+                    cache.put(key, _vec(i))
+
+        threads = [threading.Thread(target=worker, args=(n * 7,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(cache) == 50
+        assert cache.hits + cache.misses == 8 * 2000
+
+
+class TestEmbedQuery:
+    def test_repeated_query_is_embedded_once(self):
+        embedder = CountingEmbedder()
+        cache = QueryEmbeddingCache(maxsize=8)
+        first = embed_query("what is rag", embedder=embedder, cache=cache)
+        second = embed_query("  what   is\trag ", embedder=embedder, cache=cache)
+        assert second is first
+        assert embedder.calls == ["what is rag"]
+        np.testing.assert_array_equal(first, HashEmbedder().embed("what is rag"))
+        assert not first.flags.writeable
+
+    def test_key_includes_embedder_dimension(self):
+        cache = QueryEmbeddingCache(maxsize=8)
+        small = embed_query("q", embedder=HashEmbedder(dim=8), cache=cache)
+        large = embed_query("q", embedder=HashEmbedder(dim=16), cache=cache)
+        assert (len(small), len(large)) == (8, 16)
+        assert cache.misses == 2
+
+    async def test_many_queries_share_one_call(self, thread_pool):
+        embedder = CountingEmbedder()
+        cache = QueryEmbeddingCache(maxsize=8)
+        embed_query("cached", embedder=embedder, cache=cache)
+        embedder.calls.clear()
+
+        vectors = await aembed_queries(
+            ["a b", "cached", "c", "a  b"], embedder=embedder, cache=cache
+        )
+
+        assert embedder.calls == ["a b", "c"]
+        assert vectors[0] is vectors[3]
+        np.testing.assert_array_equal(
+            np.stack(vectors), HashEmbedder().embed_batch(["a b", "cached", "c", "a b"])
+        )
+        assert not any(v.flags.writeable for v in vectors)
+
+    def test_normalize_query(self):
+        assert normalize_query("  a\n b\u00a0 c ") == "a b c"
+        assert normalize_query("cafe\u0301") == "caf\u00e9"
+
+
+def test_get_embedder_is_a_singleton():
+    assert get_embedder() is get_embedder()
@@ -0,0 +1,118 @@
+"""Tests for content-addressed chunk embeddings."""
+
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+from sqlalchemy import text
+
+from ax_rag.core.config import settings
+from ax_rag.embedding.dedup import content_hash, embed_chunks
+from ax_rag.embedding.stub import HashEmbedder
+from ax_rag.ingestion.streaming import ingest_stream
+
+
+class CountingEmbedder(HashEmbedder):
+    def __init__(self, dim: int | None = None) -> None:
+        super().__init__(dim)
+        self.calls: list[str] = []
+        self.batch_sizes: list[int] = []
+
+    def embed_batch(self, texts: list[str]) -> npt.NDArray[np.float32]:
+        self.calls.extend(texts)
+        self.batch_sizes.append(len(texts))
+        return super().embed_batch(texts)
+
+
+async def _blocks(*texts: str) -> AsyncIterator[bytes]:
+    for t in texts:
+        yield t.encode()
+
+
+class TestContentHash:
+    def test_normalises_text(self):
+        embedder = HashEmbedder()
+        assert content_hash("Licence:  MIT\n", embedder) == content_hash("Licence: MIT", embedder)
+        assert content_hash("caf\u00e9", embedder) == content_hash("cafe\u0301", embedder)
+        assert content_hash("Licence: MIT", embedder) != content_hash("Licence: BSD", embedder)
+
+    def test_depends_on_embedder(self):
+        assert content_hash("same", HashEmbedder(dim=8)) != content_hash("same", HashEmbedder())
+        assert content_hash("same", CountingEmbedder()) != content_hash("same", HashEmbedder())
+
+
+@pytest.mark.integration
+class TestEmbedChunks:
+    async def test_embeds_each_text_once(self, pg_session_factory, thread_pool):
+        embedder = CountingEmbedder()
+        texts = ["Footer.", "Body one.", "Footer.", "Footer. "]
+
+        first = await embed_chunks(texts, embedder=embedder, session_factory=pg_session_factory)
+        assert embedder.calls == ["Footer.", "Body one."]
+        assert (first.reused, first.computed) == (2, 2)
+        np.testing.assert_array_equal(first.vectors[0], HashEmbedder().embed_batch(["Footer."])[0])
+        np.testing.assert_array_equal(first.vectors[0], first.vectors[3])
+
+        second = await embed_chunks(
+            ["Body one.", "Body two."], embedder=embedder, session_factory=pg_session_factory
+        )
+        assert embedder.calls[2:] == ["Body two."]
+        assert (second.reused, second.computed) == (1, 1)
+        np.testing.assert_array_equal(second.vectors[0], first.vectors[1])
+
+    async def test_embeds_in_ingest_batches(self, pg_session_factory, thread_pool, monkeypatch):
+        monkeypatch.setattr(settings, "ingest_batch_size", 4)
+        embedder = CountingEmbedder()
+        texts = [f"Chunk {i}." for i in range(10)]
+        result = await embed_chunks(texts, embedder=embedder, session_factory=pg_session_factory)
+        assert embedder.batch_sizes == [4, 4, 2]
+        np.testing.assert_array_equal(result.vectors, HashEmbedder().embed_batch(texts))
+
+    @pytest.mark.parametrize("dedup", [True, False])
+    @pytest.mark.parametrize("reverse", [False, True])
+    async def test_embeds_the_normalised_text(
+        self, pg_session_factory, thread_pool, monkeypatch, dedup, reverse
+    ):
+        monkeypatch.setattr(settings, "embedding_dedup", dedup)
+        variants = ["Caf\u00e9  menu\n", "Cafe\u0301 menu"]
+        result = await embed_chunks(
+            variants[::-1] if reverse else variants,
+            embedder=HashEmbedder(),
+            session_factory=pg_session_factory,
+        )
+        expected = HashEmbedder().embed_batch(["Caf\u00e9 menu"])[0]
+        for vector in result.vectors:
+            np.testing.assert_array_equal(vector, expected)
+
+    async def test_can_be_disabled(self, pg_session_factory, thread_pool, monkeypatch):
+        monkeypatch.setattr(settings, "embedding_dedup", False)
+        embedder = CountingEmbedder()
+        result = await embed_chunks(
+            ["a", "a"], embedder=embedder, session_factory=pg_session_factory
+        )
+        assert embedder.calls == ["a", "a"]
+        assert (result.reused, result.computed) == (0, 2)
+        async with pg_session_factory() as session:
+            assert await session.scalar(text("SELECT count(*) FROM chunk_embeddings")) == 0
+
+    async def test_reingest_reuses_embeddings(self, pg_session_factory, thread_pool):
+        doc = "Boilerplate licence header.\n\nActual content of version one.\n"
+        first = await ingest_stream(_blocks(doc), "v1", session_factory=pg_session_factory)
+        again = await ingest_stream(_blocks(doc), "v1-copy", session_factory=pg_session_factory)
+
+        assert first.embeddings_computed == first.chunks_created > 0
+        assert (again.embeddings_reused, again.embeddings_computed) == (again.chunks_created, 0)
+        async with pg_session_factory() as session:
+            rows = (
+                await session.execute(
+                    text(
+                        "SELECT c.content_hash, c.embedding = e.embedding AS same "
+                        "FROM chunks c LEFT JOIN chunk_embeddings e USING (content_hash)"
+                    )
+                )
+            ).all()
+        assert len(rows) == 2 * first.chunks_created
+        assert all(r.content_hash is not None and r.same for r in rows)
@@ -0,0 +1,73 @@
+"""Unit tests for the shared CPU executor."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from ax_rag.core import executor
+from ax_rag.core.config import settings
+from ax_rag.embedding.stub import HashEmbedder
+from ax_rag.ingestion.chunker import chunk_text
+
+
+class TestExecutor:
+    def test_executor_is_shared(self, thread_pool):
+        first = executor.get_executor()
+        assert isinstance(first, ThreadPoolExecutor)
+        assert executor.get_executor() is first
+
+    def test_shutdown_recreates(self, thread_pool):
+        first = executor.get_executor()
+        executor.shutdown_executor()
+        assert executor.get_executor() is not first
+
+    def test_unknown_kind_raises(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(settings, "executor_kind", "fibers")
+        executor.shutdown_executor()
+        with pytest.raises(ValueError, match="executor_kind"):
+            executor.get_executor()
+
+    async def test_run_cpu_bound_off_event_loop(self, thread_pool):
+        name = await executor.run_cpu_bound(lambda: threading.current_thread().name)
+        assert name.startswith("ax-rag-cpu")
+
+    async def test_query_lane_skips_the_bulk_queue(self, thread_pool):
+        release = threading.Event()
+        # Every bulk worker busy, and more work queued behind them
+        bulk = [
+            asyncio.ensure_future(executor.run_cpu_bound(release.wait))
+            for _ in range(settings.executor_max_workers + 2)
+        ]
+        try:
+            with executor.query_lane():
+                name = await asyncio.wait_for(
+                    executor.run_cpu_bound(lambda: threading.current_thread().name), 1
+                )
+            assert name.startswith("ax-rag-query")
+            assert not any(task.done() for task in bulk)
+        finally:
+            release.set()
+            await asyncio.gather(*bulk)
+
+    async def test_process_pool_runs_chunking(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(settings, "executor_kind", "process")
+        monkeypatch.setattr(settings, "executor_max_workers", 1)
+        executor.shutdown_executor()
+        try:
+            assert isinstance(executor.get_executor(), ProcessPoolExecutor)
+            text = "word " * 200
+            chunks = await executor.run_cpu_bound(chunk_text, text, 100, 10)
+            assert chunks == chunk_text(text, 100, 10)
+        finally:
+            executor.shutdown_executor()
+
+    async def test_aembed_batch_matches_embed_batch(self, thread_pool):
+        embedder = HashEmbedder(dim=64)
+        texts = ["one", "two", "three"]
+        result = await embedder.aembed_batch(texts)
+        np.testing.assert_array_equal(result, embedder.embed_batch(texts))
@@ -0,0 +1,263 @@
+"""Tests for the asynchronous ingestion job queue.
+
+Integration tests: they need PostgreSQL with pgvector and are skipped when
+none is reachable.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+from sqlalchemy import text
+
+from ax_rag.api.routes import ingest as ingest_route
+from ax_rag.core.config import settings
+from ax_rag.embedding.stub import HashEmbedder
+from ax_rag.ingestion import jobs as jobs_module
+from ax_rag.ingestion.jobs import JobWorkers, process_jobs
+from ax_rag.storage.pg import (
+    claim_ingest_jobs,
+    enqueue_ingest_job,
+    get_generation,
+    get_ingest_job,
+    requeue_stale_ingest_jobs,
+    touch_ingest_jobs,
+)
+
+BODY = "Regarding the quarterly report. " * 14
+FOOTER = "This message is confidential and intended only for its recipient. " * 4
+
+
+class CountingEmbedder(HashEmbedder):
+    def __init__(self) -> None:
+        super().__init__()
+        self.batches: list[list[str]] = []
+
+    def embed_batch(self, texts: list[str]) -> npt.NDArray[np.float32]:
+        self.batches.append(texts)
+        return super().embed_batch(texts)
+
+
+@pytest.fixture
+def embedder(monkeypatch: pytest.MonkeyPatch) -> CountingEmbedder:
+    counting = CountingEmbedder()
+    monkeypatch.setattr(jobs_module, "get_embedder", lambda: counting)
+    return counting
+
+
+async def _enqueue(session_factory, n: int, *, max_depth: int = 1000, **kwargs) -> list[str]:
+    ids = []
+    async with session_factory() as session, session.begin():
+        for i in range(n):
+            job_id = await enqueue_ingest_job(
+                session,
+                f"Email number {i}. {BODY}\n\n{FOOTER}",
+                f"mail/{i}",
+                max_depth=max_depth,
+                **kwargs,
+            )
+            ids.append(job_id)
+    return ids
+
+
+async def _claim(session_factory, limit: int = 100):
+    async with session_factory() as session, session.begin():
+        return await claim_ingest_jobs(session, limit)
+
+
+async def _job(session_factory, job_id: str):
+    async with session_factory() as session:
+        return await get_ingest_job(session, job_id)
+
+
+@pytest.mark.integration
+class TestQueue:
+    async def test_enqueue_refuses_past_max_depth(self, pg_session_factory):
+        ids = await _enqueue(pg_session_factory, 4, max_depth=3)
+        assert ids[3] is None and None not in ids[:3]
+
+        await _claim(pg_session_factory, limit=2)  # running jobs still count
+        assert await _enqueue(pg_session_factory, 1, max_depth=3) == [None]
+
+    async def test_claims_are_exclusive_and_oldest_first(self, pg_session_factory):
+        ids = await _enqueue(pg_session_factory, 10)
+        claims = await asyncio.gather(*(_claim(pg_session_factory, limit=4) for _ in range(3)))
+
+        claimed = [job.id for batch in claims for job in batch]
+        assert sorted(claimed) == sorted(ids)
+        assert all(job.attempts == 1 for batch in claims for job in batch)
+        assert [job.id for job in max(claims, key=len)] == sorted(
+            [job.id for job in max(claims, key=len)], key=ids.index
+        )
+
+    async def test_stale_running_jobs_are_requeued(self, pg_session_factory):
+        [job_id] = await _enqueue(pg_session_factory, 1)
+        [job] = await _claim(pg_session_factory)
+        age = "UPDATE ingest_jobs SET heartbeat_at = now() - interval '2 hours'"
+        async with pg_session_factory() as session, session.begin():
+            assert await requeue_stale_ingest_jobs(session, 3600, max_attempts=3) == 0
+            await session.execute(text(age))
+            # A heartbeat keeps the job with its worker however long it runs
+            assert await touch_ingest_jobs(session, [(job.id, job.attempts)]) == 1
+            assert await requeue_stale_ingest_jobs(session, 3600, max_attempts=3) == 0
+            await session.execute(text(age))
+            assert await requeue_stale_ingest_jobs(session, 3600, max_attempts=3) == 1
+            assert await touch_ingest_jobs(session, [(job.id, job.attempts)]) == 0
+        assert (await _job(pg_session_factory, job_id)).status == "queued"
+
+
+@pytest.mark.integration
+class TestProcessJobs:
+    async def test_batch_is_embedded_and_written_together(
+        self, pg_session_factory, thread_pool, embedder
+    ):
+        ids = await _enqueue(pg_session_factory, 5)
+        async with pg_session_factory() as session:
+            generation = await get_generation(session)
+
+        await process_jobs(await _claim(pg_session_factory), session_factory=pg_session_factory)
+
+        assert len(embedder.batches) == 1  # one call for every chunk of every job
+        results = [(await _job(pg_session_factory, i)).result for i in ids]
+        assert sum(r["embeddings_computed"] for r in results) == len(embedder.batches[0])
+        assert results[0]["embeddings_computed"] > results[1]["embeddings_computed"]  # footer
+        async with pg_session_factory() as session:
+            assert await get_generation(session) == generation + 1
+            assert await session.scalar(text("SELECT count(*) FROM documents")) == 5
+            done = "SELECT count(*) FROM ingest_jobs WHERE status = 'done' AND raw_text IS NULL"
+            assert await session.scalar(text(done)) == 5
+            assert await session.scalar(text("SELECT count(*) FROM chunks")) == sum(
+                r["chunks_created"] for r in results
+            )
+
+    async def test_failing_job_does_not_fail_its_batch(
+        self, pg_session_factory, thread_pool, embedder, monkeypatch
+    ):
+        real_insert = jobs_module.insert_chunks
+
+        async def insert_chunks(session, document_id, chunks, **kwargs):
+            if chunks[0]["source"] == "mail/2":
+                raise RuntimeError("disk on fire")
+            return await real_insert(session, document_id, chunks, **kwargs)
+
+        monkeypatch.setattr(jobs_module, "insert_chunks", insert_chunks)
+        monkeypatch.setattr(settings, "ingest_job_max_attempts", 2)
+        ids = await _enqueue(pg_session_factory, 4)
+
+        await process_jobs(await _claim(pg_session_factory), session_factory=pg_session_factory)
+        statuses = [(await _job(pg_session_factory, i)).status for i in ids]
+        assert statuses == ["done", "done", "queued", "done"]
+        assert "disk on fire" in (await _job(pg_session_factory, ids[2])).error
+
+        await process_jobs(await _claim(pg_session_factory), session_factory=pg_session_factory)
+        failed = await _job(pg_session_factory, ids[2])
+        assert (failed.status, failed.attempts) == ("failed", 2)
+        async with pg_session_factory() as session:
+            assert await session.scalar(text("SELECT count(*) FROM documents")) == 3
+
+    async def test_slow_worker_refreshes_its_claim(
+        self, pg_session_factory, thread_pool, embedder, monkeypatch
+    ):
+        monkeypatch.setattr(settings, "ingest_job_timeout_s", 0.3)
+        real_embed_chunks = jobs_module.embed_chunks
+
+        async def slow_embed_chunks(*args, **kwargs):
+            await asyncio.sleep(0.8)
+            return await real_embed_chunks(*args, **kwargs)
+
+        monkeypatch.setattr(jobs_module, "embed_chunks", slow_embed_chunks)
+        [job_id] = await _enqueue(pg_session_factory, 1)
+        running = asyncio.create_task(
+            process_jobs(await _claim(pg_session_factory), session_factory=pg_session_factory)
+        )
+        await asyncio.sleep(0.6)
+        async with pg_session_factory() as session, session.begin():
+            assert await requeue_stale_ingest_jobs(session, 0.3, max_attempts=3) == 0
+        await running
+        assert (await _job(pg_session_factory, job_id)).status == "done"
+
+    async def test_requeued_job_is_written_once(self, pg_session_factory, thread_pool, embedder):
+        [job_id] = await _enqueue(pg_session_factory, 1)
+        [lost] = await _claim(pg_session_factory)
+        async with pg_session_factory() as session, session.begin():
+            await session.execute(
+                text("UPDATE ingest_jobs SET heartbeat_at = now() - interval '2 hours'")
+            )
+            await requeue_stale_ingest_jobs(session, 3600, max_attempts=3)
+        [current] = await _claim(pg_session_factory)
+
+        # The worker that lost the job finishes first: its writes are rolled back
+        await process_jobs([lost], session_factory=pg_session_factory)
+        assert (await _job(pg_session_factory, job_id)).status == "running"
+        await process_jobs([current], session_factory=pg_session_factory)
+
+        job = await _job(pg_session_factory, job_id)
+        assert (job.status, job.attempts) == ("done", 2)
+        async with pg_session_factory() as session:
+            assert await session.scalar(text("SELECT count(*) FROM documents")) == 1
+
+    async def test_upsert_jobs(self, pg_session_factory, thread_pool, embedder):
+        async with pg_session_factory() as session, session.begin():
+            first = await enqueue_ingest_job(
+                session, FOOTER, "wiki", external_id="wiki/1", max_depth=10
+            )
+        await process_jobs(await _claim(pg_session_factory), session_factory=pg_session_factory)
+        async with pg_session_factory() as session, session.begin():
+            again = await enqueue_ingest_job(
+                session, FOOTER, "wiki", external_id="wiki/1", max_depth=10
+            )
+        await process_jobs(await _claim(pg_session_factory), session_factory=pg_session_factory)
+
+        created = (await _job(pg_session_factory, first)).result
+        updated = (await _job(pg_session_factory, again)).result
+        assert created["document_id"] == updated["document_id"]
+        assert updated["chunks_created"] == 0
+        assert updated["chunks_unchanged"] == created["chunks_created"]
+
+
+@pytest.mark.integration
+class TestWorkers:
+    async def test_concurrent_workers_run_each_job_once(
+        self, pg_session_factory, thread_pool, embedder, monkeypatch
+    ):
+        monkeypatch.setattr(settings, "ingest_job_batch_size", 3)
+        monkeypatch.setattr(settings, "ingest_job_poll_interval_s", 0.05)
+        workers = JobWorkers(4, session_factory=pg_session_factory)
+        workers.start()
+        ids = await _enqueue(pg_session_factory, 30)
+        workers.notify()
+
+        async def pending() -> int:
+            async with pg_session_factory() as session:
+                return await session.scalar(
+                    text("SELECT count(*) FROM ingest_jobs WHERE status <> 'done'")
+                )
+
+        async with asyncio.timeout(20):
+            while await pending():
+                await asyncio.sleep(0.05)
+        await workers.stop()
+
+        async with pg_session_factory() as session:
+            assert await session.scalar(text("SELECT count(*) FROM documents")) == len(ids)
+            assert await session.scalar(text("SELECT max(attempts) FROM ingest_jobs")) == 1
+
+    async def test_api_queues_and_reports_jobs(self, pg_session_factory, api_client, monkeypatch):
+        monkeypatch.setattr(ingest_route, "async_session", pg_session_factory)
+        monkeypatch.setattr(settings, "ingest_queue_max_depth", 1)
+
+        queued = await api_client.post("/ingest/async", json={"text": FOOTER, "source": "a"})
+        assert queued.status_code == 202
+        job_id = queued.json()["job_id"]
+
+        full = await api_client.post("/ingest/async", json={"text": FOOTER, "source": "b"})
+        assert full.status_code == 429
+        assert "retry-after" in full.headers
+
+        status = await api_client.get(f"/ingest/jobs/{job_id}")
+        assert status.status_code == 200
+        assert status.json()["status"] == "queued"
+        assert (await api_client.get("/ingest/jobs/nope")).status_code == 404
@@ -0,0 +1,244 @@
+"""Tests for the streaming, resumable reindex pipeline and storage conversion.
+
+Integration tests: they need PostgreSQL with pgvector and are skipped when
+none is reachable.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+from ax_rag.core.config import settings
+from ax_rag.embedding.stub import HashEmbedder
+from ax_rag.ingestion import reindex as reindex_module
+from ax_rag.ingestion.reindex import Checkpoint, convert_embeddings, reindex, switch_to_shadow
+from ax_rag.storage.pg import (
+    add_shadow_embedding_column,
+    embedding_column_type,
+    insert_chunks,
+    insert_document,
+    rebuild_vector_index,
+    vector_search,
+)
+
+
+@pytest.fixture
+async def stale(pg_session_factory, thread_pool):
+    """Thirty chunks without embeddings."""
+    texts = [f"Reindex me, chunk number {i}." for i in range(30)]
+    async with pg_session_factory() as session, session.begin():
+        doc_id = await insert_document(session, source="stale", raw_text=None)
+        await insert_chunks(
+            session,
+            doc_id,
+            [
+                {"text": t, "chunk_index": i, "source": "stale", "embedding": None}
+                for i, t in enumerate(texts)
+            ],
+        )
+    return pg_session_factory
+
+
+async def _vectors(session_factory, column: str = "embedding") -> dict[str, list[float] | None]:
+    async with session_factory() as session:
+        result = await session.execute(
+            text(f"SELECT text, {column}::real[] AS v FROM chunks ORDER BY id")
+        )
+        return {r.text: r.v for r in result}
+
+
+@pytest.mark.integration
+class TestReindex:
+    async def test_fills_every_chunk_in_batches(self, stale, tmp_path, stored_tolerance):
+        checkpoint = tmp_path / "ckpt.json"
+        updated = await reindex(
+            batch_size=4, concurrency=3, checkpoint_path=checkpoint, session_factory=stale
+        )
+        assert updated == 30
+        assert not checkpoint.exists()
+
+        vectors = await _vectors(stale)
+        embedder = HashEmbedder()
+        texts = list(vectors)
+        np.testing.assert_allclose(
+            np.array([vectors[t] for t in texts], dtype=np.float32),
+            embedder.embed_batch(texts),
+            **stored_tolerance,
+        )
+
+    async def test_interrupted_run_resumes_from_checkpoint(self, stale, tmp_path, monkeypatch):
+        checkpoint = tmp_path / "ckpt.json"
+        real = HashEmbedder()
+        calls = 0
+
+        class FlakyEmbedder(HashEmbedder):
+            async def aembed_batch(self, texts):
+                nonlocal calls
+                calls += 1
+                if calls == 4:
+                    raise RuntimeError("embedding provider down")
+                return await real.aembed_batch(texts)
+
+        monkeypatch.setattr(reindex_module, "get_embedder", FlakyEmbedder)
+        with pytest.raises(RuntimeError, match="provider down"):
+            await reindex(
+                batch_size=5, concurrency=1, checkpoint_path=checkpoint, session_factory=stale
+            )
+        saved = Checkpoint.load(checkpoint)
+        assert saved is not None
+        assert saved.updated == 15
+        done = {t for t, v in (await _vectors(stale)).items() if v is not None}
+        assert len(done) == 15
+
+        monkeypatch.setattr(reindex_module, "get_embedder", HashEmbedder)
+        updated = await reindex(batch_size=5, checkpoint_path=checkpoint, session_factory=stale)
+        assert updated == 30  # cumulative across both runs
+        assert all(v is not None for v in (await _vectors(stale)).values())
+
+    async def test_checkpoint_for_other_column_is_rejected(self, stale, tmp_path):
+        checkpoint = tmp_path / "ckpt.json"
+        Checkpoint("embedding_next", last_id="x").save(checkpoint)
+        with pytest.raises(ValueError, match="embedding_next"):
+            await reindex(checkpoint_path=checkpoint, session_factory=stale)
+
+    async def test_shadow_build_and_switch(self, stale, monkeypatch, stored_tolerance):
+        small = HashEmbedder(dim=8)
+        monkeypatch.setattr(reindex_module, "get_embedder", lambda: small)
+        assert await reindex(shadow=True, batch_size=7, session_factory=stale) == 30
+        # Live vectors are untouched while the shadow column fills
+        assert all(v is None for v in (await _vectors(stale)).values())
+
+        # A chunk ingested after the shadow fill is caught up by the switch
+        async with stale() as session, session.begin():
+            doc_id = await insert_document(session, source="late", raw_text=None)
+            await insert_chunks(
+                session,
+                doc_id,
+                [{"text": "Late arrival.", "chunk_index": 0, "source": "late", "embedding": None}],
+            )
+        filled = await switch_to_shadow(bind=stale.kw["bind"], session_factory=stale)
+        assert filled == 1
+
+        vectors = await _vectors(stale)
+        assert len(vectors) == 31
+        assert all(v is not None and len(v) == 8 for v in vectors.values())
+        np.testing.assert_allclose(
+            np.array(vectors["Late arrival."], dtype=np.float32),
+            small.embed_batch(["Late arrival."])[0],
+            **stored_tolerance,
+        )
+        async with stale() as session:
+            columns = await session.scalar(
+                text(
+                    "SELECT array_agg(column_name::text) FROM information_schema.columns "
+                    "WHERE table_schema = current_schema() AND table_name = 'chunks' "
+                    "AND column_name LIKE 'embedding%'"
+                )
+            )
+            index = await session.scalar(
+                text(
+                    "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() "
+                    "AND indexname = 'ix_chunks_embedding'"
+                )
+            )
+        assert columns == ["embedding"]
+        assert "(embedding " in index
+
+
+@pytest.fixture
+async def embedded(pg_session_factory):
+    """Thirty embedded chunks, stored as float32, with their ANN index."""
+    texts = [f"Convert me, chunk number {i}." for i in range(30)]
+    async with pg_session_factory() as session, session.begin():
+        # Whatever EMBEDDING_STORAGE says (the table is empty)
+        await session.execute(
+            text(f"ALTER TABLE chunks ALTER COLUMN embedding TYPE vector({settings.embedding_dim})")
+        )
+        doc_id = await insert_document(session, source="embedded", raw_text=None)
+        await insert_chunks(
+            session,
+            doc_id,
+            [
+                {"text": t, "chunk_index": i, "source": "embedded", "embedding": e}
+                for i, (t, e) in enumerate(
+                    zip(texts, HashEmbedder().embed_batch(texts), strict=True)
+                )
+            ],
+        )
+    await rebuild_vector_index(pg_session_factory.kw["bind"])
+    return pg_session_factory
+
+
+async def _add_chunk(session_factory, chunk_text: str, method: str) -> None:
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(settings, "chunk_insert_method", method)
+        async with session_factory() as session, session.begin():
+            doc_id = await insert_document(session, source="late", raw_text=None)
+            await insert_chunks(
+                session,
+                doc_id,
+                [
+                    {
+                        "text": chunk_text,
+                        "chunk_index": 0,
+                        "source": "late",
+                        "embedding": HashEmbedder().embed(chunk_text),
+                    }
+                ],
+            )
+
+
+@pytest.mark.integration
+class TestConvertEmbeddings:
+    async def test_convert_to_halfvec_and_switch(self, embedded, monkeypatch):
+        monkeypatch.setattr(settings, "embedding_storage", "halfvec")
+        assert await convert_embeddings(batch_size=7, session_factory=embedded) == 30
+        # Restarting copies nothing twice
+        assert await convert_embeddings(batch_size=7, session_factory=embedded) == 0
+
+        # Written while the live column is still float32: caught up by the switch
+        await _add_chunk(embedded, "Late arrival.", "copy")
+        filled = await switch_to_shadow(
+            convert=True, bind=embedded.kw["bind"], session_factory=embedded
+        )
+        assert filled == 1
+
+        # Both insert paths write the new type
+        await _add_chunk(embedded, "After the switch, copied.", "copy")
+        await _add_chunk(embedded, "After the switch, inserted.", "orm")
+
+        embedder = HashEmbedder()
+        vectors = await _vectors(embedded)
+        assert len(vectors) == 33
+        texts = list(vectors)
+        np.testing.assert_allclose(
+            np.array([vectors[t] for t in texts], dtype=np.float32),
+            embedder.embed_batch(texts),
+            atol=1e-3,
+        )
+        async with embedded() as session:
+            assert await embedding_column_type(session) == ("halfvec", embedder.dim)
+            index = await session.scalar(
+                text(
+                    "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() "
+                    "AND indexname = 'ix_chunks_embedding_default'"
+                )
+            )
+            assert "halfvec_cosine_ops" in index
+            [hit] = await vector_search(
+                session, embedder.embed("Late arrival."), 1, with_embeddings=True
+            )
+        assert hit.text == "Late arrival."
+        assert len(hit.embedding) == embedder.dim
+
+        with pytest.raises(ValueError, match="already stored as halfvec"):
+            await convert_embeddings(session_factory=embedded)
+
+    async def test_refuses_a_shadow_column_of_another_reindex(self, embedded, monkeypatch):
+        async with embedded() as session, session.begin():
+            await add_shadow_embedding_column(session, 8, "vector")
+        monkeypatch.setattr(settings, "embedding_storage", "halfvec")
+        with pytest.raises(ValueError, match="embedding_next already exists"):
+            await convert_embeddings(session_factory=embedded)
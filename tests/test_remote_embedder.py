@@ -0,0 +1,202 @@
+"""Tests for the HTTP embedding provider against a local fake embedding server."""
+
+from __future__ import annotations
+
+import asyncio
+import socket
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+import httpx
+import numpy as np
+import pytest
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from ax_rag.core.config import settings
+from ax_rag.embedding import stub
+from ax_rag.embedding.remote import HttpEmbedder
+from ax_rag.embedding.stub import HashEmbedder
+
+DIM = 16
+
+
+@dataclass
+class FakeServer:
+    """An OpenAI-compatible embeddings endpoint backed by ``HashEmbedder``."""
+
+    url: str = ""
+    latency_s: float = 0.0
+    fail_next: list[int] = field(default_factory=list)  # statuses for the next requests
+    batches: list[list[str]] = field(default_factory=list)
+    client_ports: set[int] = field(default_factory=set)
+    authorization: set[str | None] = field(default_factory=set)
+    in_flight: int = 0
+    max_in_flight: int = 0
+
+    def app(self) -> FastAPI:
+        app = FastAPI()
+        embedder = HashEmbedder(dim=DIM)
+
+        @app.post("/v1/embeddings")
+        async def embeddings(request: Request) -> JSONResponse:
+            assert request.client is not None
+            self.client_ports.add(request.client.port)
+            self.authorization.add(request.headers.get("authorization"))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                await asyncio.sleep(self.latency_s)
+                if self.fail_next:
+                    status = self.fail_next.pop(0)
+                    return JSONResponse({"error": "busy"}, status, headers={"Retry-After": "0"})
+                texts = (await request.json())["input"]
+                self.batches.append(texts)
+                vectors = embedder.embed_batch(texts)
+                # Out of order on purpose: clients must sort by index
+                data = [
+                    {"object": "embedding", "index": i, "embedding": v.tolist()}
+                    for i, v in reversed(list(enumerate(vectors)))
+                ]
+                return JSONResponse({"object": "list", "data": data})
+            finally:
+                self.in_flight -= 1
+
+        return app
+
+    def reset(self) -> None:
+        self.latency_s = 0.0
+        self.fail_next.clear()
+        self.batches.clear()
+        self.client_ports.clear()
+        self.authorization.clear()
+        self.max_in_flight = 0
+
+
+@pytest.fixture(scope="module")
+def fake_server() -> Iterator[FakeServer]:
+    fake = FakeServer()
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    config = uvicorn.Config(fake.app(), log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    fake.url = f"http://127.0.0.1:{sock.getsockname()[1]}/v1/embeddings"
+    yield fake
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def server(fake_server: FakeServer) -> FakeServer:
+    fake_server.reset()
+    return fake_server
+
+
+def _embedder(server: FakeServer, **kwargs: object) -> HttpEmbedder:
+    return HttpEmbedder(server.url, DIM, backoff_s=0.001, **kwargs)
+
+
+class TestHttpEmbedder:
+    async def test_splits_into_provider_batches(self, server):
+        embedder = _embedder(server, max_batch_size=4, api_key="secret")
+        texts = [f"text {i}" for i in range(10)]
+
+        vectors = await embedder.aembed_batch(texts)
+        await embedder.aclose()
+
+        np.testing.assert_array_equal(vectors, HashEmbedder(dim=DIM).embed_batch(texts))
+        assert sorted(len(b) for b in server.batches) == [2, 4, 4]
+        assert server.authorization == {"Bearer secret"}
+
+    async def test_bounded_concurrency_over_pooled_connections(self, server):
+        server.latency_s = 0.02
+        embedder = _embedder(server, max_batch_size=1, max_concurrency=3)
+
+        await embedder.aembed_batch([f"t{i}" for i in range(12)])
+        await embedder.aembed_batch([f"u{i}" for i in range(12)])
+        await embedder.aclose()
+
+        assert len(server.batches) == 24
+        assert server.max_in_flight == 3
+        assert len(server.client_ports) <= 3  # connections are kept alive and reused
+
+    async def test_retries_transient_errors(self, server):
+        server.fail_next = [503, 429]
+        embedder = _embedder(server, max_retries=2)
+        vectors = await embedder.aembed_batch(["retry me"])
+        await embedder.aclose()
+        assert vectors.shape == (1, DIM)
+        assert server.fail_next == []
+
+    def test_retry_after_is_capped(self, server):
+        embedder = _embedder(server)
+        for header, delay in [("3600", 30.0), ("-5", 0.0), ("1.5", 1.5)]:
+            response = httpx.Response(429, headers={"Retry-After": header})
+            assert embedder._backoff(0, response, None) == delay
+
+    def test_non_finite_retry_after_uses_own_schedule(self, server):
+        embedder = _embedder(server)
+        for header in ["nan", "inf", "-inf"]:
+            response = httpx.Response(429, headers={"Retry-After": header})
+            delay = embedder._backoff(1, response, None)
+            assert embedder.backoff_s <= delay <= 2 * embedder.backoff_s
+
+    async def test_gives_up_after_max_retries(self, server):
+        server.fail_next = [503, 503, 503]
+        embedder = _embedder(server, max_retries=1)
+        with pytest.raises(httpx.HTTPStatusError, match="503"):
+            await embedder.aembed_batch(["doomed"])
+        await embedder.aclose()
+        assert server.fail_next == [503]
+
+    async def test_client_errors_are_not_retried(self, server):
+        server.fail_next = [400, 400]
+        embedder = _embedder(server, max_retries=3)
+        with pytest.raises(httpx.HTTPStatusError, match="400"):
+            await embedder.aembed_batch(["bad"])
+        await embedder.aclose()
+        assert server.fail_next == [400]
+
+    async def test_timeout(self, server):
+        server.latency_s = 0.5
+        embedder = _embedder(server, timeout_s=0.05, max_retries=0)
+        with pytest.raises(httpx.TimeoutException):
+            await embedder.aembed_batch(["slow"])
+        await embedder.aclose()
+
+    async def test_dimension_mismatch(self, server):
+        embedder = HttpEmbedder(server.url, DIM * 2)
+        with pytest.raises(ValueError, match="EMBEDDING_DIM"):
+            await embedder.aembed_batch(["x"])
+        await embedder.aclose()
+
+    def test_sync_embed_batch(self, server):
+        embedder = _embedder(server, max_batch_size=2)
+        vectors = embedder.embed_batch(["a", "b", "c"])
+        np.testing.assert_array_equal(vectors, HashEmbedder(dim=DIM).embed_batch(["a", "b", "c"]))
+        assert embedder.embed("a") == vectors[0].tolist()
+
+    def test_name_includes_model(self, server):
+        assert _embedder(server, model="m1").name != _embedder(server, model="m2").name
+
+
+class TestProviderSelection:
+    def test_http_provider_from_settings(self, monkeypatch, server):
+        monkeypatch.setattr(settings, "embedding_provider", "http")
+        monkeypatch.setattr(settings, "embedding_api_url", server.url)
+        monkeypatch.setattr(settings, "embedding_api_max_batch", 7)
+        embedder = stub._create_embedder()
+        assert isinstance(embedder, HttpEmbedder)
+        assert embedder.max_batch_size == 7
+
+    def test_unknown_provider(self, monkeypatch):
+        monkeypatch.setattr(settings, "embedding_provider", "carrier-pigeon")
+        with pytest.raises(ValueError, match="embedding_provider"):
+            stub._create_embedder()
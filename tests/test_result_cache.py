@@ -0,0 +1,190 @@
+"""Tests for the search-result cache and its generation-based invalidation."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime
+
+import pytest
+
+from ax_rag.core.config import settings
+from ax_rag.core.singleflight import SingleFlight
+from ax_rag.ingestion.streaming import ingest_stream
+from ax_rag.retrieval import cache as cache_module
+from ax_rag.retrieval.cache import (
+    MemoryResultCache,
+    PostgresResultCache,
+    _dump,
+    _load,
+    cached_retrieve,
+    get_retrieval_flights,
+    result_cache_key,
+)
+from ax_rag.retrieval.hybrid import RetrievalResult
+from ax_rag.storage.pg import ChunkHit, SearchFilter, bump_generation, get_generation
+
+
+def _result(*ids: str) -> RetrievalResult:
+    return RetrievalResult(
+        chunks=[
+            ChunkHit(
+                cid,
+                "doc",
+                f"text {cid} — ünïcode",
+                i,
+                "test",
+                datetime(2025, 1, 1, 12, 30, tzinfo=UTC),
+                score=1 / (61 + i),
+            )
+            for i, cid in enumerate(ids)
+        ]
+    )
+
+
+async def _blocks(*texts: str) -> AsyncIterator[bytes]:
+    for t in texts:
+        yield t.encode()
+
+
+class TestResultCacheKey:
+    def test_depends_on_generation_and_parameters(self):
+        base = result_cache_key(1, "vector search", 5)
+        assert result_cache_key(1, "  vector   search ", 5) == base
+        assert result_cache_key(2, "vector search", 5) != base
+        assert result_cache_key(1, "vector search", 6) != base
+        assert result_cache_key(1, "vector search", 5, ef_search=80) != base
+        assert result_cache_key(1, "vector search", 5, probes=4) != base
+        assert result_cache_key(1, "vector search", 5, search_filter=SearchFilter()) == base
+        assert (
+            result_cache_key(1, "vector search", 5, search_filter=SearchFilter(document_ids=[]))
+            != base
+        )
+        assert result_cache_key(
+            1, "vector search", 5, search_filter=SearchFilter(document_ids=["a", "b"])
+        ) == result_cache_key(
+            1, "vector search", 5, search_filter=SearchFilter(document_ids=["b", "a"])
+        )
+
+    def test_depends_on_ranking_settings(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(settings, "retrieval_fusion", "python")
+        base = result_cache_key(1, "q", 5)
+        monkeypatch.setattr(settings, "retrieval_fusion", "database")
+        assert result_cache_key(1, "q", 5) != base
+
+
+class TestBackends:
+    def test_serialisation_round_trips(self):
+        result = _result("a", "b", "c")
+        assert _load(_dump(result)) == result
+
+    async def test_memory_backend(self):
+        cache = MemoryResultCache(maxsize=2, ttl_s=0)
+        result = _result("a")
+        await cache.set("k", result)
+        assert await cache.get("k") is result
+        assert await cache.get("other") is None
+        assert cache.stats()["hit_rate"] == 0.5
+
+    async def test_partial_results_are_not_cached(self, monkeypatch: pytest.MonkeyPatch):
+        partial = RetrievalResult(chunks=[], timed_out=["keyword"])
+
+        async def fake_retrieve(*args, **kwargs):
+            return partial
+
+        async def fake_generation(session):
+            return 7
+
+        class FakeSession:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return None
+
+        memory = MemoryResultCache(maxsize=4, ttl_s=0)
+        monkeypatch.setattr(cache_module, "_backend", memory)
+        monkeypatch.setattr(cache_module, "hybrid_retrieve", fake_retrieve)
+        monkeypatch.setattr(cache_module, "get_generation", fake_generation)
+        for _ in range(2):
+            result, status = await cached_retrieve("q", session_factory=FakeSession)
+            assert (result, status) == (partial, "MISS")
+
+
+class TestCoalescing:
+    @pytest.fixture
+    def slow_retrieve(self, monkeypatch: pytest.MonkeyPatch) -> list[str]:
+        calls: list[str] = []
+
+        async def fake_retrieve(query, top_k=5, **kwargs):
+            calls.append(query)
+            await asyncio.sleep(0.05)
+            return _result(query)
+
+        monkeypatch.setattr(cache_module, "_backend", None)
+        monkeypatch.setattr(settings, "result_cache_backend", "none")
+        monkeypatch.setattr(cache_module, "hybrid_retrieve", fake_retrieve)
+        monkeypatch.setattr(cache_module, "_flights", SingleFlight())
+        return calls
+
+    async def test_identical_concurrent_requests_share_one_retrieval(self, slow_retrieve):
+        results = await asyncio.gather(
+            *(cached_retrieve("trending  question") for _ in range(20)),
+            cached_retrieve("trending question", top_k=3),
+        )
+        assert slow_retrieve == ["trending  question", "trending question"]
+        assert all(r is results[0][0] for r, _ in results[:20])
+        assert {status for _, status in results} == {"BYPASS"}
+        assert get_retrieval_flights().stats()["coalesced"] == 19
+
+    async def test_can_be_disabled(self, slow_retrieve, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(settings, "retrieval_coalescing", False)
+        await asyncio.gather(*(cached_retrieve("q") for _ in range(3)))
+        assert len(slow_retrieve) == 3
+
+
+@pytest.mark.integration
+class TestCachedRetrieve:
+    @pytest.fixture(params=["memory", "postgres"])
+    async def backend(self, request, pg_session_factory, monkeypatch: pytest.MonkeyPatch):
+        if request.param == "memory":
+            backend = MemoryResultCache(maxsize=100, ttl_s=60)
+        else:
+            backend = PostgresResultCache(ttl_s=60, session_factory=pg_session_factory)
+        monkeypatch.setattr(cache_module, "_backend", backend)
+        return backend
+
+    async def test_hit_until_ingest_bumps_generation(
+        self, backend, pg_session_factory, thread_pool
+    ):
+        await ingest_stream(
+            _blocks("Vector search finds neighbours."), "first", session_factory=pg_session_factory
+        )
+
+        first, status = await cached_retrieve("vector", session_factory=pg_session_factory)
+        assert status == "MISS"
+        again, status = await cached_retrieve("  vector ", session_factory=pg_session_factory)
+        assert status == "HIT"
+        assert again == first
+
+        await ingest_stream(
+            _blocks("More on vector indexes."), "second", session_factory=pg_session_factory
+        )
+        fresh, status = await cached_retrieve("vector", session_factory=pg_session_factory)
+        assert status == "MISS"
+        assert {c.source for c in fresh.chunks} == {"first", "second"}
+        assert backend.stats()["hits"] == 1
+
+    async def test_bump_generation_is_monotonic(self, pg_session_factory):
+        async with pg_session_factory() as session, session.begin():
+            assert await get_generation(session) == 0
+            assert await bump_generation(session) == 1
+            assert await bump_generation(session) == 2
+        async with pg_session_factory() as session:
+            assert await get_generation(session) == 2
+
+    async def test_disabled_cache_bypasses(self, pg_session_factory, monkeypatch):
+        monkeypatch.setattr(cache_module, "_backend", None)
+        monkeypatch.setattr(settings, "result_cache_backend", "none")
+        _, status = await cached_retrieve("anything", session_factory=pg_session_factory)
+        assert status == "BYPASS"
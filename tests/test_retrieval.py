@@ -1,8 +1,50 @@
-"""Unit tests for retrieval scoring (reciprocal rank fusion)."""
+"""Unit tests for retrieval scoring (reciprocal rank fusion) and hybrid orchestration."""
 
 from __future__ import annotations
 
-from ax_rag.retrieval.hybrid import reciprocal_rank_fusion
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime
+
+import pytest
+
+from ax_rag.core.config import settings
+from ax_rag.core.models import SearchResponse
+from ax_rag.retrieval import hybrid
+from ax_rag.retrieval.hybrid import hybrid_retrieve, reciprocal_rank_fusion
+from ax_rag.storage.pg import ChunkHit
+
+
+def _row(chunk_id: str) -> ChunkHit:
+    return ChunkHit(
+        chunk_id=chunk_id,
+        document_id="doc",
+        text=f"text {chunk_id}",
+        chunk_index=0,
+        source="test",
+        created_at=datetime(2025, 1, 1, tzinfo=UTC),
+    )
+
+
+@asynccontextmanager
+async def _fake_session():
+    yield object()
+
+
+def _patch_legs(monkeypatch: pytest.MonkeyPatch, vec_delay: float, kw_delay: float) -> None:
+    async def fake_vector_search(session, query_embedding, top_k=5, **kwargs):
+        await asyncio.sleep(vec_delay)
+        return [_row("a"), _row("b")]
+
+    async def fake_keyword_search(session, query, top_k=5, **kwargs):
+        await asyncio.sleep(kw_delay)
+        return [_row("b"), _row("c")]
+
+    # The legs only run when fusing in Python, whatever RETRIEVAL_FUSION says
+    monkeypatch.setattr(settings, "retrieval_fusion", "python")
+    monkeypatch.setattr(hybrid, "vector_search", fake_vector_search)
+    monkeypatch.setattr(hybrid, "keyword_search", fake_keyword_search)
 
 
 class TestReciprocalRankFusion:
@@ -31,3 +73,52 @@ class TestReciprocalRankFusion:
         diff_low = scores_low_k["a"] - scores_low_k["b"]
         diff_high = scores_high_k["a"] - scores_high_k["b"]
         assert diff_low > diff_high
+
+
+class TestHybridRetrieve:
+    async def test_legs_run_concurrently(self, monkeypatch: pytest.MonkeyPatch):
+        _patch_legs(monkeypatch, vec_delay=0.2, kw_delay=0.2)
+        start = time.perf_counter()
+        result = await hybrid_retrieve("q", top_k=3, session_factory=_fake_session)
+        assert time.perf_counter() - start < 0.35
+        assert not result.partial
+        # "b" is in both lists, so it fuses to the top
+        assert [c.chunk_id for c in result.chunks] == ["b", "a", "c"]
+
+    async def test_records_flow_to_the_response_unchanged(self, monkeypatch: pytest.MonkeyPatch):
+        _patch_legs(monkeypatch, vec_delay=0.0, kw_delay=0.0)
+        result = await hybrid_retrieve("q", top_k=3, session_factory=_fake_session)
+        assert all(isinstance(c, ChunkHit) and c.score > 0 for c in result.chunks)
+
+        response = SearchResponse.model_validate(
+            {"query": "q", "results": result.chunks, "count": 3}
+        )
+        assert [r.chunk_id for r in response.results] == ["b", "a", "c"]
+        assert [r.score for r in response.results] == [c.score for c in result.chunks]
+        assert "embedding" not in response.model_dump()["results"][0]
+
+    async def test_slow_leg_is_dropped_and_marked_partial(self, monkeypatch: pytest.MonkeyPatch):
+        _patch_legs(monkeypatch, vec_delay=0.0, kw_delay=5.0)
+        start = time.perf_counter()
+        result = await hybrid_retrieve("q", top_k=3, budget_ms=100, session_factory=_fake_session)
+        assert time.perf_counter() - start < 1.0
+        assert result.partial
+        assert result.timed_out == ["keyword"]
+        assert [c.chunk_id for c in result.chunks] == ["a", "b"]
+
+    async def test_all_legs_timing_out_returns_empty(self, monkeypatch: pytest.MonkeyPatch):
+        _patch_legs(monkeypatch, vec_delay=5.0, kw_delay=5.0)
+        result = await hybrid_retrieve("q", budget_ms=50, session_factory=_fake_session)
+        assert result.chunks == []
+        assert result.timed_out == ["vector", "keyword"]
+
+    async def test_database_fusion_timeout_is_partial(self, monkeypatch: pytest.MonkeyPatch):
+        async def slow_hybrid_search(session, query_embedding, query, top_k=5, **kwargs):
+            await asyncio.sleep(5)
+            return []
+
+        monkeypatch.setattr(settings, "retrieval_fusion", "database")
+        monkeypatch.setattr(hybrid, "hybrid_search", slow_hybrid_search)
+        result = await hybrid_retrieve("q", budget_ms=50, session_factory=_fake_session)
+        assert result.chunks == []
+        assert result.timed_out == ["hybrid"]
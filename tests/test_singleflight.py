@@ -0,0 +1,103 @@
+"""Unit tests for single-flight call coalescing."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from ax_rag.core.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    async def test_concurrent_callers_share_one_call(self):
+        flights: SingleFlight[str, int] = SingleFlight()
+        runs = 0
+
+        async def work() -> int:
+            nonlocal runs
+            runs += 1
+            await asyncio.sleep(0.05)
+            return 42
+
+        results = await asyncio.gather(*(flights.do("k", work) for _ in range(10)))
+        assert results == [42] * 10
+        assert runs == 1
+        assert flights.stats() == {"in_flight": 0, "calls": 1, "coalesced": 9}
+
+    async def test_different_keys_run_separately(self):
+        flights: SingleFlight[str, str] = SingleFlight()
+
+        async def work(value: str) -> str:
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(
+            flights.do("a", lambda: work("a")), flights.do("b", lambda: work("b"))
+        )
+        assert results == ["a", "b"]
+        assert flights.coalesced == 0
+
+    async def test_finished_call_is_not_reused(self):
+        flights: SingleFlight[str, int] = SingleFlight()
+        counter = iter(range(10))
+
+        async def work() -> int:
+            return next(counter)
+
+        assert await flights.do("k", work) == 0
+        assert await flights.do("k", work) == 1
+
+    async def test_exception_is_shared(self):
+        flights: SingleFlight[str, int] = SingleFlight()
+
+        async def fail() -> int:
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            flights.do("k", fail), flights.do("k", fail), return_exceptions=True
+        )
+        assert [str(r) for r in results] == ["boom", "boom"]
+        assert flights.stats()["in_flight"] == 0
+
+    async def test_cancelled_caller_does_not_cancel_the_others(self):
+        flights: SingleFlight[str, int] = SingleFlight()
+
+        async def work() -> int:
+            await asyncio.sleep(0.05)
+            return 7
+
+        leader = asyncio.create_task(flights.do("k", work))
+        follower = asyncio.create_task(flights.do("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await follower == 7
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    async def test_call_is_cancelled_once_every_caller_is_gone(self):
+        flights: SingleFlight[str, int] = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def work() -> int:
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return 1
+
+        callers = [asyncio.create_task(flights.do("k", work)) for _ in range(2)]
+        await started.wait()
+        for caller in callers:
+            caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        assert flights.stats()["in_flight"] == 0
+
+        async def quick() -> int:
+            return 2
+
+        assert await flights.do("k", quick) == 2
@@ -0,0 +1,634 @@
+"""Tests for the PostgreSQL storage layer.
+
+Classes marked ``integration`` need a running PostgreSQL with pgvector
+(``docker compose up -d postgres``) and are skipped when none is reachable.
+"""
+
+from __future__ import annotations
+
+import struct
+from datetime import UTC, datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+from ax_rag.core.config import settings
+from ax_rag.embedding.stub import HashEmbedder
+from ax_rag.retrieval.hybrid import (
+    hybrid_retrieve,
+    hybrid_retrieve_many,
+    iter_retrieve_many,
+    reciprocal_rank_fusion,
+)
+from ax_rag.storage.pg import (
+    SearchFilter,
+    _ensure_trigram_index,
+    _ensure_vector_index,
+    _filter_clause,
+    _keyword_leg,
+    _prefix_upper_bound,
+    _timestamptz_field,
+    _vector_distance,
+    _vector_fields,
+    build_trigram_index,
+    copy_chunks,
+    hybrid_search,
+    insert_chunks,
+    insert_document,
+    keyword_search,
+    keyword_search_batch,
+    rebuild_vector_index,
+    update_embeddings,
+    vector_index_sql,
+    vector_search,
+    vector_search_batch,
+)
+
+TOPICS = ["vector", "keyword", "hybrid", "search", "index", "chunk", "embedding", "query"]
+QUERIES = ["vector search", "hybrid index", "chunk", "embedding query", "no such term", ""]
+TOP_KS = [3, 1, 8, 5, 2, 4]
+
+
+@pytest.fixture
+async def corpus(pg_session_factory):
+    embedder = HashEmbedder()
+    texts = [
+        f"Note {i}: {TOPICS[i % len(TOPICS)]} and {TOPICS[(i * 3) % len(TOPICS)]} details."
+        for i in range(60)
+    ]
+    embeddings = embedder.embed_batch(texts)
+    async with pg_session_factory() as session, session.begin():
+        doc_id = await insert_document(session, source="corpus", raw_text="\n".join(texts))
+        await insert_chunks(
+            session,
+            doc_id,
+            [
+                {"text": t, "chunk_index": i, "source": "corpus", "embedding": emb}
+                for i, (t, emb) in enumerate(zip(texts, embeddings, strict=True))
+            ],
+        )
+    return pg_session_factory
+
+
+@pytest.fixture(params=["fulltext", "substring", "ilike"])
+def keyword_mode(request, monkeypatch: pytest.MonkeyPatch) -> str:
+    monkeypatch.setattr(settings, "keyword_search_mode", request.param)
+    return request.param
+
+
+async def _insert_texts(session_factory, texts: list[str]) -> None:
+    embeddings = HashEmbedder().embed_batch(texts)
+    async with session_factory() as session, session.begin():
+        doc_id = await insert_document(session, source="kw", raw_text="\n".join(texts))
+        await insert_chunks(
+            session,
+            doc_id,
+            [
+                {"text": t, "chunk_index": i, "source": "kw", "embedding": emb}
+                for i, (t, emb) in enumerate(zip(texts, embeddings, strict=True))
+            ],
+        )
+
+
+class TestKeywordLegShape:
+    @pytest.mark.parametrize("mode", ["fulltext", "substring", "ilike"])
+    def test_statement_shape_is_independent_of_term_count(self, mode, monkeypatch):
+        monkeypatch.setattr(settings, "keyword_search_mode", mode)
+        one = _keyword_leg("alpha")
+        three = _keyword_leg("alpha beta gamma")
+        assert one[:2] == three[:2]
+        assert [p.key for p in one[2]] == [p.key for p in three[2]]
+
+    def test_substring_escapes_wildcards(self, monkeypatch):
+        monkeypatch.setattr(settings, "keyword_search_mode", "substring")
+        _, _, params = _keyword_leg("100% a_b")
+        values = {p.key: p.value for p in params}
+        assert values["kw_patterns"] == ["%100\\%%", "%a\\_b%"]
+        assert values["kw_anchor"] == "%100\\%%"
+
+
+class TestFilterClause:
+    def test_empty_filter_matches_everything(self):
+        assert _filter_clause(None) == ("true", [])
+        assert _filter_clause(SearchFilter()) == ("true", [])
+        assert not SearchFilter() and SearchFilter(document_ids=[])
+
+    def test_conditions_are_anded(self):
+        where, params = _filter_clause(
+            SearchFilter(source="a", document_ids=["d"], created_before=datetime.now(UTC))
+        )
+        assert where.count(" AND ") == 2
+        assert [p.key for p in params] == ["f_source", "f_document_ids", "f_created_before"]
+
+    @pytest.mark.parametrize(
+        ("prefix", "upper"),
+        [("tenant-a/", "tenant-a0"), ("ab", "ac"), ("", None), ("\U0010ffff", None)],
+    )
+    def test_prefix_upper_bound(self, prefix, upper):
+        assert _prefix_upper_bound(prefix) == upper
+        where, _ = _filter_clause(SearchFilter(source_prefix=prefix))
+        assert ("~<~" in where) == (upper is not None)
+
+
+class TestBinaryCopyEncoding:
+    def test_vector_field_layout(self):
+        [field] = _vector_fields([np.array([1.0, -0.5], dtype=np.float32)])
+        assert field == struct.pack(">iHHff", 12, 2, 0, 1.0, -0.5)
+
+    def test_vector_fields_keep_nulls_in_place(self):
+        fields = _vector_fields([None, [0.25], None])
+        assert fields[0] == fields[2] == struct.pack(">i", -1)
+        assert fields[1] == struct.pack(">iHHf", 8, 1, 0, 0.25)
+
+    def test_halfvec_field_layout(self):
+        [field] = _vector_fields([np.array([1.0, -0.5, 0.1], dtype=np.float32)], "halfvec")
+        assert field == struct.pack(">iHHeee", 10, 3, 0, 1.0, -0.5, 0.1)
+
+    def test_timestamptz_is_microseconds_since_2000(self):
+        ts = datetime(2000, 1, 2, 0, 0, 1, 5, tzinfo=UTC)
+        assert _timestamptz_field(ts) == struct.pack(">iq", 8, 86_401_000_005)
+
+
+class TestVectorIndexSql:
+    def test_hnsw_uses_distance_opclass_and_build_params(self, monkeypatch):
+        monkeypatch.setattr(settings, "vector_index_type", "hnsw")
+        monkeypatch.setattr(settings, "vector_distance", "inner_product")
+        monkeypatch.setattr(settings, "hnsw_m", 24)
+        monkeypatch.setattr(settings, "embedding_storage", "vector")
+        ddl = vector_index_sql()
+        assert "USING hnsw (embedding vector_ip_ops)" in ddl
+        assert "WITH (m = 24, ef_construction = 64)" in ddl
+
+    def test_halfvec_storage_uses_halfvec_opclass(self, monkeypatch):
+        monkeypatch.setattr(settings, "vector_distance", "cosine")
+        assert "(embedding halfvec_cosine_ops)" in vector_index_sql(storage="halfvec")
+        monkeypatch.setattr(settings, "embedding_storage", "halfvec")
+        assert "(embedding halfvec_cosine_ops)" in vector_index_sql()
+
+    @pytest.mark.parametrize(
+        ("configured", "rows", "lists"),
+        [(0, 0, 1), (0, 50_000, 50), (0, 4_000_000, 2000), (7, 0, 7)],
+    )
+    def test_ivfflat_lists(self, monkeypatch, configured, rows, lists):
+        monkeypatch.setattr(settings, "vector_index_type", "ivfflat")
+        monkeypatch.setattr(settings, "ivfflat_lists", configured)
+        assert f"WITH (lists = {lists})" in vector_index_sql(rows=rows)
+
+    def test_unknown_settings_raise(self, monkeypatch):
+        monkeypatch.setattr(settings, "vector_index_type", "flat")
+        with pytest.raises(ValueError, match="vector_index_type"):
+            vector_index_sql()
+        monkeypatch.setattr(settings, "vector_index_type", "hnsw")
+        monkeypatch.setattr(settings, "vector_distance", "manhattan")
+        with pytest.raises(ValueError, match="vector_distance"):
+            vector_index_sql()
+
+
+@pytest.mark.integration
+class TestBulkWrites:
+    async def test_copy_round_trips_like_orm_insert(
+        self, pg_session_factory, monkeypatch, stored_tolerance
+    ):
+        texts = ["first chunk — ünïcode", "second chunk"]
+        embeddings = HashEmbedder().embed_batch(texts)
+        rows = [
+            {"text": t, "chunk_index": i, "source": "copy", "embedding": emb}
+            for i, (t, emb) in enumerate(zip(texts, embeddings, strict=True))
+        ]
+        async with pg_session_factory() as session, session.begin():
+            assert await copy_chunks(session, "doc-copy", rows) == 2
+            monkeypatch.setattr(settings, "chunk_insert_method", "orm")
+            assert await insert_chunks(session, "doc-orm", rows) == 2
+
+        async with pg_session_factory() as session:
+            result = await session.execute(
+                text(
+                    "SELECT document_id, text, chunk_index, source, "
+                    "embedding::real[] AS embedding, created_at, "
+                    "text_search IS NOT NULL AS indexed FROM chunks ORDER BY document_id, "
+                    "chunk_index"
+                )
+            )
+            stored = result.fetchall()
+
+        copied, orm = stored[:2], stored[2:]
+        assert [r.document_id for r in copied] == ["doc-copy"] * 2
+        np.testing.assert_allclose([r.embedding for r in copied], embeddings, **stored_tolerance)
+        for c, o in zip(copied, orm, strict=True):
+            assert (c.text, c.chunk_index, c.source) == (o.text, o.chunk_index, o.source)
+            np.testing.assert_array_equal(c.embedding, o.embedding)
+            assert abs((c.created_at - o.created_at).total_seconds()) < 60
+            assert c.indexed
+
+    async def test_update_embeddings_is_set_based(self, pg_session_factory, stored_tolerance):
+        embedder = HashEmbedder()
+        async with pg_session_factory() as session, session.begin():
+            await copy_chunks(
+                session,
+                "doc",
+                [
+                    {"text": t, "chunk_index": i, "source": "s", "embedding": None}
+                    for i, t in enumerate(["a", "b", "c"])
+                ],
+            )
+        async with pg_session_factory() as session, session.begin():
+            ids = (await session.execute(text("SELECT id FROM chunks ORDER BY text"))).scalars()
+            ids = list(ids)
+            new = embedder.embed_batch(["x", "y"])
+            assert await update_embeddings(session, ids[:2], new) == 2
+            # A second batch in the same transaction reuses the temp table name
+            assert await update_embeddings(session, ids[2:], embedder.embed_batch(["z"])) == 1
+
+        async with pg_session_factory() as session:
+            result = await session.execute(
+                text("SELECT embedding::real[] AS embedding FROM chunks ORDER BY text")
+            )
+            stored = [r.embedding for r in result]
+        np.testing.assert_allclose(stored[0], new[0], **stored_tolerance)
+        np.testing.assert_allclose(stored[2], embedder.embed_batch(["z"])[0], **stored_tolerance)
+
+
+@pytest.mark.integration
+class TestKeywordSearch:
+    async def test_fulltext_ranks_denser_matches_first(self, pg_session_factory, monkeypatch):
+        monkeypatch.setattr(settings, "keyword_search_mode", "fulltext")
+        await _insert_texts(
+            pg_session_factory,
+            [
+                "Postgres stores rows in pages.",
+                "Vector search ranks neighbours; vector indexes make vector search fast.",
+                "A short note on vector search.",
+            ],
+        )
+        async with pg_session_factory() as session:
+            rows = await keyword_search(session, "vector search", top_k=5)
+        assert [r.text for r in rows] == [
+            "Vector search ranks neighbours; vector indexes make vector search fast.",
+            "A short note on vector search.",
+        ]
+
+    async def test_fulltext_stems_and_parses_web_syntax(self, pg_session_factory, monkeypatch):
+        monkeypatch.setattr(settings, "keyword_search_mode", "fulltext")
+        await _insert_texts(
+            pg_session_factory,
+            ["Indexing documents quickly.", "Indexed tables.", "Searching the archive."],
+        )
+        async with pg_session_factory() as session:
+            stemmed = await keyword_search(session, "index", top_k=5)
+            negated = await keyword_search(session, "index -tables", top_k=5)
+            either = await keyword_search(session, "archive or tables", top_k=5)
+        assert {r.text for r in stemmed} == {"Indexing documents quickly.", "Indexed tables."}
+        assert [r.text for r in negated] == ["Indexing documents quickly."]
+        assert {r.text for r in either} == {"Indexed tables.", "Searching the archive."}
+
+    async def test_substring_mode_matches_literally_and_ranks(
+        self, pg_session_factory, monkeypatch
+    ):
+        monkeypatch.setattr(settings, "keyword_search_mode", "substring")
+        await _insert_texts(
+            pg_session_factory,
+            [
+                "AB_12 was finally shipped after review.",
+                "Part AB_12 shipped today.",
+                "Part ABX12 shipped too.",
+                "Disk at 100% after AB_12 shipped.",
+                "Disk at 1000 MB.",
+            ],
+        )
+        async with pg_session_factory() as session:
+            ranked = await keyword_search(session, "ab_12 shipped", top_k=5)
+            pct = await keyword_search(session, "100% ab_12", top_k=5)
+        # Wildcards are literal: "ABX12" and "1000" do not match
+        assert {r.text for r in ranked} == {
+            "AB_12 was finally shipped after review.",
+            "Part AB_12 shipped today.",
+            "Disk at 100% after AB_12 shipped.",
+        }
+        # The adjacent phrase outranks the scattered terms
+        assert ranked[-1].text == "AB_12 was finally shipped after review."
+        assert [r.text for r in pct] == ["Disk at 100% after AB_12 shipped."]
+
+    async def test_trigram_index_is_not_built_at_startup_over_rows(self, pg_session_factory):
+        bind = pg_session_factory.kw["bind"]
+
+        async def trigram_indexes() -> list[str]:
+            async with pg_session_factory() as session:
+                result = await session.scalars(
+                    text(
+                        "SELECT indexname::text FROM pg_indexes WHERE schemaname = "
+                        "current_schema() AND indexdef LIKE '%gin_trgm_ops%' ORDER BY 1"
+                    )
+                )
+                return list(result)
+
+        async with bind.begin() as conn:
+            await _ensure_trigram_index(conn)  # empty: built at once
+        assert await trigram_indexes() != []
+        async with bind.begin() as conn:
+            await conn.execute(text("DROP INDEX ix_chunks_text_trgm"))
+
+        await _insert_texts(pg_session_factory, ["Part AB_12 shipped today."])
+        async with bind.begin() as conn:
+            await _ensure_trigram_index(conn)
+        assert await trigram_indexes() == []
+
+        indexdef = await build_trigram_index(bind)
+        assert "ON ONLY" in indexdef and "gin_trgm_ops" in indexdef
+        assert await trigram_indexes() == ["ix_chunks_text_trgm", "ix_chunks_text_trgm_default"]
+
+    async def test_ilike_mode_matches_substrings(self, pg_session_factory, monkeypatch):
+        monkeypatch.setattr(settings, "keyword_search_mode", "ilike")
+        await _insert_texts(pg_session_factory, ["Error E-1042 in module", "All good"])
+        async with pg_session_factory() as session:
+            rows = await keyword_search(session, "e-104", top_k=5)
+        assert [r.text for r in rows] == ["Error E-1042 in module"]
+
+
+@pytest.mark.integration
+class TestHybridSearch:
+    @pytest.mark.parametrize("query", QUERIES)
+    @pytest.mark.parametrize("top_k", [1, 5, 12])
+    async def test_matches_python_fusion(self, corpus, keyword_mode: str, query: str, top_k: int):
+        query_vec = HashEmbedder().embed(query)
+        async with corpus() as session:
+            fused = await hybrid_search(session, query_vec, query, top_k=top_k)
+            vec = await vector_search(session, query_vec, top_k=top_k * 2)
+            kw = await keyword_search(session, query, top_k=top_k * 2)
+
+        scores = reciprocal_rank_fusion([[r.chunk_id for r in vec], [r.chunk_id for r in kw]])
+        expected = sorted(scores, key=lambda cid: scores[cid], reverse=True)[:top_k]
+
+        assert [hit.chunk_id for hit in fused] == expected
+        assert [hit.score for hit in fused] == [scores[cid] for cid in expected]
+
+    async def test_embeddings_only_on_request(self, corpus, stored_tolerance):
+        embedder = HashEmbedder()
+        query_vec = embedder.embed("chunk")
+        async with corpus() as session:
+            lean = [
+                await hybrid_search(session, query_vec, "chunk"),
+                await vector_search(session, query_vec),
+                await keyword_search(session, "chunk"),
+            ]
+            full = [
+                await hybrid_search(session, query_vec, "chunk", with_embeddings=True),
+                await vector_search(session, query_vec, with_embeddings=True),
+                await keyword_search(session, "chunk", with_embeddings=True),
+            ]
+        for hits, with_vectors in zip(lean, full, strict=True):
+            assert hits
+            assert all(hit.embedding is None for hit in hits)
+            assert [h.chunk_id for h in hits] == [h.chunk_id for h in with_vectors]
+            assert [h.score for h in hits] == [h.score for h in with_vectors]
+            np.testing.assert_allclose(
+                np.stack([h.embedding for h in with_vectors]),
+                embedder.embed_batch([h.text for h in with_vectors]),
+                **stored_tolerance,
+            )
+
+    @pytest.mark.parametrize("query", QUERIES)
+    async def test_hybrid_retrieve_fusion_modes_agree(
+        self, corpus, query: str, monkeypatch: pytest.MonkeyPatch
+    ):
+        monkeypatch.setattr(settings, "retrieval_fusion", "python")
+        in_python = await hybrid_retrieve(query, top_k=5, session_factory=corpus)
+        monkeypatch.setattr(settings, "retrieval_fusion", "database")
+        in_db = await hybrid_retrieve(query, top_k=5, session_factory=corpus)
+        assert in_db == in_python
+
+
+@pytest.mark.integration
+class TestBatchSearch:
+    async def test_legs_match_single_queries(self, corpus, keyword_mode: str):
+        vectors = HashEmbedder().embed_batch(QUERIES)
+        async with corpus() as session:
+            vec_batch = await vector_search_batch(session, vectors, TOP_KS)
+            kw_batch = await keyword_search_batch(session, QUERIES, TOP_KS)
+            for i, (query, k) in enumerate(zip(QUERIES, TOP_KS, strict=True)):
+                vec = await vector_search(session, vectors[i], top_k=k)
+                kw = await keyword_search(session, query, top_k=k)
+                assert vec_batch[i] == vec
+                assert kw_batch[i] == kw
+        assert any(kw_batch) and not kw_batch[QUERIES.index("")]
+
+    async def test_retrieval_matches_hybrid_retrieve(
+        self, corpus, thread_pool, monkeypatch: pytest.MonkeyPatch
+    ):
+        monkeypatch.setattr(settings, "retrieval_fusion", "python")
+        many = await hybrid_retrieve_many(QUERIES, TOP_KS, session_factory=corpus)
+        for query, k, result in zip(QUERIES, TOP_KS, many, strict=True):
+            assert result == await hybrid_retrieve(query, top_k=k, session_factory=corpus)
+
+        streamed = [
+            (index, result)
+            async for index, result in iter_retrieve_many(
+                QUERIES, TOP_KS, batch_size=4, session_factory=corpus
+            )
+        ]
+        assert streamed == list(enumerate(many))
+
+
+@pytest.mark.integration
+class TestVectorIndex:
+    async def _indexdef(self, session_factory) -> str | None:
+        async with session_factory() as session:
+            return await session.scalar(
+                text(
+                    "SELECT indexdef FROM pg_indexes "
+                    "WHERE schemaname = current_schema() AND indexname = 'ix_chunks_embedding'"
+                )
+            )
+
+    async def test_ivfflat_deferred_on_empty_table(self, pg_session_factory, monkeypatch):
+        monkeypatch.setattr(settings, "vector_index_type", "ivfflat")
+        async with pg_session_factory.kw["bind"].begin() as conn:
+            await _ensure_vector_index(conn)
+        assert await self._indexdef(pg_session_factory) is None
+
+        monkeypatch.setattr(settings, "vector_index_type", "hnsw")
+        async with pg_session_factory.kw["bind"].begin() as conn:
+            await _ensure_vector_index(conn)
+        assert "USING hnsw" in await self._indexdef(pg_session_factory)
+
+    @pytest.mark.parametrize(
+        ("kind", "distance", "expected"),
+        [
+            ("hnsw", "cosine", "USING hnsw (embedding {storage}_cosine_ops)"),
+            # PostgreSQL omits vector's default operator class, not halfvec's
+            ("ivfflat", "l2", "USING ivfflat (embedding{l2_ops})"),
+            ("ivfflat", "inner_product", "USING ivfflat (embedding {storage}_ip_ops)"),
+        ],
+    )
+    async def test_rebuild_serves_vector_search(
+        self, corpus, monkeypatch, kind: str, distance: str, expected: str
+    ):
+        monkeypatch.setattr(settings, "vector_index_type", kind)
+        monkeypatch.setattr(settings, "vector_distance", distance)
+        indexdef = await rebuild_vector_index(corpus.kw["bind"])
+        storage = settings.embedding_storage
+        l2_ops = "" if storage == "vector" else f" {storage}_l2_ops"
+        assert expected.format(storage=storage, l2_ops=l2_ops) in indexdef
+        assert indexdef == await self._indexdef(corpus)
+
+        query_vec = HashEmbedder().embed("vector search")
+        async with corpus() as session:
+            await session.execute(text("SET LOCAL enable_seqscan = off"))
+            rows = await vector_search(session, query_vec, top_k=5, ef_search=100, probes=100)
+            plan = await session.execute(
+                text(
+                    "EXPLAIN SELECT id FROM chunks "
+                    f"ORDER BY embedding {_vector_distance()[0]} CAST(:q AS vector) LIMIT 5"
+                ),
+                {"q": str(query_vec)},
+            )
+            assert "ix_chunks_embedding" in "\n".join(r[0] for r in plan)
+        assert len(rows) == 5
+
+    async def test_search_params_are_transaction_local(self, corpus, monkeypatch):
+        monkeypatch.setattr(settings, "vector_index_type", "hnsw")
+        query_vec = HashEmbedder().embed("chunk")
+        async with corpus() as session:
+            default = await session.scalar(text("SELECT current_setting('hnsw.ef_search', true)"))
+            await session.commit()
+            await vector_search(session, query_vec, top_k=5, ef_search=77)
+            assert await session.scalar(text("SHOW hnsw.ef_search")) == "77"
+            # HNSW returns at most ef_search rows, so it never drops below LIMIT
+            await vector_search(session, query_vec, top_k=90, ef_search=10)
+            assert await session.scalar(text("SHOW hnsw.ef_search")) == "90"
+            await session.commit()
+            after = await session.scalar(text("SELECT current_setting('hnsw.ef_search', true)"))
+        assert after == default
+
+        monkeypatch.setattr(settings, "vector_index_type", "ivfflat")
+        monkeypatch.setattr(settings, "ivfflat_probes", 3)
+        async with corpus() as session:
+            await vector_search(session, query_vec, top_k=5)
+            assert await session.scalar(text("SHOW ivfflat.probes")) == "3"
+            await vector_search(session, query_vec, top_k=5, probes=9)
+            assert await session.scalar(text("SHOW ivfflat.probes")) == "9"
+
+
+# source → chunks; "rare/" holds 2% of the corpus
+TENANTS = {"tenant-a/wiki": 735, "tenant-b/mail": 735, "rare/notes": 30}
+START = datetime(2025, 1, 1, tzinfo=UTC)
+
+
+@pytest.fixture
+async def tenants(pg_session_factory):
+    """Three documents, one per source, under an HNSW index; chunk *i* is *i* days old."""
+    embedder = HashEmbedder()
+    async with pg_session_factory() as session, session.begin():
+        for source, n in TENANTS.items():
+            texts = [
+                f"{source} {i}: {TOPICS[i % len(TOPICS)]} and {TOPICS[(i * 5) % len(TOPICS)]}"
+                for i in range(n)
+            ]
+            doc_id = await insert_document(session, source=source, raw_text=None)
+            await insert_chunks(
+                session,
+                doc_id,
+                [
+                    {"text": t, "chunk_index": i, "source": source, "embedding": emb}
+                    for i, (t, emb) in enumerate(
+                        zip(texts, embedder.embed_batch(texts), strict=True)
+                    )
+                ],
+            )
+        await session.execute(
+            text(
+                "UPDATE chunks "
+                "SET created_at = CAST(:start AS timestamptz) + chunk_index * interval '1 day'"
+            ),
+            {"start": START},
+        )
+    await rebuild_vector_index(pg_session_factory.kw["bind"])
+    return pg_session_factory
+
+
+async def _exact_nearest(session_factory, query: str, search_filter: SearchFilter, k: int):
+    """Ids of the *k* chunks matching *search_filter* nearest *query* (cosine), by NumPy."""
+    where, params = _filter_clause(search_filter)
+    async with session_factory() as session:
+        rows = (
+            await session.execute(
+                text(f"SELECT id, text FROM chunks WHERE {where}").bindparams(*params)
+            )
+        ).all()
+    embedder = HashEmbedder()
+    vectors = embedder.embed_batch([r.text for r in rows])
+    q = np.asarray(embedder.embed(query), dtype=np.float32)
+    similarity = vectors @ q / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(q))
+    return [rows[i].id for i in np.argsort(-similarity, kind="stable")[:k]]
+
+
+@pytest.mark.integration
+class TestFilteredSearch:
+    RARE = SearchFilter(source_prefix="rare/")
+
+    async def _search(self, session_factory, search_filter=RARE, top_k: int = 10):
+        async with session_factory() as session:
+            hits = await vector_search(
+                session, HashEmbedder().embed("hybrid index"), top_k, search_filter=search_filter
+            )
+            iterative = await session.scalar(
+                text("SELECT current_setting('hnsw.iterative_scan', true)")
+            )
+        return hits, iterative
+
+    async def test_selective_filter_is_searched_exactly(self, tenants):
+        hits, iterative = await self._search(tenants)
+        expected = await _exact_nearest(tenants, "hybrid index", self.RARE, 10)
+        assert [h.chunk_id for h in hits] == expected
+        assert iterative != "relaxed_order"
+
+    @pytest.mark.parametrize("kind", ["hnsw", "ivfflat"])
+    async def test_broad_filter_scans_iteratively(self, tenants, monkeypatch, kind: str):
+        monkeypatch.setattr(settings, "vector_index_type", kind)
+        monkeypatch.setattr(settings, "ivfflat_lists", 20)
+        monkeypatch.setattr(settings, "filter_exact_max_rows", 0)
+        await rebuild_vector_index(tenants.kw["bind"])
+
+        hits, _ = await self._search(tenants, top_k=20)
+        assert len(hits) == 20
+        assert all(h.source.startswith("rare/") for h in hits)
+        async with tenants() as session:
+            await vector_search(session, [1.0] * settings.embedding_dim, search_filter=self.RARE)
+            assert await session.scalar(text(f"SHOW {kind}.iterative_scan")) == "relaxed_order"
+
+    async def test_short_overfetch_is_retried_exactly(self, tenants, monkeypatch):
+        monkeypatch.setattr(settings, "filter_scan_mode", "overfetch")
+        monkeypatch.setattr(settings, "filter_exact_max_rows", 0)
+        hits, iterative = await self._search(tenants)
+        assert [h.chunk_id for h in hits] == await _exact_nearest(
+            tenants, "hybrid index", self.RARE, 10
+        )
+        assert iterative != "relaxed_order"
+
+    @pytest.mark.parametrize("fusion", ["python", "database"])
+    async def test_filters_apply_to_both_legs(self, tenants, monkeypatch, fusion: str):
+        monkeypatch.setattr(settings, "retrieval_fusion", fusion)
+        async with tenants() as session:
+            doc_ids = list(
+                await session.scalars(
+                    text("SELECT id FROM documents WHERE source <> 'tenant-b/mail'")
+                )
+            )
+        search_filter = SearchFilter(
+            document_ids=doc_ids,
+            created_after=START + timedelta(days=10),
+            created_before=START + timedelta(days=100),
+        )
+        result = await hybrid_retrieve(
+            "hybrid index", top_k=8, search_filter=search_filter, session_factory=tenants
+        )
+
+        assert len(result.chunks) == 8
+        for hit in result.chunks:
+            assert hit.document_id in doc_ids
+            assert START + timedelta(days=10) <= hit.created_at < START + timedelta(days=100)
+        async with tenants() as session:
+            keyword = await keyword_search(
+                session, "hybrid", top_k=500, search_filter=SearchFilter(source="rare/notes")
+            )
+        assert keyword and {h.source for h in keyword} == {"rare/notes"}
@@ -0,0 +1,84 @@
+"""Tests for streaming file ingestion."""
+
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+from ax_rag.embedding.stub import HashEmbedder
+from ax_rag.ingestion.chunker import chunk_text
+from ax_rag.ingestion.streaming import decode_utf8, ingest_stream
+
+
+async def _blocks(data: bytes, size: int) -> AsyncIterator[bytes]:
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+async def _decode(data: bytes, size: int) -> str:
+    return "".join([t async for t in decode_utf8(_blocks(data, size))])
+
+
+class TestDecodeUtf8:
+    @pytest.mark.parametrize("size", [1, 2, 3, 5, 1024])
+    async def test_multibyte_split_across_blocks(self, size):
+        text = "naïve café — 日本語 🚀 done"
+        assert await _decode(text.encode("utf-8"), size) == text
+
+    async def test_invalid_utf8_raises(self):
+        with pytest.raises(UnicodeDecodeError):
+            await _decode(b"ok \xff\xfe", 2)
+
+    async def test_truncated_sequence_raises_at_end(self):
+        with pytest.raises(UnicodeDecodeError):
+            await _decode("🚀".encode()[:3], 1)
+
+
+@pytest.mark.integration
+class TestIngestStream:
+    async def test_matches_whole_document_chunking(
+        self, pg_session_factory, thread_pool, stored_tolerance
+    ):
+        doc = ("Streaming ingestion keeps memory flat. Ünïcödé is fine too! " * 200).encode()
+        result = await ingest_stream(
+            _blocks(doc, 333), "big.txt", batch_size=7, session_factory=pg_session_factory
+        )
+        doc_id, count = result.document_id, result.chunks_created
+
+        expected = chunk_text(doc.decode("utf-8"))
+        assert count == len(expected)
+        async with pg_session_factory() as session:
+            rows = (
+                await session.execute(
+                    text(
+                        "SELECT text, chunk_index, source, embedding::real[] AS embedding "
+                        "FROM chunks WHERE document_id = :d ORDER BY chunk_index"
+                    ),
+                    {"d": doc_id},
+                )
+            ).all()
+            raw = await session.scalar(
+                text("SELECT raw_text FROM documents WHERE id = :d"), {"d": doc_id}
+            )
+        assert raw is None
+        assert [(r.text, r.chunk_index, r.source) for r in rows] == [
+            (c.text, c.index, "big.txt") for c in expected
+        ]
+        np.testing.assert_allclose(
+            np.array([r.embedding for r in rows], dtype=np.float32),
+            HashEmbedder().embed_batch([c.text for c in expected]),
+            **stored_tolerance,
+        )
+
+    async def test_invalid_utf8_rolls_back(self, pg_session_factory, thread_pool):
+        doc = b"Valid sentence. " * 100 + b"\xff"
+        with pytest.raises(UnicodeDecodeError):
+            await ingest_stream(
+                _blocks(doc, 64), "bad.txt", batch_size=2, session_factory=pg_session_factory
+            )
+        async with pg_session_factory() as session:
+            assert await session.scalar(text("SELECT count(*) FROM documents")) == 0
+            assert await session.scalar(text("SELECT count(*) FROM chunks")) == 0
@@ -0,0 +1,135 @@
+"""Tests for incremental document upserts.
+
+Integration tests: they need PostgreSQL with pgvector and are skipped when
+none is reachable.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+
+import numpy as np
+import numpy.typing as npt
+import pytest
+from sqlalchemy import text
+
+from ax_rag.embedding.cache import normalize_query
+from ax_rag.embedding.stub import HashEmbedder
+from ax_rag.ingestion import upsert as upsert_module
+from ax_rag.ingestion.chunker import chunk_text
+from ax_rag.ingestion.upsert import upsert_text
+from ax_rag.storage.pg import get_generation, insert_chunks, insert_document
+
+
+class CountingEmbedder(HashEmbedder):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: list[str] = []
+
+    def embed_batch(self, texts: list[str]) -> npt.NDArray[np.float32]:
+        self.calls.extend(texts)
+        return super().embed_batch(texts)
+
+
+def _page(*sections: str) -> str:
+    return "\n\n".join(f"{s}. " + f"This section is about {s}. " * 12 for s in sections)
+
+
+async def _chunks(session_factory) -> list[tuple[str, str, int, str]]:
+    async with session_factory() as session:
+        result = await session.execute(
+            text("SELECT id, text, chunk_index, source FROM chunks ORDER BY chunk_index")
+        )
+        return [tuple(r) for r in result]
+
+
+@pytest.fixture
+def embedder(monkeypatch: pytest.MonkeyPatch) -> CountingEmbedder:
+    counting = CountingEmbedder()
+    monkeypatch.setattr(upsert_module, "get_embedder", lambda: counting)
+    return counting
+
+
+@pytest.mark.integration
+class TestUpsert:
+    async def test_unchanged_document_is_a_no_op(self, pg_session_factory, thread_pool, embedder):
+        page = _page("alpha", "beta", "gamma")
+        first = await upsert_text(page, "wiki/1", "wiki", session_factory=pg_session_factory)
+        before = await _chunks(pg_session_factory)
+        async with pg_session_factory() as session:
+            generation = await get_generation(session)
+
+        again = await upsert_text(page, "wiki/1", "wiki", session_factory=pg_session_factory)
+
+        assert first.created and not again.created
+        assert again.document_id == first.document_id
+        assert (again.chunks_created, again.chunks_deleted) == (0, 0)
+        assert again.chunks_unchanged == len(before) == first.chunks_created
+        assert await _chunks(pg_session_factory) == before
+        assert len(embedder.calls) == len(set(c.text for c in chunk_text(page)))
+        async with pg_session_factory() as session:
+            assert await get_generation(session) == generation
+            assert await session.scalar(text("SELECT count(*) FROM documents")) == 1
+
+    async def test_only_changed_chunks_are_replaced(
+        self, pg_session_factory, thread_pool, embedder
+    ):
+        old = _page("alpha", "beta", "gamma", "delta", "epsilon")
+        new = _page("alpha", "beta", "gamma", "delta", "zeta")
+        await upsert_text(old, "wiki/2", "wiki", session_factory=pg_session_factory)
+        kept_before = {row[1]: row[0] for row in await _chunks(pg_session_factory)}
+        embedder.calls.clear()
+
+        result = await upsert_text(new, "wiki/2", "wiki", session_factory=pg_session_factory)
+
+        old_texts = Counter(c.text for c in chunk_text(old))
+        new_texts = Counter(c.text for c in chunk_text(new))
+        added = new_texts - old_texts
+        assert result.chunks_created == sum(added.values()) > 0
+        assert result.chunks_deleted == sum((old_texts - new_texts).values())
+        assert result.chunks_unchanged == sum((old_texts & new_texts).values()) > 0
+        assert sorted(embedder.calls) == sorted(normalize_query(t) for t in added)
+
+        rows = await _chunks(pg_session_factory)
+        assert [(t, i) for _, t, i, _ in rows] == [(c.text, c.index) for c in chunk_text(new)]
+        for chunk_id, chunk, _, _ in rows:
+            if chunk in old_texts:
+                assert chunk_id == kept_before[chunk]
+
+    async def test_keyed_by_external_id(self, pg_session_factory, thread_pool, embedder):
+        page = _page("alpha")
+        first = await upsert_text(page, "id-1", "old-title", session_factory=pg_session_factory)
+        moved = await upsert_text(page, "id-1", "new-title", session_factory=pg_session_factory)
+        other = await upsert_text(page, "id-2", "new-title", session_factory=pg_session_factory)
+
+        assert moved.document_id == first.document_id != other.document_id
+        assert other.created and other.embeddings_reused == other.chunks_created
+        assert {source for *_, source in await _chunks(pg_session_factory)} == {"new-title"}
+
+    async def test_adopts_a_document_ingested_without_a_key(
+        self, pg_session_factory, thread_pool, embedder
+    ):
+        old = _page("alpha", "beta")
+        chunks = chunk_text(old)
+        vectors = HashEmbedder().embed_batch([c.text for c in chunks])
+        async with pg_session_factory() as session, session.begin():
+            plain = await insert_document(session, "wiki", old)
+            rows = [
+                {"text": c.text, "chunk_index": c.index, "source": "wiki", "embedding": e}
+                for c, e in zip(chunks, vectors, strict=True)
+            ]
+            await insert_chunks(session, plain, rows)
+            other = await insert_document(session, "elsewhere", old)
+
+        new = _page("alpha", "gamma")
+        result = await upsert_text(new, "wiki", "wiki", session_factory=pg_session_factory)
+        again = await upsert_text(new, "wiki", "wiki", session_factory=pg_session_factory)
+
+        assert result.document_id == again.document_id == plain and not result.created
+        assert again.chunks_unchanged == len(chunk_text(new))
+        assert [t for _, t, _, _ in await _chunks(pg_session_factory)] == [
+            c.text for c in chunk_text(new)
+        ]
+        async with pg_session_factory() as session:
+            result = await session.execute(text("SELECT id, external_id FROM documents"))
+            assert dict(result.tuples().all()) == {plain: "wiki", other: None}